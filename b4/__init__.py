@@ -0,0 +1,13 @@
+"""Model B4 for creep, drying shrinkage and autogenous shrinkage of concrete
+(RILEM TC-242-MDC, DOI 10.1617/s11527-014-0485-2).
+
+Importing the package has no side effects; build a ``B4Params`` or
+``B4sParams`` once per mix and evaluate it at as many ages as needed.
+"""
+
+from .batch import evaluate_b4, evaluate_b4s
+from .engine import history
+from .examples import B4_EXAMPLE, B4S_EXAMPLE
+from .kelvin import Integrator, KelvinChain
+from .params import ApplicabilityWarning, B4Params, B4sParams, History
+from .superposition import Superposition, superpose
@@ -0,0 +1,92 @@
+"""Batch evaluation of models B4 and B4s over many mix designs at once.
+
+A batch of mixes is a table given either as a struct of arrays (a dict or
+any mapping of column name to array, e.g. a DataFrame) or as a NumPy record
+array.  Columns are the DATA-section names of the scripts; categorical
+columns (``cem_type``, ``agg_type``, ``specimen``) hold labels or integer
+codes.  Table 1/2/3/6/8/9 parameters are gathered per row by code.
+"""
+
+import numpy as np
+
+from . import tables
+from .params import B4Params, B4sParams
+
+B4_REQUIRED = ('fcm', 'cem_type', 'c', 'wc', 'ac', 'ro', 'V', 'S', 'h', 'sigma', 't0', 'tp')
+B4S_REQUIRED = ('fcm', 'cem_type', 'V', 'S', 'h', 'sigma', 't0', 'tp')
+B4S_DEFAULTS = dict(specimen='infinite slab', UR=4000, T_cur=20, T_avg=20, T=20, alfa_t=1e-5)
+B4_DEFAULTS = dict(B4S_DEFAULTS, agg_type='')
+
+MIX_OUTPUTS = ('tau_0', 'eps_0', 'tau_sh', 'eps_sh_inf', 'tau_au', 'eps_au_inf', 'q1', 'q2', 'q3', 'q4', 'q5')
+STRAIN_OUTPUTS = ('eps_sh', 'eps_au', 'J', 'T_infl', 'eps_tot')
+# categorical columns: keys (name in tables, custom classes may be registered) and label
+CATEGORIES = {
+	'cem_type': ('CEM_TYPES', 'cement type'),
+	'agg_type': ('AGG_KEYS', 'agg_type'),
+	'specimen': ('SPECIMEN_TYPES', 'specimen'),
+}
+
+
+def _names(mixes):
+	if isinstance(mixes, np.ndarray):
+		return mixes.dtype.names or ()
+	return list(mixes.keys())
+
+
+def columns(mixes, required, defaults):
+	"""Dict of input columns with categorical labels replaced by codes."""
+	names = _names(mixes)
+	missing = [name for name in required if name not in names]
+	if missing:
+		raise ValueError('missing input column(s): %s' % ', '.join(missing))
+	p = dict(defaults)
+	for name in tuple(required) + tuple(defaults):
+		if name in names:
+			p[name] = mixes[name]
+	p['cem_type'] = tables.codes(p['cem_type'], tables.CEM_TYPES, 'cement type')
+	p['specimen'] = tables.codes(p['specimen'], tables.SPECIMEN_TYPES, 'specimen')
+	if 'agg_type' in p:
+		p['agg_type'] = tables.codes(p['agg_type'], tables.AGG_KEYS, 'agg_type')
+	for name, value in p.items():
+		if name not in ('cem_type', 'agg_type', 'specimen'):
+			p[name] = np.asarray(value, dtype=float)
+	return p
+
+
+def _outputs(model, t, shape, time_shape):
+	pad = (1,) * len(time_shape)
+	out = {name: np.array(np.broadcast_to(getattr(model, name), shape + pad).reshape(shape)) for name in MIX_OUTPUTS}
+	r = model.history(t)
+	out.update((name, np.array(np.broadcast_to(getattr(r, name), shape + time_shape))) for name in STRAIN_OUTPUTS)
+	return out
+
+
+def _evaluate(cls, required, defaults, mixes, t, check):
+	p = columns(mixes, required, defaults)
+	if t is None:
+		if 't' not in _names(mixes):
+			raise ValueError('missing input column(s): t')
+		t = np.asarray(mixes['t'], dtype=float)
+		shape = np.broadcast(t, *p.values()).shape
+		return _outputs(cls(check=check, **p), t, shape, ())
+	# outer evaluation: every row over the same ages
+	t = np.asarray(t, dtype=float)
+	shape = np.broadcast(*p.values()).shape
+	grid = {name: value.reshape(value.shape + (1,) * t.ndim) for name, value in p.items()}
+	return _outputs(cls(check=check, **grid), t, shape, t.shape)
+
+def evaluate_b4(mixes, t=None, check=True):
+	"""Model B4 for every row of ``mixes``.
+
+	With ``t=None`` each row is evaluated at its own age column ``t``;
+	otherwise every row is evaluated at all ages of ``t`` and the strain
+	outputs have shape ``(rows,) + t.shape``.  Returns a dict of arrays with
+	the mix-level quantities (``MIX_OUTPUTS``) and the strains
+	(``STRAIN_OUTPUTS``, ``J`` in 1/MPa).
+	"""
+	return _evaluate(B4Params, B4_REQUIRED, B4_DEFAULTS, mixes, t, check)
+
+
+def evaluate_b4s(mixes, t=None, check=True):
+	"""Model B4s for every row of ``mixes``; see ``evaluate_b4``."""
+	return _evaluate(B4sParams, B4S_REQUIRED, B4S_DEFAULTS, mixes, t, check)
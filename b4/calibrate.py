@@ -0,0 +1,215 @@
+"""Calibration of the tabulated coefficients to measured creep and shrinkage.
+
+Creep (Table 3: ``p1..p5``, ``p5H``; B4s Table 9: ``p1``, ``s2..s5``,
+``p5H``): the compliance is bilinear in the coefficients,
+
+	J = p1 a1 + p2 a2 + p2 p3 a3 + p4 a4 + p5 b5 sqrt(g(p5H))
+
+where the bases ``a*``, ``b5`` and ``g`` (Eq. 28 - 43) are evaluated once per
+reading.  Shrinkage (Table 1: ``eps_cem``, ``tau_cem``; B4s Table 8:
+``eps_scem``, ``tau_s_cem``) scales ``eps_0`` and ``tau_sh`` linearly.  So
+after set-up every residual and its analytic Jacobian is a handful of array
+operations over all readings, and the Levenberg-Marquardt driver needs no
+re-evaluation of the model chain.
+
+Readings are given like a batch of mixes (see ``batch``), one row per
+reading, with the age ``t`` and the measured ``J`` (1/MPa, creep; plus the
+loading age ``tp``) or ``eps`` (shrinkage).  One coefficient set is fitted
+for all rows; coefficients not fitted keep their table values.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from . import batch
+from . import equations as eq
+from . import tables
+from .params import B4Params, B4sParams
+
+Fit = namedtuple('Fit', ['params', 'std', 'cost', 'rms', 'iterations', 'converged'])
+
+CREEP_NAMES = {'B4': ('p1', 'p2', 'p3', 'p4', 'p5', 'p5H'), 'B4s': ('p1', 's2', 's3', 's4', 's5', 'p5H')}
+SHRINKAGE_NAMES = {'B4': ('eps_cem', 'tau_cem'), 'B4s': ('eps_scem', 'tau_s_cem')}
+SCALE_FLOOR = 1e-3 		# relative weights: |measured| floored at this fraction of the largest
+
+
+def _params(data, model):
+	if model == 'B4':
+		required, defaults, cls = batch.B4_REQUIRED, batch.B4_DEFAULTS, B4Params
+	elif model == 'B4s':
+		required, defaults, cls = batch.B4S_REQUIRED, batch.B4S_DEFAULTS, B4sParams
+	else:
+		raise ValueError("model must be 'B4' or 'B4s'")
+	required = tuple(name for name in required if name not in ('sigma', 'tp')) + ('t',)
+	p = batch.columns(data, required, dict(defaults, sigma=0.0, tp=28.0))
+	t = p.pop('t')
+	return cls(check=False, **p), t
+
+
+class _Calibration(object):
+
+	def __init__(self, names, fit, measured, weights, relative):
+		self.names = names
+		self.fit_names = tuple(names if fit is None else fit)
+		unknown = [name for name in self.fit_names if name not in names]
+		if unknown:
+			raise ValueError('cannot fit %s; choose from %s' % (', '.join(unknown), ', '.join(names)))
+		self.index = [names.index(name) for name in self.fit_names]
+		if relative:
+			# a zero reading (e.g. at the start of drying) would get an infinite weight
+			floor = max(SCALE_FLOOR * np.max(np.abs(measured), initial=0.0), np.finfo(float).tiny)
+			scale = np.maximum(np.abs(measured), floor)
+		else:
+			scale = np.ones_like(measured)
+		w = np.ones_like(measured) if weights is None else np.asarray(weights, dtype=float)
+		self.measured = measured
+		self.w = np.sqrt(w) / scale
+
+	def residual(self, values):
+		"""Weighted residuals for the full coefficient vector ``values``."""
+		return (self.predict(values) - self.measured) * self.w
+
+	def run(self, start=None, max_iter=100, tol=1e-10):
+		"""Levenberg-Marquardt fit; return a ``Fit``."""
+		values = np.array(self.reference if start is None else [start.get(n, r) for n, r in zip(self.names, self.reference)], dtype=float)
+		idx = self.index
+		r = self.residual(values)
+		cost = 0.5 * np.dot(r, r)
+		lam = 1e-3
+		converged = False
+		it = 0
+		if not np.isfinite(cost):
+			max_iter = 0 		# non-finite model or readings: report the start, not converged
+		for it in range(1, max_iter + 1):
+			G = self.gradient(values)[:, idx] * self.w[:, None]
+			A = G.T.dot(G)
+			g = G.T.dot(r)
+			while True:
+				step = np.linalg.solve(A + lam * np.diag(np.diag(A) + 1e-300), -g)
+				trial = values.copy()
+				trial[idx] += step
+				r_trial = self.residual(trial)
+				cost_trial = 0.5 * np.dot(r_trial, r_trial)
+				if np.isfinite(cost_trial) and cost_trial <= cost:
+					lam = max(lam / 10, 1e-12)
+					break
+				lam *= 10
+				if lam > 1e12:
+					break
+			if lam > 1e12:
+				break 		# no step lowers the cost; not converged
+			done = abs(cost - cost_trial) <= tol * max(cost, 1e-300) or np.all(np.abs(step) <= tol * (np.abs(values[idx]) + tol))
+			values, r, cost = trial, r_trial, cost_trial
+			if done:
+				converged = True
+				break
+		G = self.gradient(values)[:, idx] * self.w[:, None]
+		dof = max(len(r) - len(idx), 1)
+		try:
+			cov = np.linalg.inv(G.T.dot(G)) * (2 * cost / dof)
+			std = np.sqrt(np.diag(cov))
+		except np.linalg.LinAlgError:
+			std = np.full(len(idx), np.nan)
+		return Fit(dict(zip(self.names, values.tolist())), dict(zip(self.fit_names, std.tolist())),
+			float(cost), float(np.sqrt(2 * cost / len(r))), it, converged)
+
+
+class CreepCalibration(_Calibration):
+	"""Fit of the creep coefficients to measured compliances ``J`` (1/MPa).
+
+	``fit`` selects the coefficients to fit (default: all of
+	``CREEP_NAMES[model]``); ``relative`` weights residuals by 1/|J|
+	(|J| floored at ``SCALE_FLOOR`` times the largest reading).
+	"""
+
+	def __init__(self, data, model='B4', fit=None, weights=None, relative=True):
+		P, t = _params(data, model)
+		tp = np.asarray(data['tp'], dtype=float)
+		names = CREEP_NAMES[model]
+		cr = tables.gather(tables.B4_CREEP_COLUMNS if model == 'B4' else tables.B4S_CREEP_COLUMNS, P.cem)
+		ref = [cr[name] for name in names]
+		tpd = P.tpd(tp)
+		td = tpd + (t - tp) * P.beta_tc
+		loaded = td >= tpd
+		dt = np.maximum(td - tpd, 0)
+		k = P.Rt * 10**6
+		self.a1 = P.q1 / ref[0] * loaded
+		self.a2 = k * P.q2 * eq.Q(tpd, td) / ref[1] * loaded
+		self.a3 = k * P.q3 * np.log1p(dt ** 0.1) / (ref[1] * ref[2]) * loaded
+		self.a4 = k * P.q4 * np.log(np.maximum(td, tpd) / tpd) / ref[3] * loaded
+		t0pd = np.maximum(tpd, P.t0t)
+		drying = td >= t0pd
+		self.b5 = P.q5 / ref[4] * 10**6 * drying
+		self.Ht = 1 - (1 - P.h) * np.tanh(np.sqrt(np.maximum(td - P.t0t, 0) / P.tau_sh))
+		self.Hc = 1 - (1 - P.h) * np.tanh(np.sqrt((t0pd - P.t0t) / P.tau_sh))
+		self.reference = [float(np.mean(r)) for r in ref]
+		_Calibration.__init__(self, names, fit, np.asarray(data['J'], dtype=float), weights, relative)
+
+	def predict(self, values):
+		p1, p2, p3, p4, p5, p5H = values
+		g = np.maximum(np.exp(-p5H * self.Ht) - np.exp(-p5H * self.Hc), 0)
+		return p1 * self.a1 + p2 * self.a2 + p2 * p3 * self.a3 + p4 * self.a4 + p5 * self.b5 * np.sqrt(g)
+
+	def gradient(self, values):
+		"""Analytic Jacobian dJ/d(values), one row per reading."""
+		p1, p2, p3, p4, p5, p5H = values
+		eH, eC = np.exp(-p5H * self.Ht), np.exp(-p5H * self.Hc)
+		g = np.maximum(eH - eC, 0)
+		sg = np.sqrt(g)
+		with np.errstate(divide='ignore', invalid='ignore'):
+			dg = np.where(g > 0, (-self.Ht * eH + self.Hc * eC) / (2 * sg), 0.0)
+		return np.stack([self.a1, self.a2 + p3 * self.a3, p2 * self.a3, self.a4, self.b5 * sg, p5 * self.b5 * dg], axis=-1)
+
+
+class ShrinkageCalibration(_Calibration):
+	"""Fit of the shrinkage coefficients to measured strains ``eps``.
+
+	With ``autogenous`` set the model autogenous shrinkage (not fitted) is
+	added, for readings of total shrinkage on drying specimens.
+	"""
+
+	def __init__(self, data, model='B4', fit=None, weights=None, relative=True, autogenous=True):
+		P, t = _params(data, model)
+		names = SHRINKAGE_NAMES[model]
+		sh = tables.gather(tables.B4_SHRINKAGE_COLUMNS if model == 'B4' else tables.B4S_SHRINKAGE_COLUMNS, P.cem)
+		ref = [sh[name] for name in names]
+		self.P = P
+		self.tt = (t - P.t0) * P.beta_ts
+		self.c_eps = P.eps_sh_inf * P.E(P.t0t + P.tau_sh * P.beta_ts) / ref[0] * P.kh # eps_sh_inf * E2 per unit eps_cem
+		self.c_tau = P.tau_sh / ref[1]
+		self.offset = P.eps_au(t) if autogenous else 0.0
+		self.reference = [float(np.mean(r)) for r in ref]
+		_Calibration.__init__(self, names, fit, np.asarray(data['eps'], dtype=float), weights, relative)
+
+	def _terms(self, values):
+		P = self.P
+		tau_sh = values[1] * self.c_tau
+		t2 = P.t0t + tau_sh * P.beta_ts
+		A = values[0] * self.c_eps / P.E(t2)
+		return A, eq.St(self.tt, tau_sh), tau_sh, t2
+
+	def predict(self, values):
+		A, St, _, _ = self._terms(values)
+		return A * St + self.offset
+
+	def gradient(self, values):
+		"""Analytic Jacobian d eps/d(values), one row per reading."""
+		A, St, tau_sh, t2 = self._terms(values)
+		dlnE = 0.5 / t2 - 0.5 * (6/7) / (4 + (6/7) * t2) # d ln E / dt, Eq. 19
+		s = np.sqrt(np.maximum(self.tt, 0) / tau_sh)
+		dSt = (1 - St**2) * (-s / (2 * tau_sh))
+		d_tau = (-A * dlnE * self.P.beta_ts * St + A * dSt) * self.c_tau
+		return np.stack([A * St / values[0], d_tau], axis=-1)
+
+
+def fit_creep(data, model='B4', fit=None, **kwargs):
+	"""Fit creep coefficients to ``data``; see ``CreepCalibration``."""
+	start = kwargs.pop('start', None)
+	return CreepCalibration(data, model, fit, **kwargs).run(start)
+
+
+def fit_shrinkage(data, model='B4', fit=None, **kwargs):
+	"""Fit shrinkage coefficients to ``data``; see ``ShrinkageCalibration``."""
+	start = kwargs.pop('start', None)
+	return ShrinkageCalibration(data, model, fit, **kwargs).run(start)
@@ -0,0 +1,325 @@
+"""Command-line batch runner (and ``python -m b4 serve``, see ``service``).
+
+	python -m b4 run --model B4 cases.csv results.parquet
+
+Input rows (CSV, Parquet or JSON lines; ``-`` for stdin/stdout, CSV) hold
+the DATA-section inputs of the scripts in SI units, one case per row, with
+the age ``t`` in days; missing optional columns take the script defaults
+and ``--set name=value`` supplies constant columns (``--coefficients`` loads
+custom cement and aggregate classes, see ``tables.load``).  Rows are read, evaluated
+by ``batch`` and written chunk by chunk, so memory does not grow with the
+file size.  Input and output go through pyarrow when it is installed (the
+only way to read or write Parquet and the fast path for CSV and JSON lines);
+without it CSV and JSON lines are handled by the standard library.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+
+import numpy as np
+
+from . import batch, tables
+
+FORMATS = (('.csv', 'csv'), ('.parquet', 'parquet'), ('.pq', 'parquet'), ('.jsonl', 'jsonl'), ('.ndjson', 'jsonl'))
+CATEGORIES = batch.CATEGORIES
+MODELS = {
+	'B4': (batch.evaluate_b4, batch.B4_REQUIRED, batch.B4_DEFAULTS),
+	'B4s': (batch.evaluate_b4s, batch.B4S_REQUIRED, batch.B4S_DEFAULTS),
+}
+CHUNK = 2**18 		# rows per batch
+ROW_BYTES = 128 		# estimate to size text blocks
+
+
+def _format(path, given):
+	if given:
+		return given
+	if path == '-':
+		return 'csv'
+	for ext, format in FORMATS:
+		if path.lower().endswith(ext):
+			return format
+	raise ValueError('cannot tell the format of %s, give it with --input-format/--output-format' % path)
+
+
+def _codes(name, values):
+	keys, what = CATEGORIES[name]
+	return tables.codes(values, getattr(tables, keys), what)
+
+
+def _have_arrow():
+	try:
+		import pyarrow
+	except ImportError:
+		return False
+	return True
+
+
+###########################################
+# Reading
+###########################################
+
+def _arrow_batches(path, format, chunk):
+	source = sys.stdin.buffer if path == '-' else path
+	if format == 'parquet':
+		import pyarrow.parquet as pq
+		return pq.ParquetFile(source).iter_batches(batch_size=chunk)
+	if format == 'csv':
+		from pyarrow import csv as pa_csv
+		return pa_csv.open_csv(source, read_options=pa_csv.ReadOptions(block_size=chunk * ROW_BYTES))
+	from pyarrow import json as pa_json
+	return pa_json.open_json(source, read_options=pa_json.ReadOptions(block_size=chunk * ROW_BYTES))
+
+
+def _arrow_columns(record_batch, names):
+	"""Numeric columns as float arrays, categorical labels as table codes."""
+	import pyarrow as pa
+	cols = {}
+	for name in names:
+		if name not in record_batch.schema.names:
+			continue
+		col = record_batch.column(name)
+		if name in CATEGORIES and pa.types.is_integer(col.type) and not col.null_count:
+			cols[name] = col.to_numpy(zero_copy_only=False)
+		elif name in CATEGORIES:
+			# an all-empty CSV column comes back as null type; labels of any type go by their text
+			if not (pa.types.is_string(col.type) or pa.types.is_large_string(col.type)):
+				col = col.cast(pa.string())
+			encoded = col.fill_null('').dictionary_encode()
+			lookup = _codes(name, np.array(encoded.dictionary.to_pylist(), dtype=object))
+			cols[name] = np.atleast_1d(lookup)[encoded.indices.to_numpy()]
+		else:
+			cols[name] = np.asarray(col.to_numpy(zero_copy_only=False), dtype=float)
+	return cols
+
+
+def _text_batches(path, format, chunk):
+	f = sys.stdin if path == '-' else open(path, newline='')
+	try:
+		if format == 'csv':
+			reader = csv.reader(f)
+			header = next(reader)
+			while True:
+				rows = list(itertools.islice(reader, chunk))
+				if not rows:
+					return
+				yield dict(zip(header, (np.array(col) for col in zip(*rows))))
+		elif format == 'jsonl':
+			while True:
+				rows = [json.loads(line) for line in itertools.islice(f, chunk) if line.strip()]
+				if not rows:
+					return
+				yield dict((name, np.array([row.get(name) for row in rows])) for name in rows[0])
+		else:
+			raise ValueError('reading %s needs pyarrow' % format)
+	finally:
+		if f is not sys.stdin:
+			f.close()
+
+
+def _text_columns(rows, names):
+	cols = {}
+	for name in names:
+		if name not in rows:
+			continue
+		value = rows[name]
+		if name in CATEGORIES:
+			cols[name] = value if value.dtype.kind in 'iu' else _codes(name, value.astype(str))
+		else:
+			cols[name] = np.asarray(value, dtype=float)
+	return cols
+
+
+###########################################
+# Writing
+###########################################
+
+class _ArrowWriter(object):
+
+	def __init__(self, path, format, keep=()):
+		self.path = path
+		self.format = format
+		self.keep = list(keep)
+		self.writer = None
+		self.file = sys.stdout.buffer if path == '-' else None
+
+	def write(self, names, values):
+		import pyarrow as pa
+		if self.format == 'jsonl':
+			if self.writer is None:
+				self.writer = _JSONWriter(self.path)
+			return self.writer.write(names, values)
+		table = pa.record_batch([v if isinstance(v, pa.Array) else pa.array(v) for v in values], names=names)
+		if self.writer is None:
+			sink = self.file if self.file is not None else self.path
+			if self.format == 'parquet':
+				import pyarrow.parquet as pq
+				# dictionary pages only pay off for the copied input columns, not for float results
+				self.writer = pq.ParquetWriter(sink, table.schema, use_dictionary=self.keep)
+			else:
+				from pyarrow import csv as pa_csv
+				self.writer = pa_csv.CSVWriter(sink, table.schema)
+		self.writer.write(table)
+
+	def close(self):
+		if self.writer is not None:
+			self.writer.close()
+
+
+class _JSONWriter(object):
+
+	def __init__(self, path):
+		self.file = sys.stdout if path == '-' else open(path, 'w')
+
+	def write(self, names, values):
+		values = [v.to_pylist() if hasattr(v, 'to_pylist') else np.asarray(v).tolist() for v in values]
+		self.file.writelines(json.dumps(dict(zip(names, row))) + '\n' for row in zip(*values))
+
+	def close(self):
+		if self.file is not sys.stdout:
+			self.file.close()
+
+
+class _CSVWriter(object):
+
+	def __init__(self, path):
+		self.file = sys.stdout if path == '-' else open(path, 'w', newline='')
+		self.writer = csv.writer(self.file)
+		self.header = False
+
+	def write(self, names, values):
+		if not self.header:
+			self.writer.writerow(names)
+			self.header = True
+		self.writer.writerows(zip(*(np.asarray(v).tolist() for v in values)))
+
+	def close(self):
+		if self.file is not sys.stdout:
+			self.file.close()
+
+
+def _writer(path, format, arrow, keep):
+	if arrow:
+		return _ArrowWriter(path, format, keep)
+	if format == 'csv':
+		return _CSVWriter(path)
+	if format == 'jsonl':
+		return _JSONWriter(path)
+	raise ValueError('writing %s needs pyarrow' % format)
+
+
+###########################################
+# Running
+###########################################
+
+def _value(text):
+	try:
+		return float(text)
+	except ValueError:
+		return text
+
+
+def run(source, target, model='B4', outputs=batch.STRAIN_OUTPUTS, keep=(), constants=None,
+		input_format=None, output_format=None, chunk=CHUNK, check=True):
+	"""Evaluate every row of ``source`` and write ``keep`` + ``outputs`` columns to ``target``; return the row count."""
+	if model not in MODELS:
+		raise ValueError("model must be 'B4' or 'B4s'")
+	evaluate, required, defaults = MODELS[model]
+	unknown = [name for name in outputs if name not in batch.MIX_OUTPUTS + batch.STRAIN_OUTPUTS]
+	if unknown:
+		raise ValueError('unknown output(s): %s' % ', '.join(unknown))
+	input_format = _format(source, input_format)
+	output_format = _format(target, output_format)
+	arrow = _have_arrow()
+	names = tuple(required) + tuple(defaults) + ('t',)
+	constants = dict(constants or {})
+	if arrow:
+		batches = _arrow_batches(source, input_format, chunk)
+		convert = _arrow_columns
+	else:
+		batches = _text_batches(source, input_format, chunk)
+		convert = _text_columns
+	writer = _writer(target, output_format, arrow, keep)
+	rows = 0
+	try:
+		for b in batches:
+			n = b.num_rows if arrow else len(next(iter(b.values())))
+			if not n:
+				continue
+			mixes = convert(b, names)
+			mixes.update((name, np.full(n, value) if name not in CATEGORIES else np.broadcast_to(_codes(name, value), (n,)))
+				for name, value in constants.items())
+			r = evaluate(mixes, check=check)
+			missing = [name for name in keep if name not in (b.schema.names if arrow else b)]
+			if missing:
+				raise KeyError('input has no column(s) %s to keep' % ', '.join(missing))
+			kept = [b.column(name) if arrow else b[name] for name in keep]
+			writer.write(list(keep) + list(outputs), kept + [r[name] for name in outputs])
+			rows += n
+	finally:
+		writer.close()
+	return rows
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(prog='python -m b4', description='Models B4 and B4s (RILEM TC-242-MDC).')
+	commands = parser.add_subparsers(dest='command')
+	p = commands.add_parser('run', help='evaluate a file of cases, one per row')
+	p.add_argument('input', help='input file (.csv, .parquet, .jsonl) or - for CSV on stdin')
+	p.add_argument('output', nargs='?', default='-', help='output file, default CSV on stdout')
+	p.add_argument('--model', choices=sorted(MODELS), default='B4')
+	p.add_argument('--outputs', default=','.join(batch.STRAIN_OUTPUTS),
+		help='comma-separated output columns (%s)' % ', '.join(batch.MIX_OUTPUTS + batch.STRAIN_OUTPUTS))
+	p.add_argument('--keep', default='', help='comma-separated input columns copied to the output (e.g. an id)')
+	p.add_argument('--set', action='append', default=[], metavar='NAME=VALUE', help='constant input column')
+	p.add_argument('--input-format', choices=('csv', 'parquet', 'jsonl'))
+	p.add_argument('--output-format', choices=('csv', 'parquet', 'jsonl'))
+	p.add_argument('--coefficients', metavar='FILE', help='coefficient file of custom cement/aggregate classes')
+	p.add_argument('--chunk', type=int, default=CHUNK, help='rows per batch (default %(default)s)')
+	p.add_argument('--no-check', dest='check', action='store_false', help='do not warn on inputs outside the calibrated range')
+	p = commands.add_parser('serve', help='HTTP evaluation service with request micro-batching')
+	p.add_argument('--host', default='127.0.0.1')
+	p.add_argument('--port', type=int, default=8642)
+	p.add_argument('--window', type=float, default=2.0, help='batching latency window in ms (default %(default)s)')
+	p.add_argument('--max-batch', type=int, default=2**16, help='points per batch (default %(default)s)')
+	p.add_argument('--workers', type=int, default=0, help='worker processes for large batches (default none)')
+	p.add_argument('--offload', type=int, default=2**14, help='points from which a batch goes to the workers')
+	p.add_argument('--coefficients', metavar='FILE', help='coefficient file of custom cement/aggregate classes')
+	p.add_argument('--no-check', dest='check', action='store_false', help='do not warn on inputs outside the calibrated range')
+	args = parser.parse_args(argv)
+	if args.command == 'serve':
+		from . import service
+		if args.coefficients:
+			tables.load(args.coefficients)
+		service.run(args.host, args.port, window=args.window * 1e-3, max_batch=args.max_batch,
+			workers=args.workers, offload=args.offload, check=args.check)
+		return 0
+	if args.command != 'run':
+		parser.print_help()
+		return 2
+	try:
+		constants = dict((k, _value(v)) for k, v in (item.split('=', 1) for item in args.set))
+	except ValueError:
+		parser.error('--set takes NAME=VALUE')
+	try:
+		if args.coefficients:
+			tables.load(args.coefficients)
+		run(args.input, args.output, args.model, [n for n in args.outputs.split(',') if n],
+			[n for n in args.keep.split(',') if n], constants, args.input_format, args.output_format,
+			args.chunk, args.check)
+	except BrokenPipeError:
+		# reader of stdout went away (e.g. ``| head``)
+		sys.stdout = None
+		return 0
+	except ValueError as e:
+		sys.stderr.write('b4 run: %s\n' % e)
+		return 1
+	except KeyError as e:
+		sys.stderr.write('b4 run: %s\n' % e.args[0])
+		return 1
+	except OSError as e:
+		sys.stderr.write('b4 run: %s\n' % e)
+		return 1
+	return 0
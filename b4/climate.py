@@ -0,0 +1,352 @@
+"""Time-varying temperature and humidity histories.
+
+With a climate record T(t), h(t) the constant factors ``beta_th``,
+``beta_ts``, ``beta_tc`` (Eq. 8 - 10) become one cumulative integral of the
+Arrhenius factor (Eq. 39),
+
+	B(t) = integral of beta(T(s)) ds,   t0t = B(t0), tt = B(t) - B(t0), tpd = B(tp), td = B(t)
+
+(trapezoidal rule over the record; before the first sample the concrete is
+taken at the curing temperature ``T_cur``).  The humidity enters the time
+curve incrementally, Eq. 14 and 37 with the factors kh(h) and 1 - h held per
+record interval:
+
+	eps_sh(t) = eps_sh_inf * integral of kh(h) dS(tt),   H(t) = 1 - integral of (1 - h) dS(tt)
+
+``B`` and the two integrals are kept as prefix sums per record sample, so
+appending samples costs O(new samples) and an age between samples is one
+binary search and one interval.  ``q5`` (Eq. 43) keeps the humidity the
+parameter object was built with; the creep factor Rt (Eq. 39) is the mean of
+beta over the load duration.
+
+A record is held in memory or in a raw binary file of ``RECORD`` rows (as
+written by a logger) that is memory-mapped and read in chunks, so it need
+not fit in RAM; the prefix sums may be kept in files next to it.
+"""
+
+import os
+
+import numpy as np
+
+from . import equations as eq
+from .params import History
+from .units import MPa
+
+RECORD = np.dtype([('t', '<f8'), ('T', '<f8'), ('h', '<f8')])
+CHUNK = 2**20 		# samples integrated per step
+
+
+class _Column(object):
+	"""Growable array of rows, in memory (capacity doubling) or appended to a raw file."""
+
+	def __init__(self, dtype, shape=(), path=None):
+		self.dtype = np.dtype(dtype)
+		self.shape = tuple(shape)
+		self.path = path
+		self._data = None
+		self.n = 0
+		if path is None:
+			self._data = np.empty((16,) + self.shape, self.dtype)
+		elif os.path.exists(path):
+			self.n = os.path.getsize(path) // (self.dtype.itemsize * int(np.prod(self.shape)))
+		else:
+			open(path, 'wb').close()
+
+	def __len__(self):
+		return self.n
+
+	def append(self, rows):
+		rows = np.ascontiguousarray(rows, dtype=self.dtype).reshape((-1,) + self.shape)
+		if self.path is not None:
+			with open(self.path, 'r+b') as f:
+				f.seek(self.n * rows.itemsize * int(np.prod(self.shape)))
+				f.write(rows.tobytes())
+				f.truncate()
+			self._data = None
+		else:
+			if self.n + len(rows) > len(self._data):
+				data = np.empty((max(2 * len(self._data), self.n + len(rows)),) + self.shape, self.dtype)
+				data[:self.n] = self._data[:self.n]
+				self._data = data
+			self._data[self.n:self.n + len(rows)] = rows
+		self.n += len(rows)
+
+	def truncate(self, n):
+		self.n = min(self.n, n)
+		if self.path is not None:
+			with open(self.path, 'r+b') as f:
+				f.truncate(self.n * self.dtype.itemsize * int(np.prod(self.shape)))
+			self._data = None
+
+	@property
+	def data(self):
+		if self.path is None:
+			return self._data[:self.n]
+		if self._data is None or len(self._data) != self.n:
+			if self.n:
+				self._data = np.memmap(self.path, self.dtype, 'r', shape=(self.n,) + self.shape)
+			else:
+				self._data = np.empty((0,) + self.shape, self.dtype)
+		return self._data
+
+
+class Climate(object):
+	"""Record of temperatures ``T`` (Celsius) and relative humidities ``h`` at ages ``t`` (days).
+
+	Samples are appended with ``append`` (ages strictly increasing); a
+	record opened from a file with ``open`` picks up samples written to the
+	file since by ``refresh``.
+	"""
+
+	def __init__(self, t=(), T=(), h=(), UR=4000, T_cur=20, path=None, index=None):
+		self.UR = UR
+		self.T_cur = T_cur
+		self.beta_th = float(eq.beta(T_cur, UR))
+		self.path = path
+		self._record = _Column(RECORD, path=path)
+		self._t = _Column(float, path=None if index is None else index + '.t')
+		self._B = _Column(float, path=None if index is None else index + '.age')
+		self._resume()
+		if len(np.atleast_1d(t)):
+			self.append(t, T, h)
+
+	@classmethod
+	def open(cls, path, UR=4000, T_cur=20, index=None):
+		"""Climate of the raw ``RECORD`` file ``path`` (memory-mapped).
+
+		``index`` is a path prefix for the prefix-sum files; when given, they
+		persist across runs and only samples added since are integrated.
+		"""
+		if not os.path.exists(path):
+			raise ValueError('no climate record %s' % path)
+		return cls(UR=UR, T_cur=T_cur, path=path, index=index)
+
+	def __len__(self):
+		return len(self._t)
+
+	@property
+	def t(self):
+		return self._t.data
+
+	@property
+	def B(self):
+		"""Equivalent age B(t) at the record samples."""
+		return self._B.data
+
+	@property
+	def record(self):
+		return self._record.data
+
+	def append(self, t, T, h):
+		"""Add samples (arrays or scalars) after the last one."""
+		t, T, h = np.broadcast_arrays(*(np.atleast_1d(np.asarray(x, dtype=float)) for x in (t, T, h)))
+		if np.any((h < 0) | (h > 1)):
+			raise ValueError('error h (relative humidity must be within 0 and 1)')
+		last = self._t.data[-1] if len(self._t) else -np.inf
+		if np.any(np.diff(t) <= 0) or t[0] <= last:
+			raise ValueError('climate ages must increase (%g after %g)' % (t[0], last))
+		rows = np.empty(len(t), RECORD)
+		rows['t'], rows['T'], rows['h'] = t, T, h
+		self._record.append(rows)
+		self.refresh()
+
+	def refresh(self):
+		"""Integrate the samples added to the record since the last call; return their number."""
+		if self.path is not None:
+			self._record = _Column(RECORD, path=self.path)
+		record = self._record.data
+		start = len(self._t)
+		for i in range(start, len(record), CHUNK):
+			self._integrate(record[i:i + CHUNK])
+		return len(record) - start
+
+	def _resume(self):
+		# keep persisted prefix sums only while they match the record
+		n = min(len(self._t), len(self._B), len(self._record))
+		if n and self._t.data[n - 1] != self._record.data[n - 1]['t']:
+			n = 0
+		self._t.truncate(n)
+		self._B.truncate(n)
+		self.refresh()
+
+	def _integrate(self, rows):
+		t = np.asarray(rows['t'], dtype=float)
+		beta = eq.beta(rows['T'], self.UR)
+		if len(self._t):
+			i = len(self._t) - 1
+			t_prev = self._t.data[i]
+			beta_prev = eq.beta(self._record.data[i]['T'], self.UR)
+			B_prev = self._B.data[i]
+		else:
+			t_prev, beta_prev, B_prev = t[0], beta[0], self.beta_th * t[0]
+		dt = np.diff(t, prepend=t_prev)
+		B = B_prev + np.cumsum(0.5 * (beta + np.concatenate([[beta_prev], beta[:-1]])) * dt)
+		self._t.append(t)
+		self._B.append(B)
+
+	def _locate(self, t):
+		t = np.asarray(t, dtype=float)
+		if len(self) == 0:
+			raise ValueError('empty climate record')
+		if np.any(t > self.t[-1]):
+			raise ValueError('age %g beyond the climate record (last sample %g)' % (np.max(t), self.t[-1]))
+		return t, np.searchsorted(self.t, t, side='right') - 1
+
+	def equivalent_age(self, t):
+		"""B(t) for ages ``t`` up to the last sample."""
+		t, i = self._locate(t)
+		j = np.maximum(i, 0)
+		k = np.minimum(j + 1, len(self) - 1)
+		rec = self.record
+		t_i = self.t[j]
+		beta_i = eq.beta(rec['T'][j], self.UR)
+		dt_k = np.where(k > j, self.t[k] - t_i, 1.0)
+		# beta linear in time within the interval, as in the trapezoidal prefix sum
+		beta_t = beta_i + (eq.beta(rec['T'][k], self.UR) - beta_i) * (t - t_i) / dt_k
+		within = self.B[j] + 0.5 * (beta_i + beta_t) * (t - t_i)
+		return np.where(i < 0, self.beta_th * t, within)
+
+	def at(self, t, name):
+		"""Field ``name`` ('T' or 'h') at ages ``t``, linear between samples."""
+		t, i = self._locate(t)
+		j = np.maximum(i, 0)
+		k = np.minimum(j + 1, len(self) - 1)
+		v = self.record[name]
+		v_j = v[j]
+		f = np.where(k > j, (t - self.t[j]) / np.where(k > j, self.t[k] - self.t[j], 1.0), 0.0)
+		value = v_j + (v[k] - v_j) * f
+		return np.where(i < 0, self.T_cur if name == 'T' else v[0], value)
+
+
+def _gather(A, i, shape):
+	"""A[i] for prefix arrays A of shape (n,) + shape, broadcasting ``i`` against ``shape``."""
+	i = np.asarray(i)
+	out = np.broadcast_shapes(i.shape, shape)
+	index = [np.broadcast_to(i, out)]
+	for k, size in enumerate(shape):
+		view = [1] * len(out)
+		view[len(out) - len(shape) + k] = size
+		index.append(np.arange(size).reshape(view))
+	return A[tuple(index)]
+
+
+class ClimateResponse(object):
+	"""Strains of a ``B4Params``/``B4sParams`` object exposed to a ``Climate`` record.
+
+	Call ``update`` after samples were added to the climate; ages passed to
+	the methods must not be later than the last sample.  ``alfa_t`` and
+	``T_ref`` give the thermal strain alfa_t (T(t) - T_ref); they default to
+	the ``alfa_t`` and ``T_avg`` of ``params``, as in its ``T_infl``.
+	"""
+
+	def __init__(self, params, climate, alfa_t=None, T_ref=None):
+		self.params = params
+		self.climate = climate
+		self.alfa_t = params.alfa_t if alfa_t is None else alfa_t
+		self.T_ref = params.T_avg if T_ref is None else T_ref
+		self.shape = np.broadcast_shapes(np.shape(params.t0), np.shape(params.tau_sh))
+		self._W = _Column(float, self.shape) 	# integral of kh(h) dS at the samples
+		self._U = _Column(float, self.shape) 	# integral of (1 - h) dS at the samples
+		self.update()
+
+	def _B0(self):
+		c = self.climate
+		t0 = np.broadcast_to(self.params.t0, self.shape)
+		inside = t0 <= c.t[-1]
+		# drying not started within the record: S = 0 at every sample so far
+		return np.where(inside, c.equivalent_age(np.where(inside, t0, c.t[-1])), np.inf)
+
+	def _S(self, B, B0):
+		return eq.St(B - B0, self.params.tau_sh)
+
+	def update(self):
+		"""Extend the prefix sums over the samples added to the climate since the last call."""
+		c = self.climate
+		start = len(self._W)
+		if start == len(c):
+			return 0
+		B0 = self._B0()
+		h_all = c.record['h']
+		for i in range(start, len(c), CHUNK):
+			stop = min(i + CHUNK, len(c))
+			B = c.B[i:stop].reshape((-1,) + (1,) * len(self.shape))
+			S = self._S(B, B0)
+			h = np.asarray(h_all[i:stop], dtype=float)
+			if i == 0:
+				# before the first sample: held at the first humidity
+				S_prev, h_prev = np.zeros((1,) + self.shape), h[:1]
+			else:
+				S_prev = self._S(c.B[i - 1], B0)[None]
+				h_prev = np.asarray(h_all[i - 1:i], dtype=float)
+			h_mid = (0.5 * (h + np.concatenate([h_prev, h[:-1]]))).reshape(B.shape)
+			dS = S - np.concatenate([S_prev, S[:-1]])
+			W0 = self._W.data[-1] if len(self._W) else 0.0
+			U0 = self._U.data[-1] if len(self._U) else 0.0
+			self._W.append(W0 + np.cumsum(eq.kh(h_mid) * dS, axis=0))
+			self._U.append(U0 + np.cumsum((1 - h_mid) * dS, axis=0))
+		return len(c) - start
+
+	def _integral(self, A, t, B0, which):
+		c = self.climate
+		t, i = c._locate(t)
+		S = self._S(c.equivalent_age(t), B0)
+		j = np.maximum(i, 0)
+		k = np.minimum(j + 1, len(c) - 1)
+		h = c.record['h']
+		h_mid = np.where(i < 0, h[0], 0.5 * (h[j] + h[k]))
+		weight = eq.kh(h_mid) if which == 'kh' else 1 - h_mid
+		S_j = self._S(c.B[j], B0)
+		value = _gather(A.data, j, self.shape) + weight * (S - S_j)
+		return np.where(i < 0, weight * S, value)
+
+	def ages(self, t, tp=None):
+		"""Equivalent ages (tt, t0t, tpd, td) of Eq. 8 - 10 under the record."""
+		p = self.params
+		tp = p.tp if tp is None else tp
+		c = self.climate
+		t0t = c.equivalent_age(p.t0)
+		td = c.equivalent_age(t)
+		return td - t0t, t0t, c.equivalent_age(tp), td
+
+	def eps_sh(self, t):
+		"""Drying shrinkage, Eq. 14 with the humidity history."""
+		self.update()
+		return self.params.eps_sh_inf * self._integral(self._W, t, self._B0(), 'kh')
+
+	def eps_au(self, t):
+		p = self.params
+		t = np.asarray(t, dtype=float)
+		tt, t0t, _, _ = self.ages(t)
+		return eq.eps_au(p.eps_au_inf, p.tau_au, p.alfa, p.r_t, p._te(t, tt, t0t))
+
+	def H(self, t):
+		"""Pore humidity function of Eq. 37 with the humidity history."""
+		self.update()
+		return 1 - self._integral(self._U, t, self._B0(), 'h')
+
+	def J(self, t, tp=None):
+		"""Compliance function J(t, tp) in 1/MPa, Eq. 27, under the record."""
+		p = self.params
+		t = np.asarray(t, dtype=float)
+		tp = p.tp if tp is None else np.asarray(tp, dtype=float)
+		_, t0t, tpd, td = self.ages(t, tp)
+		c = self.climate
+		with np.errstate(divide='ignore', invalid='ignore'):
+			Rt = np.where(t > tp, (td - tpd) / (t - tp), eq.beta(c.at(tp, 'T'), c.UR)) # Eq. 39, mean over the load
+		C0 = eq.C0(p.q2, p.q3, p.q4, tpd, td, p.kernel)
+		tc = np.maximum(tp, p.t0)
+		Cd = p.q5 * np.maximum(np.exp(-p.p5H * self.H(np.maximum(t, tc))) - np.exp(-p.p5H * self.H(tc)), 0) ** 0.5 * 10**6
+		Cd = np.where(t >= tc, Cd, 0.0) # Eq. 36
+		return eq.J(p.q1, Rt, C0, Cd, tpd, td)
+
+	def T_infl(self, t):
+		return self.alfa_t * (self.climate.at(t, 'T') - self.T_ref)
+
+	def history(self, t, tp=None, sigma=None):
+		t = np.asarray(t, dtype=float)
+		sigma = self.params.sigma if sigma is None else sigma
+		eps_sh = self.eps_sh(t)
+		eps_au = self.eps_au(t)
+		J = self.J(t, tp)
+		T_infl = self.T_infl(t)
+		return History(eps_sh, eps_au, J, T_infl, (J * sigma / MPa) + eps_sh + eps_au + T_infl)
@@ -0,0 +1,28 @@
+"""Vectorized time-series engine for model B4.
+
+``history`` evaluates the same chain as ``RILEM_TC242_Model_B4.py`` (drying
+shrinkage Eq. 14 - 17, autogenous shrinkage Eq. 24 - 26, creep compliance
+Eq. 27 - 38 and total strain Eq. 12) for whole arrays of ages in one pass.
+"""
+
+import numpy as np
+
+from .params import B4Params, History
+
+
+def history(t, tp, t0, fcm, cem_type, c, wc, ac, ro, V, S, h, sigma,
+		specimen='infinite slab', agg_type='', UR=4000, T_cur=20, T_avg=20, T=20, alfa_t=1e-5):
+	"""Strain history of model B4 at ages ``t`` (days).
+
+	``t``, ``tp`` and ``t0`` may be scalars or arrays and broadcast against
+	each other (and against any array-valued numeric input).  Units follow the
+	DATA section of the script: ``fcm`` and ``sigma`` in Pa, ``V`` in m3,
+	``S`` in m2, ``c`` and ``ro`` in T/m3.  ``J`` is returned in 1/MPa.
+
+	Before drying (t < t0) the drying shrinkage is 0 and before loading
+	(t < tp) the compliance is 0, where the script's formulas are undefined.
+	For repeated evaluation of one mix, build a ``B4Params`` once instead.
+	"""
+	model = B4Params(fcm, cem_type, c, wc, ac, ro, V, S, h, agg_type=agg_type, t0=t0, tp=tp, sigma=sigma,
+		specimen=specimen, UR=UR, T_cur=T_cur, T_avg=T_avg, T=T, alfa_t=alfa_t, check=False)
+	return model.history(np.asarray(t, dtype=float))
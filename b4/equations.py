@@ -0,0 +1,170 @@
+"""Vectorized equations of model B4 (RILEM TC-242-MDC, DOI 10.1617/s11527-014-0485-2).
+
+Every function takes scalars or NumPy arrays and broadcasts its arguments,
+so the same code evaluates one age, a whole time series or many mixes.
+Ages are in days, stresses in Pa, compliances in 1/MPa (as in the scripts).
+"""
+
+import numpy as np
+
+from .units import MPa, GPa, mm
+
+T_REF = 293 			# reference temperature in K (20 Celsius degree)
+
+
+# Elasticity modulus
+def E_28(fcm):
+	return 4734 * np.sqrt(fcm / MPa) # ACI Ec_28
+
+
+def E(t, E_28):
+	return E_28 * np.sqrt(t / (4 + (6/7) * t)) # Eq. 19
+
+
+# Humidity dependence, Eq. 20
+def kh(h):
+	h = np.asarray(h, dtype=float)
+	return np.where(h <= 0.98, 1 - h**3, np.where(h <= 1, 12.94 * (1 - h) - 0.2, np.nan))
+
+
+# Equivalent times at different temperatures (also Rt, Eq. 39)
+def beta(T, UR=4000):
+	return np.exp(UR * (1/T_REF - 1/(np.asarray(T, dtype=float) + 273)))
+
+
+# Temperature corrected ages: (Eq. 8 - 10)
+def equivalent_ages(t, t0, tp, beta_th, beta_ts, beta_tc):
+	"""Return (tt, t0t, tpd, td)."""
+	tt = (t - t0) * beta_ts
+	t0t = t0 * beta_th
+	tpd = t0 * beta_th + (tp - t0) * beta_ts
+	td = tpd + (t - tp) * beta_tc
+	return tt, t0t, tpd, td
+
+
+###########################################
+# Shrinkage
+###########################################
+
+def tau_sh(tau_0, k_ta, k_s, D):
+	return tau_0 * k_ta * (k_s * D / mm)**2 # Eq. 21
+
+
+def eps_sh_inf(eps_0, k_ea, E_28, beta_th, beta_ts, t0t, tau_sh):
+	E1 = E(7 * beta_th + 600 * beta_ts, E_28)
+	E2 = E(t0t + tau_sh * beta_ts, E_28)
+	return -eps_0 * k_ea * (E1 / E2) # Eq. 17
+
+
+def St(tt, tau_sh):
+	"""Time curve, Eq. 15; zero before drying begins (tt < 0)."""
+	return np.tanh(np.sqrt(np.maximum(tt, 0) / tau_sh))
+
+
+def eps_sh(eps_sh_inf, kh, tt, tau_sh):
+	return eps_sh_inf * kh * St(tt, tau_sh) # Eq. 14
+
+
+def eps_au(eps_au_inf, tau_au, alfa, r_t, te):
+	"""Autogenous shrinkage, Eq. 24, for the age measure te used by the model.
+
+	For te <= 0 the bracket tends to infinity, so the strain is continued by 0.
+	"""
+	te = np.asarray(te, dtype=float)
+	pos = te > 0
+	with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+		val = eps_au_inf * (1 + (tau_au / np.where(pos, te, 1.0)) ** alfa) ** r_t
+	return np.where(pos, val, 0.0)
+
+
+###########################################
+# Creep
+###########################################
+
+def Q(tpd, td):
+	"""Aging viscoelastic term, Eq. 31 - 35 (zero at td = tpd)."""
+	dt = np.maximum(td - tpd, 0)
+	Qf = (0.086 * tpd ** (2/9) + 1.21 * tpd ** (4/9)) ** (-1)
+	Z = (tpd ** (-0.5)) * np.log1p(dt ** 0.1)
+	r_tp = 1.7 * tpd ** 0.12 + 8
+	with np.errstate(divide='ignore', over='ignore'):
+		return Qf * (1 + (Qf / Z)**r_tp)**(-1/r_tp) # Eq. 32
+
+
+def C0(q2, q3, q4, tpd, td, kernel=None):
+	"""Basic creep compliance, Eq. 29 - 30, in 1/MPa (``kernel`` replaces ``Q``, e.g. a ``QTable``)."""
+	dt = np.maximum(td - tpd, 0)
+	return ((q2 * (kernel or Q)(tpd, td)) + (q3 * np.log1p(dt ** 0.1)) + (q4 * np.log(np.maximum(td, tpd) / tpd))) * 10**6
+
+
+def Cd(q5, p5H, h, tpd, td, t0t, tau_sh):
+	"""Drying creep compliance, Eq. 36 - 38, in 1/MPa (zero for td < max(tpd, t0t))."""
+	t0pd = np.maximum(tpd, t0t)
+	Ht = 1 - (1 - h) * np.tanh(np.sqrt(np.maximum(td - t0t, 0) / tau_sh))
+	Hct = 1 - (1 - h) * np.tanh(np.sqrt((t0pd - t0t) / tau_sh))
+	val = q5 * np.maximum(np.exp(-p5H * Ht) - np.exp(-p5H * Hct), 0) ** 0.5 * 10**6
+	return np.where(td >= t0pd, val, 0.0)
+
+
+def J(q1, Rt, C0, Cd, tpd, td):
+	"""Total creep compliance function, Eq. 27; zero before loading."""
+	return np.where(td >= tpd, q1 + Rt * C0 + Cd, 0.0)
+
+
+###########################################
+# Mix-level quantities
+###########################################
+
+def tau_0(tau_cem, pta, ptw, ptc, ac, wc, c, ro):
+	return tau_cem * (ac / 6) ** pta * (wc / 0.38) ** ptw * ((6.5 * c) / ro) ** ptc # Eq. 22
+
+
+def eps_0(eps_cem, pea, pew, pec, ac, wc, c, ro):
+	return eps_cem * (ac / 6) ** pea * (wc / 0.38) ** pew * ((6.5 * c) / ro) ** pec # Eq. 16
+
+
+def alfa(r_alfa, wc):
+	return r_alfa * (wc / 0.38) # Eq. 24
+
+
+def tau_au(tau_au_cem, r_tw, wc):
+	return tau_au_cem * (wc / 0.38) ** r_tw # Eq. 26
+
+
+def eps_au_inf(eps_au_cem, r_ea, r_ew, ac, wc):
+	return -eps_au_cem * (ac / 6) ** r_ea * (wc / 0.38) ** r_ew # Eq. 25
+
+
+def q1(p1, E_28):
+	return p1 / E_28 # Eq. 28
+
+
+def q2(p2, p2w, wc):
+	return (p2 / GPa) * (wc / 0.38)**p2w # Eq. 40
+
+
+def q3(p3, q2, p3a, p3w, ac, wc):
+	return p3 * q2 * (ac / 6)**p3a * (wc / 0.38)**p3w # Eq. 41
+
+
+def q4(p4, p4a, p4w, ac, wc):
+	return (p4 / GPa) * (ac / 6)**p4a * (wc / 0.38)**p4w # Eq. 42
+
+
+def q5_mix(p5, p5a, p5w, ac, wc):
+	"""``q5`` of Eq. 43 without the factor |kh eps_sh_inf|**p5e."""
+	return (p5 / GPa) * (ac / 6)**p5a * (wc / 0.38)**p5w
+
+
+def q5(q5_mix, p5e, kh, eps_sh_inf):
+	return q5_mix * (np.abs(kh * eps_sh_inf))**p5e # Eq. 43
+
+
+# B4s: the composition enters through the strength only
+def strength_ratio(fcm):
+	return np.asarray(fcm, dtype=float) / (40 * MPa) # Eq. 44
+
+
+def by_strength(value, exponent, f):
+	"""``value`` f**``exponent``, the form of Eq. 44 - 48 (and of ``q2..q5`` of B4s)."""
+	return value * f**exponent
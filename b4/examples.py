@@ -0,0 +1,44 @@
+"""Input data of the scripts' DATA sections (the paper's worked example)."""
+
+from .units import MPa, mm
+
+# RILEM_TC242_Model_B4.py
+B4_EXAMPLE = dict(
+	fcm=27.6 * MPa,
+	cem_type="R",
+	c=0.2193,
+	wc=0.60,
+	ac=7.0,
+	ro=2.350,
+	specimen='infinite slab',
+	V=1.9e7 * mm**3,
+	S=1e6 * mm**2,
+	UR=4000,
+	h=0.50,
+	t0=28,
+	tp=28,
+	T_cur=20,
+	T_avg=20,
+	T=20,
+	alfa_t=1e-5,
+	sigma=-11.03 * MPa,
+	agg_type='',
+)
+
+# RILEM_TC242_Model_B4s.py
+B4S_EXAMPLE = dict(
+	fcm=27.6 * MPa,
+	cem_type="R",
+	specimen='infinite slab',
+	V=19.05 * mm**3,
+	S=1 * mm**2,
+	UR=4000,
+	h=0.50,
+	t0=28,
+	tp=28,
+	T_cur=20,
+	T_avg=20,
+	T=20,
+	alfa_t=1e-5,
+	sigma=-11.03 * MPa,
+)
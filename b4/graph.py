@@ -0,0 +1,273 @@
+"""Lazy evaluation of the model chain as a dependency graph of Eq. 8 - 48.
+
+``B4Params``/``B4sParams`` compute every mix-level quantity up front, and
+the scripts every strain component, although e.g. ``eps_au`` needs neither
+the creep coefficients nor ``tau_sh``.  Here each quantity is a node naming
+the nodes or inputs (the DATA-section names of the scripts, plus the ages
+``t``) it is computed from.  Asking an ``Evaluation`` for some outputs
+evaluates the nodes they need, in dependency order and each once, so nodes
+shared by several outputs (``beta_ts``, ``tau_sh``, ``kh``, the table
+gathers...) are computed a single time; only the inputs those nodes read
+are required.  The equations are those of ``equations`` and the results
+equal those of the parameter objects.
+
+	e = graph.B4.bind(t=t, **mix)
+	e['eps_au'], e['J'] 		# the table gathers, beta_ts, t0t... computed once
+	print(graph.B4.describe(['eps_au']))
+"""
+
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from . import equations as eq
+from . import tables
+from .params import B4Params, _check
+from .units import MPa, GPa
+
+Node = namedtuple('Node', ['name', 'inputs', 'fn', 'ref'])
+
+# defaults of the parameter objects
+DEFAULTS = dict(t0=28, tp=28, sigma=0.0, specimen='infinite slab', UR=4000, T_cur=20, T_avg=20, T=20, alfa_t=1e-5, agg_type='')
+CATEGORICAL = ('cem_type', 'agg_type', 'specimen')
+OUTPUTS = ('eps_sh', 'eps_au', 'J', 'T_infl', 'eps_tot')
+# applicability ranges checked on the nodes or inputs read: (label, low, high, what)
+CHECKS = {
+	'fcm': ('fcm', 15 * MPa, 70 * MPa, 'concrete compressive strength'),
+	'T_avg': ('T_avg', -25, 75, 'average temperature'),
+	'T_cur': ('T_cur', 20, 30, 'curing temperature'),
+	'D': ('V/S', 2 * 12e-3, 2 * 120e-3, 'volume/surface ratio'),
+	'wc': ('wc', 0.22, 0.87, 'w/c ratio'),
+	'ac': ('ac', 1.0, 13.2, 'a/c ratio'),
+	'c': ('c', 0.200, 1.5, 'cement content'),
+}
+
+
+def _common():
+	# nodes shared by B4 and B4s; the mix-level ones are added per model
+	return [
+		Node('cem', ('cem_type',), lambda cem_type: tables.codes(cem_type, tables.CEM_TYPES, 'cement type'), ''),
+		Node('k_s', ('specimen',), lambda specimen: tables.K_S_COLUMN[tables.codes(specimen, tables.SPECIMEN_TYPES, 'specimen')], 'Eq. 21'),
+		Node('D', ('V', 'S'), lambda V, S: 2 * V / S, 'Eq. 21'),
+		Node('E_28', ('fcm',), lambda fcm: eq.E_28(fcm), 'Eq. 19'),
+		Node('kh', ('h',), lambda h: eq.kh(h), 'Eq. 20'),
+		Node('beta_th', ('T_cur', 'UR'), lambda T_cur, UR: eq.beta(T_cur, UR), 'Eq. 8'),
+		Node('beta_ts', ('T_avg', 'UR'), lambda T_avg, UR: eq.beta(T_avg, UR), 'Eq. 9'),
+		# the same factor of T_avg as beta_ts
+		Node('beta_tc', ('beta_ts',), lambda beta_ts: beta_ts, 'Eq. 10'),
+		Node('Rt', ('beta_ts',), lambda beta_ts: beta_ts, 'Eq. 39'),
+		Node('t0t', ('t0', 'beta_th'), lambda t0, beta_th: t0 * beta_th, 'Eq. 8'),
+		Node('tau_sh', ('tau_0', 'k_ta', 'k_s', 'D'), lambda tau_0, k_ta, k_s, D: eq.tau_sh(tau_0, k_ta, k_s, D), 'Eq. 21'),
+		Node('eps_sh_inf', ('eps_0', 'k_ea', 'E_28', 'beta_th', 'beta_ts', 't0t', 'tau_sh'),
+			lambda *args: eq.eps_sh_inf(*args), 'Eq. 17'),
+		Node('q5', ('q5_mix', 'p5e', 'kh', 'eps_sh_inf'), lambda *args: eq.q5(*args), 'Eq. 43'),
+		Node('tt', ('t', 't0', 'beta_ts'), lambda t, t0, beta_ts: (t - t0) * beta_ts, 'Eq. 8'),
+		Node('tpd', ('t0t', 'tp', 't0', 'beta_ts'), lambda t0t, tp, t0, beta_ts: t0t + (tp - t0) * beta_ts, 'Eq. 9'),
+		Node('td', ('tpd', 't', 'tp', 'beta_tc'), lambda tpd, t, tp, beta_tc: tpd + (t - tp) * beta_tc, 'Eq. 10'),
+		Node('eps_sh', ('eps_sh_inf', 'kh', 'tt', 'tau_sh'), lambda *args: eq.eps_sh(*args), 'Eq. 14 - 15'),
+		Node('eps_au', ('eps_au_inf', 'tau_au', 'alfa', 'r_t', 'te'), lambda *args: eq.eps_au(*args), 'Eq. 24'),
+		Node('C0', ('q2', 'q3', 'q4', 'tpd', 'td'), lambda *args: eq.C0(*(args + (B4Params.kernel,))), 'Eq. 29 - 35'),
+		Node('Cd', ('q5', 'p5H', 'h', 'tpd', 'td', 't0t', 'tau_sh'), lambda *args: eq.Cd(*args), 'Eq. 36 - 38'),
+		Node('J', ('q1', 'Rt', 'C0', 'Cd', 'tpd', 'td'), lambda *args: eq.J(*args), 'Eq. 27'),
+		# not broadcast against the ages, unlike ``History.T_infl``
+		Node('T_infl', ('alfa_t', 'T', 'T_avg'), lambda alfa_t, T, T_avg: alfa_t * (T - T_avg), 'Eq. 12'),
+		Node('eps_tot', ('J', 'sigma', 'eps_sh', 'eps_au', 'T_infl'),
+			lambda J, sigma, eps_sh, eps_au, T_infl: J * sigma / MPa + eps_sh + eps_au + T_infl, 'Eq. 12'),
+	]
+
+
+def _b4():
+	ex = tables.B4_CREEP_EXPONENTS
+	return [
+		Node('agg', ('agg_type',), lambda agg_type: tables.codes(agg_type, tables.AGG_KEYS, 'agg_type'), ''),
+		Node('sh', ('cem',), lambda cem: tables.gather(tables.B4_SHRINKAGE_COLUMNS, cem), 'Table 1'),
+		Node('au', ('cem',), lambda cem: tables.gather(tables.B4_AUTOGENOUS_COLUMNS, cem), 'Table 2'),
+		Node('cr', ('cem',), lambda cem: tables.gather(tables.B4_CREEP_COLUMNS, cem), 'Table 3'),
+		Node('ag', ('agg',), lambda agg: tables.gather(tables.AGGREGATE_COLUMNS, agg), 'Table 6'),
+		Node('tau_0', ('sh', 'ac', 'wc', 'c', 'ro'), lambda sh, ac, wc, c, ro:
+			eq.tau_0(sh['tau_cem'], sh['pta'], sh['ptw'], sh['ptc'], ac, wc, c, ro), 'Eq. 22'),
+		Node('k_ta', ('ag',), lambda ag: ag['k_ta'], 'Table 6'),
+		Node('eps_0', ('sh', 'ac', 'wc', 'c', 'ro'), lambda sh, ac, wc, c, ro:
+			eq.eps_0(sh['eps_cem'], sh['pea'], sh['pew'], sh['pec'], ac, wc, c, ro), 'Eq. 16'),
+		Node('k_ea', ('ag',), lambda ag: ag['k_ea'], 'Table 6'),
+		Node('alfa', ('au', 'wc'), lambda au, wc: eq.alfa(au['r_alfa'], wc), 'Eq. 24'),
+		Node('r_t', ('au',), lambda au: au['r_t'], 'Table 2'),
+		Node('tau_au', ('au', 'wc'), lambda au, wc: eq.tau_au(au['tau_au_cem'], au['r_tw'], wc), 'Eq. 26'),
+		Node('eps_au_inf', ('au', 'ac', 'wc'), lambda au, ac, wc:
+			eq.eps_au_inf(au['eps_au_cem'], au['r_ea'], au['r_ew'], ac, wc), 'Eq. 25'),
+		Node('p5H', ('cr',), lambda cr: cr['p5H'], 'Table 3'),
+		Node('q1', ('cr', 'E_28'), lambda cr, E_28: eq.q1(cr['p1'], E_28), 'Eq. 28'),
+		Node('q2', ('cr', 'wc'), lambda cr, wc: eq.q2(cr['p2'], ex['p2w'], wc), 'Eq. 40'),
+		Node('q3', ('cr', 'q2', 'ac', 'wc'), lambda cr, q2, ac, wc: eq.q3(cr['p3'], q2, ex['p3a'], ex['p3w'], ac, wc), 'Eq. 41'),
+		Node('q4', ('cr', 'ac', 'wc'), lambda cr, ac, wc: eq.q4(cr['p4'], ex['p4a'], ex['p4w'], ac, wc), 'Eq. 42'),
+		Node('q5_mix', ('cr', 'ac', 'wc'), lambda cr, ac, wc: eq.q5_mix(cr['p5'], ex['p5a'], ex['p5w'], ac, wc), 'Eq. 43'),
+		Node('p5e', (), lambda: ex['p5e'], 'Table 3'),
+		# the script measures autogenous age as tt - t0t
+		Node('te', ('tt', 't0t'), lambda tt, t0t: tt - t0t, 'Eq. 24'),
+	]
+
+
+def _b4s():
+	au = tables.B4S_AUTOGENOUS
+	return [
+		Node('f', ('fcm',), lambda fcm: eq.strength_ratio(fcm), 'Eq. 44'),
+		Node('sh', ('cem',), lambda cem: tables.gather(tables.B4S_SHRINKAGE_COLUMNS, cem), 'Table 8'),
+		Node('cr', ('cem',), lambda cem: tables.gather(tables.B4S_CREEP_COLUMNS, cem), 'Table 9'),
+		Node('tau_0', ('sh', 'f'), lambda sh, f: eq.by_strength(sh['tau_s_cem'], sh['s_tf'], f), 'Eq. 45'),
+		Node('k_ta', (), lambda: 1.0, 'Eq. 45'),
+		Node('eps_0', ('sh', 'f'), lambda sh, f: eq.by_strength(sh['eps_scem'], sh['s_ef'], f), 'Eq. 44'),
+		Node('k_ea', (), lambda: 1.0, 'Eq. 44'),
+		Node('alfa', (), lambda: au['alfa_s'], 'Table 7'),
+		Node('r_t', (), lambda: au['r_t'], 'Table 7'),
+		Node('tau_au', ('f',), lambda f: eq.by_strength(au['tau_au_cem'], au['r_tf'], f), 'Eq. 48'),
+		Node('eps_au_inf', ('f',), lambda f: eq.by_strength(-au['eps_au_cem'], au['r_ef'], f), 'Eq. 47'),
+		Node('p5H', ('cr',), lambda cr: cr['p5H'], 'Table 9'),
+		Node('q1', ('cr', 'E_28'), lambda cr, E_28: eq.q1(cr['p1'], E_28), 'Eq. 28'),
+		Node('q2', ('cr', 'f'), lambda cr, f: eq.by_strength(cr['s2'] / GPa, cr['s2f'], f), 'Eq. 40'),
+		Node('q3', ('cr', 'q2', 'f'), lambda cr, q2, f: eq.by_strength(cr['s3'] * q2, cr['s3f'], f), 'Eq. 41'),
+		Node('q4', ('cr', 'f'), lambda cr, f: eq.by_strength(cr['s4'] / GPa, cr['s4f'], f), 'Eq. 42'),
+		Node('q5_mix', ('cr', 'f'), lambda cr, f: eq.by_strength(cr['s5'] / GPa, cr['s5f'], f), 'Eq. 43'),
+		Node('p5e', (), lambda: tables.p5c, 'Table 3'),
+		# Eq. 46 as in the script: t + t0
+		Node('te', ('t', 't0'), lambda t, t0: t + t0, 'Eq. 46'),
+	]
+
+
+class Graph(object):
+	"""Nodes of one model's chain; ``bind`` inputs to evaluate them lazily."""
+
+	def __init__(self, model, nodes):
+		self.model = model
+		self.nodes = OrderedDict((node.name, node) for node in nodes)
+		self.inputs = tuple(sorted(set(name for node in nodes for name in node.inputs if name not in self.nodes)))
+
+	def order(self, outputs):
+		"""Nodes needed for ``outputs``, each after the nodes it reads."""
+		unknown = [name for name in outputs if name not in self.nodes]
+		if unknown:
+			raise ValueError('%s has no node %s' % (self.model, ', '.join(unknown)))
+		order, seen = [], set()
+		for output in outputs:
+			stack = [(output, False)]
+			while stack:
+				name, done = stack.pop()
+				if done:
+					order.append(name)
+				elif name not in seen:
+					seen.add(name)
+					stack.append((name, True))
+					stack.extend((n, False) for n in reversed(self.nodes[name].inputs) if n in self.nodes and n not in seen)
+		return order
+
+	def requires(self, outputs):
+		"""Inputs read by the nodes needed for ``outputs``."""
+		return tuple(sorted(set(name for node in self.order(outputs) for name in self.nodes[node].inputs if name not in self.nodes)))
+
+	def bind(self, check=True, **inputs):
+		"""An ``Evaluation`` of the nodes for ``inputs`` (missing ones take the parameter objects' defaults)."""
+		return Evaluation(self, inputs, check)
+
+	def evaluate(self, outputs, check=True, **inputs):
+		"""Dict of the ``outputs`` for ``inputs``, computing only the nodes they need."""
+		e = self.bind(check, **inputs).compute(outputs, release=True)
+		return dict((name, e[name]) for name in outputs)
+
+	def describe(self, outputs=None):
+		"""The nodes (needed for ``outputs``, default all) with their inputs and equations, as text."""
+		names = self.order(outputs) if outputs is not None else list(self.nodes)
+		return '\n'.join('%-11s %-9s <- %s' % (name, self.nodes[name].ref, ', '.join(self.nodes[name].inputs) or '(constant)')
+			for name in names)
+
+	def dot(self, outputs=None):
+		"""The graph (needed for ``outputs``, default all) in Graphviz format, inputs as boxes."""
+		names = self.order(outputs) if outputs is not None else list(self.nodes)
+		lines = ['digraph %s {' % self.model]
+		for name in sorted(set(n for node in names for n in self.nodes[node].inputs if n not in self.nodes)):
+			lines.append('\t"%s" [shape=box];' % name)
+		for name in names:
+			lines.extend('\t"%s" -> "%s";' % (n, name) for n in self.nodes[name].inputs)
+		lines.append('}')
+		return '\n'.join(lines)
+
+
+class Evaluation(object):
+	"""Nodes of ``graph`` for one set of inputs, computed on first access and kept.
+
+	``e[name]`` evaluates ``name`` and whatever it needs that is not known
+	yet; ``computed`` lists the nodes evaluated so far, in order.
+	"""
+
+	def __init__(self, graph, inputs, check=True):
+		unknown = [name for name in inputs if name not in graph.inputs]
+		if unknown:
+			raise ValueError('%s is not an input of %s' % (', '.join(unknown), graph.model))
+		self.graph = graph
+		self.inputs = inputs
+		self.check = check
+		self.values = OrderedDict()
+		self._checked = set()
+
+	@property
+	def computed(self):
+		return tuple(self.values)
+
+	def _input(self, name):
+		if name in self.values:
+			return self.values[name]
+		value = self.inputs[name] if name in self.inputs else DEFAULTS[name]
+		if name not in CATEGORICAL:
+			value = np.asarray(value, dtype=float)
+			if name == 'h' and np.any((value < 0) | (value > 1)):
+				raise ValueError('error h (relative humidity must be within 0 and 1)')
+		self.values[name] = value
+		return value
+
+	def __getitem__(self, name):
+		if name in self.values:
+			return self.values[name]
+		if name in self.graph.inputs:
+			return self._input(name)
+		self.compute([name])
+		return self.values[name]
+
+	def compute(self, outputs, release=False):
+		"""Evaluate the nodes needed for ``outputs`` not known yet.
+
+		With ``release`` the other nodes are dropped after their last use
+		(less memory traffic for one-shot batches, nothing left to reuse).
+		"""
+		order = [node for node in self.graph.order(outputs) if node not in self.values]
+		needed = set(n for node in order for n in self.graph.nodes[node].inputs if n not in self.graph.nodes)
+		missing = sorted(n for n in needed if n not in self.inputs and n not in DEFAULTS)
+		if missing:
+			raise ValueError('missing input(s) for %s: %s' % (', '.join(outputs), ', '.join(missing)))
+		last = {}
+		if release:
+			for k, node in enumerate(order):
+				last.update((a, k) for a in self.graph.nodes[node].inputs if a not in outputs)
+		for k, node in enumerate(order):
+			n = self.graph.nodes[node]
+			value = n.fn(*[self.values[a] if a in self.values else self._input(a) for a in n.inputs])
+			self.values[node] = value
+			if self.check:
+				for key in (node,) + n.inputs:
+					if key in CHECKS and key not in self._checked:
+						self._checked.add(key)
+						label, low, high, what = CHECKS[key]
+						_check(label, self.values[key], low, high, what)
+			for a in n.inputs:
+				if last.get(a) == k:
+					del self.values[a]
+		return self
+
+
+B4 = Graph('B4', _common() + _b4())
+B4S = Graph('B4s', _common() + _b4s())
+GRAPHS = {'B4': B4, 'B4s': B4S}
+
+
+def evaluate(model, outputs, check=True, **inputs):
+	"""``outputs`` (names of nodes, e.g. ``OUTPUTS``) of ``model`` ('B4' or 'B4s') for ``inputs``."""
+	if model not in GRAPHS:
+		raise ValueError("model must be 'B4' or 'B4s'")
+	return GRAPHS[model].evaluate(outputs, check, **inputs)
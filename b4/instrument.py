@@ -0,0 +1,144 @@
+"""Opt-in instrumentation of the model equations.
+
+``enable()`` wraps the functions of ``equations`` (every module calls them
+as ``eq.<name>``, so all evaluation paths are covered) with counters of
+calls, elements returned and exclusive wall time (time spent in a nested
+equation is booked to that one), grouped by the equations of the paper.
+``disable()`` restores the plain functions, so there is no overhead at all
+when instrumentation is off.
+
+	from b4 import instrument
+	with instrument.enabled():
+		model.history(t)
+	print(instrument.prometheus())
+"""
+
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from . import equations as eq
+
+GROUPS = OrderedDict([
+	('Eq. 14-17', ('tau_sh', 'eps_sh_inf', 'St', 'eps_sh')), 	# drying shrinkage
+	('Eq. 19-20', ('E_28', 'E', 'kh')), 				# stiffness, humidity
+	('Eq. 24-26', ('eps_au',)), 					# autogenous shrinkage
+	('Eq. 27-35', ('Q', 'C0', 'J')), 				# basic creep
+	('Eq. 36-38', ('Cd',)), 					# drying creep
+	('Eq. 8-10, 39', ('beta', 'equivalent_ages')), 		# temperature
+])
+
+_original = {}
+_stats = {}
+_local = threading.local()
+
+
+def _reset_stats():
+	for group, names in GROUPS.items():
+		for name in names:
+			_stats[name] = [0, 0, 0.0] 	# calls, elements, seconds
+
+
+_reset_stats()
+
+
+def _wrap(name, fn):
+	stats = _stats[name]
+
+	@functools.wraps(fn)
+	def wrapper(*args, **kwargs):
+		stack = getattr(_local, 'stack', None)
+		if stack is None:
+			stack = _local.stack = []
+		stack.append(0.0)
+		start = time.perf_counter()
+		try:
+			result = fn(*args, **kwargs)
+		finally:
+			elapsed = time.perf_counter() - start
+			nested = stack.pop()
+			if stack:
+				stack[-1] += elapsed
+			stats[0] += 1
+			stats[2] += elapsed - nested
+		stats[1] += int(np.size(result[0] if isinstance(result, tuple) else result))
+		return result
+	return wrapper
+
+
+def enable():
+	"""Start counting (statistics accumulate until ``reset``)."""
+	for names in GROUPS.values():
+		for name in names:
+			if name not in _original:
+				_original[name] = getattr(eq, name)
+				setattr(eq, name, _wrap(name, _original[name]))
+
+
+def disable():
+	"""Stop counting and restore the uninstrumented equations."""
+	for name, fn in _original.items():
+		setattr(eq, name, fn)
+	_original.clear()
+
+
+def is_enabled():
+	return bool(_original)
+
+
+def reset():
+	_reset_stats()
+
+
+@contextmanager
+def enabled():
+	"""Instrument the equations within a ``with`` block."""
+	was = is_enabled()
+	enable()
+	try:
+		yield
+	finally:
+		if not was:
+			disable()
+
+
+def snapshot():
+	"""Per group: calls, elements, seconds and the same per function."""
+	out = OrderedDict()
+	for group, names in GROUPS.items():
+		functions = OrderedDict((name, dict(calls=_stats[name][0], elements=_stats[name][1], seconds=_stats[name][2]))
+			for name in names)
+		out[group] = dict(
+			calls=sum(f['calls'] for f in functions.values()),
+			elements=sum(f['elements'] for f in functions.values()),
+			seconds=sum(f['seconds'] for f in functions.values()),
+			functions=functions)
+	return out
+
+
+def to_json(**kwargs):
+	return json.dumps(snapshot(), **kwargs)
+
+
+def prometheus(prefix='b4_equation'):
+	"""Text exposition format (counters per group and function)."""
+	metrics = (
+		('calls', 'calls_total', 'Calls of the model equations.'),
+		('elements', 'elements_total', 'Array elements returned by the model equations.'),
+		('seconds', 'seconds_total', 'Exclusive wall time spent in the model equations.'),
+	)
+	lines = []
+	snap = snapshot()
+	for key, suffix, text in metrics:
+		name = '%s_%s' % (prefix, suffix)
+		lines.append('# HELP %s %s' % (name, text))
+		lines.append('# TYPE %s counter' % name)
+		for group, data in snap.items():
+			for function, values in data['functions'].items():
+				lines.append('%s{group="%s",function="%s"} %s' % (name, group, function, repr(values[key])))
+	return '\n'.join(lines) + '\n'
@@ -0,0 +1,126 @@
+"""Inverse design queries: ages at which a strain is reached, loading ages for a creep limit.
+
+Shrinkage (Eq. 14 - 15) and autogenous shrinkage (Eq. 24) invert in closed
+form:
+
+	tt = tau_sh * artanh(f)**2,   te = tau_au / (f**(1/r_t) - 1)**(1/alfa)
+
+for a fraction ``f`` of the final value.  The compliance has no closed-form
+inverse; ``solve`` finds the root of a monotone function with Newton steps
+kept inside a bracket (bisection when a step leaves it), on the logarithm
+of the age.  Everything is vectorized, so one call answers the query for a
+whole batch of mixes (parameter objects built from arrays).  Ages that are
+never reached come back as ``inf``, infeasible queries as ``nan``.
+"""
+
+import numpy as np
+
+from .units import MPa
+
+
+def shrinkage_time(params, fraction):
+	"""Age at which drying shrinkage reaches ``fraction`` of its final value kh eps_sh_inf.
+
+	For a fraction of ``eps_sh_inf`` itself pass ``fraction / params.kh``.
+	"""
+	f = np.asarray(fraction, dtype=float)
+	with np.errstate(divide='ignore', invalid='ignore'):
+		tt = params.tau_sh * np.arctanh(np.clip(f, 0, 1)) ** 2
+		t = params.t0 + tt / params.beta_ts
+	return np.where((f >= 0) & (f <= 1), t, np.nan)
+
+
+def _te_map(params):
+	# te(t) is affine in t for both models (B4: tt - t0t, B4s: t + t0)
+	def te(t):
+		t = np.asarray(t, dtype=float)
+		return params._te(t, (t - params.t0) * params.beta_ts, params.t0t)
+	b = te(0.0)
+	return te(1.0) - b, b
+
+
+def autogenous_time(params, fraction):
+	"""Age at which autogenous shrinkage reaches ``fraction`` of ``eps_au_inf``."""
+	f = np.asarray(fraction, dtype=float)
+	a, b = _te_map(params)
+	with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+		te = params.tau_au / (f ** (1 / params.r_t) - 1) ** (1 / params.alfa)
+		t = (np.where(f >= 1, np.inf, te) - b) / a
+	# B4s measures te = t + t0: small fractions are reached 'before' casting
+	return np.where((f > 0) & (f <= 1), np.maximum(t, 0), np.nan)
+
+
+def solve(f, lo, hi, tol=1e-12, max_iter=100, log=True):
+	"""Root of the monotone vectorized ``f`` between ``lo`` and ``hi``.
+
+	Newton steps (finite-difference slope) on ln x (``log``) or x, safeguarded
+	by the bracket as in ``rtsafe`` (Numerical Recipes); ``nan`` where f(lo)
+	and f(hi) have the same sign.
+	"""
+	lo, hi = np.broadcast_arrays(np.asarray(lo, dtype=float), np.asarray(hi, dtype=float))
+	fwd, inv = (np.log, np.exp) if log else (lambda x: x, lambda x: x)
+	g = lambda x: f(inv(x))
+	a, b = fwd(lo), fwd(hi)
+	fa, fb = g(a), g(b)
+	shape = np.broadcast(a, fa, fb).shape
+	a, b, fa, fb = (np.array(np.broadcast_to(v, shape)) for v in (a, b, fa, fb))
+	ok = np.sign(fa) != np.sign(fb)
+	exact_a, exact_b = fa == 0, fb == 0
+	x = 0.5 * (a + b)
+	dx = dx_old = b - a
+	for _ in range(max_iter):
+		fx = np.broadcast_to(g(x), shape)
+		left = np.sign(fx) == np.sign(fa)
+		a = np.where(left, x, a)
+		fa = np.where(left, fx, fa)
+		b = np.where(left, b, x)
+		h = 1e-7 * np.maximum(np.abs(x), 1.0)
+		with np.errstate(divide='ignore', invalid='ignore'):
+			step = fx * h / (np.broadcast_to(g(x + h), shape) - fx)
+			x_new = x - step
+		# bisect when Newton leaves the bracket or does not halve the step of two iterations ago
+		bisect = ~((x_new > a) & (x_new < b)) | ~(2 * np.abs(step) <= np.abs(dx_old))
+		x_new = np.where(bisect, 0.5 * (a + b), x_new)
+		dx_old, dx = dx, x_new - x
+		done = np.abs(dx) <= tol * np.maximum(np.abs(x), 1.0)
+		x = x_new
+		if np.all(done | ~ok):
+			break
+	x = np.where(exact_a, fwd(lo), np.where(exact_b, fwd(hi), x))
+	return np.where(ok | exact_a | exact_b, inv(x), np.nan)
+
+
+def _J_max(params, J_max, strain, sigma):
+	if (J_max is None) == (strain is None):
+		raise ValueError('give either J_max (1/MPa) or strain')
+	if J_max is not None:
+		return np.asarray(J_max, dtype=float)
+	sigma = params.sigma if sigma is None else np.asarray(sigma, dtype=float)
+	return np.abs(np.asarray(strain, dtype=float)) / (np.abs(sigma) / MPa)
+
+
+def loading_age(params, t, J_max=None, strain=None, sigma=None, tp_min=1.0):
+	"""Earliest loading age tp >= ``tp_min`` with J(t, tp) <= J_max at age ``t``.
+
+	The limit is a compliance ``J_max`` (1/MPa) or a creep ``strain`` under
+	``sigma`` (Pa, default: the applied stress).  Returns ``tp_min`` when
+	loading then already satisfies the limit and ``nan`` when even the
+	instantaneous compliance q1 exceeds it.
+	"""
+	J_max = _J_max(params, J_max, strain, sigma)
+	t = np.asarray(t, dtype=float)
+	f = lambda tp: params.J(t, tp) - J_max
+	hi = t * (1 - 1e-12)
+	tp = solve(f, tp_min, hi)
+	return np.where(f(tp_min) <= 0, tp_min, tp)
+
+
+def creep_time(params, J_max=None, strain=None, sigma=None, tp=None, t_max=1e6):
+	"""Age at which J(t, tp) reaches J_max (or J sigma reaches ``strain``); ``inf`` if not before the age ``t_max``."""
+	J_max = _J_max(params, J_max, strain, sigma)
+	tp = params.tp if tp is None else np.asarray(tp, dtype=float)
+	f = lambda dt: params.J(tp + dt, tp) - J_max
+	# the search runs over the load duration dt, up to the age t_max
+	dt_max = np.maximum(np.asarray(t_max, dtype=float) - tp, 1e-9)
+	dt = solve(f, 1e-9, dt_max)
+	return np.where(f(dt_max) < 0, np.inf, np.where(f(1e-9) >= 0, tp, tp + dt))
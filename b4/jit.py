@@ -0,0 +1,200 @@
+"""Scalar kernels of the model chain for tight loops, compiled with Numba when it is installed.
+
+Finite-element user-material hooks evaluate the chain once per integration
+point and step, where the per-call overhead of NumPy dominates.  These
+kernels use the ``math`` module only: with Numba they are ``njit``-compiled
+with ``cache=True`` (machine code is cached on disk, so only the first run
+compiles), and the ``*_batch`` variants run their points in parallel with
+``prange``.  Without Numba the same functions run as plain Python, for
+scalars still several times faster than the NumPy path.
+
+	p = jit.pack(B4Params(**mix)) 		# tuple of the mix-level quantities
+	eps_sh, eps_au, J = jit.strains(t, tp, p)
+
+The results equal those of ``B4Params``/``B4sParams`` to rounding.
+"""
+
+import math
+
+import numpy as np
+
+try:
+	import numba
+except ImportError:
+	numba = None
+
+from .equations import T_REF
+from .units import MPa
+
+ENABLED = numba is not None
+
+# fields of a packed mix (see pack); the autogenous age measure is te = TE_A t + TE_B
+FIELDS = ('t0', 'beta_ts', 'beta_tc', 't0t', 'tau_sh', 'eps_sh_inf', 'kh', 'te_a', 'te_b', 'eps_au_inf', 'tau_au',
+	'alfa', 'r_t', 'q1', 'q2', 'q3', 'q4', 'q5', 'p5H', 'h', 'Rt')
+(T0, BETA_TS, BETA_TC, T0T, TAU_SH, EPS_SH_INF, KH, TE_A, TE_B, EPS_AU_INF, TAU_AU,
+	ALFA, R_T, Q1, Q2, Q3, Q4, Q5, P5H, H, RT) = range(len(FIELDS))
+
+
+def _jit(fn):
+	return numba.njit(cache=True)(fn) if numba is not None else fn
+
+
+def _jit_parallel(fn):
+	return numba.njit(cache=True, parallel=True)(fn) if numba is not None else fn
+
+
+prange = numba.prange if numba is not None else range
+
+
+###########################################
+# Equations
+###########################################
+
+@_jit
+def E(t, E_28):
+	return E_28 * math.sqrt(t / (4 + (6 / 7) * t)) # Eq. 19
+
+
+@_jit
+def kh(h):
+	if h <= 0.98:
+		return 1 - h**3 # Eq. 20
+	if h <= 1:
+		return 12.94 * (1 - h) - 0.2
+	return math.nan
+
+
+@_jit
+def beta(T, UR):
+	return math.exp(UR * (1 / T_REF - 1 / (T + 273))) # Eq. 8 - 10, 39
+
+
+@_jit
+def eps_sh(eps_sh_inf, kh, tt, tau_sh):
+	if tt <= 0:
+		return 0.0 * eps_sh_inf
+	return eps_sh_inf * kh * math.tanh(math.sqrt(tt / tau_sh)) # Eq. 14 - 15
+
+
+@_jit
+def eps_au(eps_au_inf, tau_au, alfa, r_t, te):
+	if te <= 0:
+		return 0.0
+	x = alfa * math.log(tau_au / te)
+	if x > 700:
+		return 0.0 * eps_au_inf 	# (1 + e**x)**r_t underflows
+	return eps_au_inf * (1 + (tau_au / te) ** alfa) ** r_t # Eq. 24
+
+
+@_jit
+def Q(tpd, td):
+	dt = max(td - tpd, 0.0)
+	Qf = 1 / (0.086 * tpd ** (2 / 9) + 1.21 * tpd ** (4 / 9))
+	Z = tpd ** -0.5 * math.log1p(dt ** 0.1)
+	if Z == 0:
+		return 0.0
+	r_tp = 1.7 * tpd ** 0.12 + 8
+	if r_tp * math.log(Qf / Z) > 700:
+		return Z 			# (1 + X)**(-1/r) = X**(-1/r) to double precision
+	return Qf * (1 + (Qf / Z) ** r_tp) ** (-1 / r_tp) # Eq. 31 - 35
+
+
+@_jit
+def C0(q2, q3, q4, tpd, td):
+	dt = max(td - tpd, 0.0)
+	return (q2 * Q(tpd, td) + q3 * math.log1p(dt ** 0.1) + q4 * math.log(max(td, tpd) / tpd)) * 1e6 # Eq. 29 - 30
+
+
+@_jit
+def Cd(q5, p5H, h, tpd, td, t0t, tau_sh):
+	t0pd = max(tpd, t0t)
+	if td < t0pd:
+		return 0.0
+	Ht = 1 - (1 - h) * math.tanh(math.sqrt(max(td - t0t, 0.0) / tau_sh))
+	Hct = 1 - (1 - h) * math.tanh(math.sqrt((t0pd - t0t) / tau_sh))
+	return q5 * math.sqrt(max(math.exp(-p5H * Ht) - math.exp(-p5H * Hct), 0.0)) * 1e6 # Eq. 36 - 38
+
+
+###########################################
+# Chain
+###########################################
+
+@_jit
+def compliance(t, tp, p):
+	"""J(t, tp) in 1/MPa, Eq. 27, for the packed mix ``p``."""
+	tpd = p[T0T] + (tp - p[T0]) * p[BETA_TS]
+	td = tpd + (t - tp) * p[BETA_TC]
+	if td < tpd:
+		return 0.0
+	return p[Q1] + p[RT] * C0(p[Q2], p[Q3], p[Q4], tpd, td) + Cd(p[Q5], p[P5H], p[H], tpd, td, p[T0T], p[TAU_SH])
+
+
+@_jit
+def strains(t, tp, p):
+	"""``(eps_sh, eps_au, J)`` at age ``t`` under load from ``tp`` for the packed mix ``p``."""
+	tt = (t - p[T0]) * p[BETA_TS]
+	return (eps_sh(p[EPS_SH_INF], p[KH], tt, p[TAU_SH]),
+		eps_au(p[EPS_AU_INF], p[TAU_AU], p[ALFA], p[R_T], p[TE_A] * t + p[TE_B]),
+		compliance(t, tp, p))
+
+
+@_jit
+def eps_tot(t, tp, sigma, p):
+	"""Load and shrinkage part of Eq. 12 (``sigma`` in Pa, thermal strain not included)."""
+	s, a, J = strains(t, tp, p)
+	return J * sigma / MPa + s + a
+
+
+@_jit_parallel
+def strains_batch(t, tp, P, out):
+	"""``strains`` for every point ``i``: ages ``t[i]``, ``tp[i]``, mix row ``P[i]``; fills ``out`` (n, 3)."""
+	for i in prange(t.shape[0]):
+		s, a, J = strains(t[i], tp[i], P[i])
+		out[i, 0] = s
+		out[i, 1] = a
+		out[i, 2] = J
+	return out
+
+
+@_jit_parallel
+def Q_batch(tpd, td, out):
+	for i in prange(tpd.shape[0]):
+		out[i] = Q(tpd[i], td[i])
+	return out
+
+
+###########################################
+# Packing
+###########################################
+
+def pack(params):
+	"""Mix-level quantities of a ``B4Params``/``B4sParams`` in the order of ``FIELDS``.
+
+	A tuple of floats for scalar parameters (fastest for scalar calls, also
+	without Numba), else an array with one row per mix (``params`` shape
+	flattened).
+	"""
+	from .inverse import _te_map
+	te_a, te_b = _te_map(params)
+	values = dict(te_a=te_a, te_b=te_b)
+	columns = np.broadcast_arrays(*[np.asarray(values[name] if name in values else getattr(params, name), dtype=float)
+		for name in FIELDS])
+	if columns[0].ndim == 0:
+		return tuple(float(c) for c in columns)
+	return np.ascontiguousarray(np.stack([c.ravel() for c in columns], axis=-1))
+
+
+def evaluate(t, tp, P, out=None):
+	"""``strains_batch`` over broadcast ``t``, ``tp`` and rows ``P``: ``(eps_sh, eps_au, J)`` arrays.
+
+	Without Numba this is a Python loop; large batches are then faster
+	through the parameter objects.
+	"""
+	P = np.atleast_2d(np.asarray(P, dtype=float))
+	t, tp, rows = np.broadcast_arrays(np.asarray(t, dtype=float), np.asarray(tp, dtype=float), np.arange(len(P)))
+	shape = t.shape
+	t, tp, rows = (np.ascontiguousarray(a.ravel()) for a in (t, tp, rows))
+	if out is None:
+		out = np.empty((t.size, 3))
+	strains_batch(t, tp, P[rows], out)
+	return tuple(out[:, k].reshape(shape) for k in range(3))
@@ -0,0 +1,151 @@
+"""Kelvin-chain (Dirichlet series) approximation of the basic creep compliance.
+
+The non-aging microprestress kernel Phi(xi) = ln(1 + xi**n), n = 0.1, of the
+basic creep compliance (Eq. 29 - 35) is expanded into a Kelvin chain from
+its continuous retardation spectrum (Widder's approximate inversion formula
+of order k = 3, Bazant & Xi 1995).  Following the solidification theory the
+aging term ``q2 Q(t, t')`` is the same chain seen through the age-dependent
+factor ``q2 / sqrt(t)``, i.e. the chain moduli grow with age:
+
+	d eps_v = (q2 t**-0.5 + q3) d gamma,   gamma = sum of Kelvin unit strains
+
+and flow (``q4 ln(t/t')``) is an aging dashpot of viscosity t/q4.  The rate
+type ``Integrator`` advances the internal variables with the exponential
+algorithm, so a stress history of N steps costs O(N) time and O(units)
+memory per integration point instead of the O(N**2) hereditary integral.
+
+Only the basic creep ``q1 + Rt C0`` is represented; drying creep ``Cd``
+(Eq. 36 - 38) is not of hereditary form and is left out.  Times are ages
+in days, stresses in Pa, compliances in 1/MPa.
+"""
+
+import math
+
+import numpy as np
+
+from . import equations as eq
+from .units import MPa
+
+N_EXP = 0.1 		# exponent n of the microprestress kernel (Eq. 30)
+
+
+def spectrum(tau, n=N_EXP):
+	"""Continuous retardation spectrum L(tau) of ln(1 + xi**n), Widder's formula with k = 3."""
+	u = (3 * np.asarray(tau, dtype=float)) ** n
+	return (u / 2) * (n*(n - 1)*(n - 2) / (1 + u) - 3 * n**2 * (n - 1) * u / (1 + u)**2 + 2 * n**3 * u**2 / (1 + u)**3)
+
+
+class KelvinChain(object):
+	"""Kelvin chain fitted to the basic creep compliance of one parameter object.
+
+	``tau`` are the retardation times (equivalent days, one per decade) and
+	``A`` the unit compliances of the non-aging kernel; ``A0`` is a spring
+	collecting the part of the spectrum faster than ``tau[0]``.  ``error``
+	reports the approximation error against the exact compliance.
+	"""
+
+	def __init__(self, params, tau_1=1e-4, n_units=12):
+		self.params = params
+		self.tau = tau_1 * 10.0 ** np.arange(n_units)
+		self.A = spectrum(self.tau) * math.log(10)
+		# spectrum below the first unit: integrate L over ln(tau) down to tau_1 * 1e-20
+		s = np.linspace(math.log(tau_1) - 20 * math.log(10), math.log(tau_1) - 0.5 * math.log(10), 2001)
+		L = spectrum(np.exp(s))
+		self.A0 = float(np.sum((L[1:] + L[:-1]) / 2 * np.diff(s)) + L[0] / N_EXP)
+		# Widder's formula overestimates by about 1 %; least-squares rescale over the covered range
+		xi = np.geomspace(self.tau[0], self.tau[-1], 200)
+		chain, exact = self.phi(xi), np.log1p(xi ** N_EXP)
+		scale = np.dot(chain, exact) / np.dot(chain, chain)
+		self.A = self.A * scale
+		self.A0 = self.A0 * scale
+		Rt = params.Rt
+		self.q1 = params.q1
+		self.a2 = params.q2 * Rt * 10**6
+		self.a3 = params.q3 * Rt * 10**6
+		self.a4 = params.q4 * Rt * 10**6
+
+	def te(self, t):
+		"""Equivalent creep age (Eq. 9 - 10) of the actual age ``t``."""
+		p = self.params
+		t = np.asarray(t, dtype=float)
+		return np.where(t <= p.t0, t * p.beta_th, p.t0t + (t - p.t0) * p.beta_tc)
+
+	def phi(self, xi):
+		"""The chain's approximation of ln(1 + xi**n)."""
+		xi = np.asarray(xi, dtype=float)[..., None]
+		return self.A0 + np.sum(self.A * (1 - np.exp(-xi / self.tau)), axis=-1)
+
+	def integrator(self, shape=()):
+		return Integrator(self, shape)
+
+	def compliance(self, t, tp, steps_per_decade=10):
+		"""J(t, tp) of the chain (basic creep only) by integrating a unit stress step.
+
+		The step response is integrated on a log-spaced grid of load
+		durations refined by ``steps_per_decade``; ``t`` must not be earlier
+		than ``tp``.
+		"""
+		t = np.asarray(t, dtype=float)
+		duration = np.maximum(t - tp, 0)
+		decades = max(math.log10(max(float(duration.max()), 1e-3) / 1e-3), 1)
+		grid = np.unique(np.concatenate([tp + np.geomspace(1e-3, 1e-3 * 10**decades, int(decades * steps_per_decade) + 1),
+			tp + duration.ravel()]))
+		state = self.integrator()
+		state.step(tp, MPa)
+		J = np.array([float(state.step(ti, MPa)) for ti in grid])
+		return J[np.searchsorted(grid, tp + duration)]
+
+	def exact(self, t, tp):
+		"""Exact basic creep compliance q1 + Rt C0 (Eq. 27 without Cd)."""
+		p = self.params
+		tpd = self.te(tp)
+		td = self.te(t)
+		return eq.J(p.q1, p.Rt, eq.C0(p.q2, p.q3, p.q4, tpd, td), 0.0, tpd, td)
+
+	def error(self, t, tp):
+		"""Largest relative error of the chain against the exact compliance at ages ``t``."""
+		exact = self.exact(t, tp)
+		return float(np.max(np.abs(self.compliance(t, tp) - exact) / exact))
+
+
+class Integrator(object):
+	"""Rate-type creep integrator for one or many integration points.
+
+	State per point: the current stress, the Kelvin unit strains and the
+	creep strain, i.e. O(units) memory.  Call ``step`` with each new age and
+	the stress (Pa) reached at that age; the stress is taken linear within
+	the step, a step with unchanged age applies a sudden stress jump.
+	"""
+
+	def __init__(self, chain, shape=()):
+		self.chain = chain
+		self.t = None
+		self.sigma = np.zeros(shape)
+		self.gamma = np.zeros(tuple(shape) + chain.tau.shape)
+		self.eps = np.zeros(shape)
+
+	def step(self, t, sigma):
+		"""Advance to age ``t`` with stress ``sigma``; return the total mechanical strain."""
+		c = self.chain
+		sigma = np.asarray(sigma, dtype=float) / MPa
+		te = c.te(t)
+		t0 = te if self.t is None else self.t
+		dt = te - t0
+		if np.any(dt < 0):
+			raise ValueError('ages must not decrease')
+		s0 = self.sigma
+		ds = sigma - s0
+		moving = dt > 0
+		with np.errstate(divide='ignore', invalid='ignore'):
+			beta = np.exp(-dt[..., None] / c.tau)
+			lam = np.where(moving[..., None], (1 - beta) * c.tau / np.where(moving, dt, 1)[..., None], 1.0)
+			r = np.log(te / t0)
+			flow = np.where(moving, c.a4 * (s0 * r + ds * (1 - t0 * r / np.where(moving, dt, 1))), 0.0)
+		gamma = self.gamma * beta + c.A * ((1 - beta) * s0[..., None] + (1 - lam) * ds[..., None])
+		d_gamma = np.sum(gamma - self.gamma, axis=-1) + c.A0 * ds
+		t_mid = 0.5 * (t0 + te)
+		self.eps = self.eps + c.q1 * ds + (c.a2 * t_mid**-0.5 + c.a3) * d_gamma + flow
+		self.gamma = gamma
+		self.sigma = sigma + np.zeros_like(s0)
+		self.t = te
+		return self.eps
@@ -0,0 +1,213 @@
+"""Content-hashed memoization of the mix-level quantities.
+
+``tau_0``, ``eps_0``, ``q1..q4``, the mix part of ``q5``, ``tau_au``,
+``eps_au_inf`` and the other quantities of ``params.b4_mix``/``b4s_mix``
+depend on the mix inputs only (``cem_type``, ``fcm``, ``wc``, ``ac``, ``c``,
+``ro``, ``agg_type`` for B4; ``cem_type``, ``fcm`` for B4s).  A
+``MixCache`` keeps them in an in-process LRU and, optionally, in an SQLite
+file shared by processes and runs, bounded by ``max_disk`` entries with
+least recently used eviction.  Disk entries are keyed by a SHA-1 digest of
+the model, the inputs and the coefficient tables, so edited tables never
+return stale values (custom classes registered in ``tables`` included).
+Array inputs are reduced to their distinct mixes first, so a batch of a
+few hundred designs repeated over many rows costs a few hundred lookups.
+
+The cache is opt-in: ``enable`` makes every ``B4Params``/``B4sParams`` (and
+so the scripts, ``batch``, ``sweep``...) use it.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from . import tables
+
+VERSION = 1
+
+
+def _tables_digest():
+	content = [VERSION] + [getattr(tables, name) for name in sorted(dir(tables))
+		if name.isupper() and not name.endswith(('_COLUMNS', '_COLUMN'))]
+	return hashlib.sha1(repr(content).encode()).hexdigest()
+
+
+def _distinct(arrays):
+	"""Distinct rows of the columns ``arrays`` and the row of every element."""
+	# whole rows are compared: a combined integer code of the columns overflows for continuous inputs
+	stacked = np.stack([a.ravel() for a in arrays], axis=-1)
+	rows, inverse = np.unique(stacked, axis=0, return_inverse=True)
+	return rows, inverse.ravel()
+
+
+class MixCache(object):
+	"""Two-tier cache of mix-level quantities.
+
+	``maxsize`` bounds the in-process LRU; ``path`` names an SQLite file for
+	the disk tier (None for memory only), holding at most ``max_disk``
+	mixes.  ``stats()`` reports hits per tier, misses and evictions.
+	"""
+
+	def __init__(self, maxsize=4096, path=None, max_disk=10**5):
+		self.maxsize = maxsize
+		self.path = path
+		self.max_disk = max_disk
+		self.digest = _tables_digest()
+		self.revision = tables.revision
+		self._lru = OrderedDict()
+		self._db = None
+		self._pid = None
+		self.hits = 0
+		self.disk_hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def stats(self):
+		return dict(hits=self.hits, disk_hits=self.disk_hits, misses=self.misses, evictions=self.evictions,
+			size=len(self._lru), disk_size=self._disk_size())
+
+	def key(self, model, names, row):
+		"""Content digest of one mix (key of the disk tier)."""
+		text = '%s|%s|%s' % (model, self.digest, ','.join('%s=%r' % (n, float(v)) for n, v in zip(names, row)))
+		return hashlib.sha1(text.encode()).hexdigest()
+
+	def get(self, model, inputs, compute):
+		"""``compute(**inputs)`` for array or scalar ``inputs``, from the cache where possible."""
+		if self.revision != tables.revision:
+			# classes were (re)registered: codes of the LRU may now mean other coefficients
+			self._lru.clear()
+			self.digest = _tables_digest()
+			self.revision = tables.revision
+		names = sorted(inputs)
+		arrays = [np.asarray(inputs[n], dtype=float) for n in names]
+		if all(a.ndim == 0 for a in arrays):
+			return self._lookup(model, names, [tuple(float(a) for a in arrays)], compute)[0]
+		arrays = np.broadcast_arrays(*arrays)
+		shape = arrays[0].shape
+		rows, inverse = _distinct(arrays)
+		values = self._lookup(model, names, [tuple(row) for row in rows.tolist()], compute)
+		return dict((n, np.array([v[n] for v in values])[inverse].reshape(shape)) for n in values[0])
+
+	def _lookup(self, model, names, rows, compute):
+		# the LRU is keyed by the values themselves, the digest is only needed on disk
+		keys = [(model,) + row for row in rows]
+		values = [self._lru.get(key) for key in keys]
+		for i, key in enumerate(keys):
+			if values[i] is not None:
+				self._lru.move_to_end(key)
+				self.hits += 1
+		missing = [i for i, v in enumerate(values) if v is None]
+		if missing and self.path is not None:
+			digests = dict((i, self.key(model, names, rows[i])) for i in missing)
+			found = self._load(list(digests.values()))
+			for i in missing:
+				values[i] = found.get(digests[i])
+				if values[i] is not None:
+					self.disk_hits += 1
+					self._remember(keys[i], values[i])
+			missing = [i for i in missing if values[i] is None]
+		if missing:
+			self.misses += len(missing)
+			cols = dict((n, np.array([rows[i][k] for i in missing])) for k, n in enumerate(names))
+			for n in ('cem', 'agg'):
+				if n in cols:
+					cols[n] = cols[n].astype(np.intp)
+			computed = compute(**cols)
+			computed = dict((n, np.broadcast_to(np.asarray(v, dtype=float), (len(missing),)).tolist()) for n, v in computed.items())
+			new = {}
+			for j, i in enumerate(missing):
+				values[i] = dict((n, v[j]) for n, v in computed.items())
+				self._remember(keys[i], values[i])
+				if self.path is not None:
+					new[self.key(model, names, rows[i])] = values[i]
+			if new:
+				self._store(new)
+		return values
+
+	def _remember(self, key, value):
+		self._lru[key] = value
+		while len(self._lru) > self.maxsize:
+			self._lru.popitem(last=False)
+
+	###########################################
+	# SQLite tier
+	###########################################
+
+	def _connect(self):
+		# one connection per process (also after fork)
+		if self._db is None or self._pid != os.getpid():
+			directory = os.path.dirname(os.path.abspath(self.path))
+			if not os.path.isdir(directory):
+				os.makedirs(directory)
+			self._db = sqlite3.connect(self.path, timeout=30)
+			self._db.execute('CREATE TABLE IF NOT EXISTS mix (key TEXT PRIMARY KEY, value TEXT, used REAL)')
+			self._db.execute('CREATE INDEX IF NOT EXISTS mix_used ON mix (used)')
+			self._pid = os.getpid()
+		return self._db
+
+	def _load(self, keys):
+		db = self._connect()
+		found = {}
+		for start in range(0, len(keys), 500):
+			part = keys[start:start + 500]
+			query = 'SELECT key, value FROM mix WHERE key IN (%s)' % ','.join('?' * len(part))
+			found.update((key, json.loads(value)) for key, value in db.execute(query, part))
+		if found:
+			with db:
+				db.executemany('UPDATE mix SET used = ? WHERE key = ?', [(time.time(), key) for key in found])
+		return found
+
+	def _store(self, items):
+		db = self._connect()
+		now = time.time()
+		with db:
+			db.executemany('INSERT OR REPLACE INTO mix VALUES (?, ?, ?)',
+				[(key, json.dumps(value), now) for key, value in items.items()])
+			excess = db.execute('SELECT COUNT(*) FROM mix').fetchone()[0] - self.max_disk
+			if excess > 0:
+				db.execute('DELETE FROM mix WHERE key IN (SELECT key FROM mix ORDER BY used LIMIT ?)', (excess,))
+				self.evictions += excess
+
+	def _disk_size(self):
+		if self.path is None:
+			return 0
+		return self._connect().execute('SELECT COUNT(*) FROM mix').fetchone()[0]
+
+	def clear(self):
+		"""Drop both tiers and reset the statistics."""
+		self._lru.clear()
+		if self.path is not None:
+			with self._connect() as db:
+				db.execute('DELETE FROM mix')
+		self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+	def close(self):
+		if self._db is not None:
+			self._db.close()
+			self._db = None
+
+
+def default_path():
+	"""SQLite file of the disk tier: ``$B4_CACHE_DIR/mix.sqlite`` (see ``qtable.cache_dir``)."""
+	from .qtable import cache_dir
+	return os.path.join(cache_dir(), 'mix.sqlite')
+
+
+def enable(cache=None, persist=False, **kwargs):
+	"""Use ``cache`` (default: ``MixCache(**kwargs)``, with the disk tier at ``default_path()`` if ``persist``)."""
+	from .params import _Params
+	if cache is None:
+		if persist:
+			kwargs.setdefault('path', default_path())
+		cache = MixCache(**kwargs)
+	_Params.cache = cache
+	return cache
+
+
+def disable():
+	from .params import _Params
+	_Params.cache = None
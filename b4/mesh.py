@@ -0,0 +1,209 @@
+"""Strain fields over the integration points of a structural mesh.
+
+One mix is evaluated at every point of a mesh, each point with its own
+effective thickness ``D = 2V/S`` (m), shape factor ``k_s`` and ambient
+humidity ``h``.  Only ``tau_sh`` depends on the geometry, through the
+product ``k_s D`` (Eq. 21), so a point is an 'infinite slab' of thickness
+``k_s D``.
+
+``MeshEvaluator`` splits the points into chunks evaluated by worker
+processes.  Inputs and outputs live in ``multiprocessing.shared_memory``
+blocks (Python 3.8+); the workers attach to them by name, so only the mix
+and the chunk bounds are pickled.  Arrays allocated with ``empty`` are
+shared already and are not copied at all.  Any other input array is copied
+once into a staging block per field, reused while its shape and dtype stay
+the same: the workers can only attach to shared memory, so this is the one
+copy that cannot be avoided.  The workers write the outputs into fresh
+blocks that ``evaluate`` returns views of, without a copy.  A block is
+unlinked as soon as no call needs its name (outputs on return, the others
+on ``close``) and unmapped when the last array viewing it is gone, so
+shared memory does not grow with the number of calls and the arrays stay
+valid after ``close``.
+"""
+
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import params
+from .examples import B4_EXAMPLE, B4S_EXAMPLE
+from .params import B4Params, B4sParams
+
+MODELS = {'B4': (B4Params, B4_EXAMPLE), 'B4s': (B4sParams, B4S_EXAMPLE)}
+FIELDS = ('t', 'tp', 'D', 'k_s', 'h')
+OUTPUTS = ('eps_sh', 'eps_au', 'J')
+CHUNK = 2**16 		# points per task
+
+
+def _mix(model, mix):
+	if model not in MODELS:
+		raise ValueError("model must be 'B4' or 'B4s'")
+	cls, example = MODELS[model]
+	mix = dict(example if mix is None else mix)
+	for name in ('t', 'V', 'S', 'h', 'specimen'):
+		mix.pop(name, None)
+	return cls, mix
+
+
+def _chunk(cls, mix, fields, out, start, stop):
+	f = dict((name, value if np.ndim(value) == 0 else value[start:stop]) for name, value in fields.items())
+	P = cls(V=f['k_s'] * f['D'] / 2, S=1.0, h=f['h'], specimen='infinite slab', check=False, **mix)
+	out['eps_sh'][start:stop] = P.eps_sh(f['t'])
+	out['eps_au'][start:stop] = P.eps_au(f['t'])
+	out['J'][start:stop] = P.J(f['t'], f['tp'])
+
+
+_attached = {}
+
+
+def _attach(spec):
+	if not isinstance(spec, tuple):
+		return spec
+	name, shape, dtype = spec
+	shm = _attached.get(name)
+	if shm is None:
+		from multiprocessing import shared_memory
+		shm = _attached[name] = shared_memory.SharedMemory(name=name)
+	return np.ndarray(shape, dtype, buffer=shm.buf)
+
+
+def _detach(keep):
+	for name in [name for name in _attached if name not in keep]:
+		_attached.pop(name).close()
+
+
+def _work(job):
+	model, mix, specs, start, stop = job
+	cls = MODELS[model][0]
+	# segments of earlier calls are unlinked by now; drop their mappings
+	_detach(set(spec[0] for spec in specs.values() if isinstance(spec, tuple)))
+	arrays = dict((name, _attach(spec)) for name, spec in specs.items())
+	_chunk(cls, mix, dict((name, arrays[name]) for name in FIELDS), dict((name, arrays[name]) for name in OUTPUTS), start, stop)
+	return stop - start
+
+
+class MeshEvaluator(object):
+	"""Evaluator of one mix (``model`` 'B4' or 'B4s') over mesh fields on ``workers`` processes.
+
+	``mix`` holds the scalar mix inputs (default: the model's example);
+	geometry, humidity and ages come per point.  Use as a context manager, or
+	call ``close``, to stop the workers and release the shared memory;
+	arrays returned by ``empty`` and ``evaluate`` stay valid while referenced.
+	"""
+
+	def __init__(self, model='B4', mix=None, workers=None, chunk=CHUNK, check=True):
+		self.model = model
+		self.cls, self.mix = _mix(model, mix)
+		if check:
+			self.cls(V=MODELS[model][1]['V'], S=MODELS[model][1]['S'], h=0.5, **self.mix)
+		self.workers = os.cpu_count() if workers is None else workers
+		self.chunk = int(chunk)
+		self.check = check
+		self._blocks = {}
+		self._staging = {}
+		self._pool = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def _block(self, shape, dtype):
+		from multiprocessing import shared_memory
+		dtype = np.dtype(dtype)
+		size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+		shm = shared_memory.SharedMemory(create=True, size=size)
+		flat = np.frombuffer(shm.buf, dtype, int(np.prod(shape)))
+		# the buffer export of ``flat`` keeps the mapping open while any view of it lives;
+		# its memoryview goes last, and then the mapping can be closed
+		weakref.finalize(flat.base, shm.close).atexit = False
+		return shm, flat.reshape(shape)
+
+	def empty(self, shape, dtype=float):
+		"""Array in shared memory; fill mesh fields into it to avoid any copy."""
+		shm, a = self._block(shape, dtype)
+		self._blocks[shm.name] = (shm, weakref.ref(a))
+		return a
+
+	def _shared(self, a):
+		for name, (shm, ref) in self._blocks.items():
+			b = ref()
+			if b is not None and a.ctypes.data == b.ctypes.data and a.shape == b.shape and a.dtype == b.dtype \
+					and a.flags.c_contiguous:
+				return name
+		return None
+
+	def _stage(self, field, shape, dtype):
+		shm, b = self._staging.get(field, (None, None))
+		if b is None or b.shape != shape or b.dtype != dtype:
+			if shm is not None:
+				shm.unlink()
+			shm, b = self._staging[field] = self._block(shape, dtype)
+		return shm.name, b
+
+	def _spec(self, field, a):
+		name = self._shared(a)
+		if name is None:
+			name, b = self._stage(field, a.shape, a.dtype)
+			b[...] = a
+		return name, a.shape, a.dtype.str
+
+	def evaluate(self, t, D, h, k_s=1.0, tp=None):
+		"""``eps_sh``, ``eps_au`` and ``J`` (1/MPa) per point at ages ``t``.
+
+		``D``, ``h``, ``k_s``, ``t`` and ``tp`` (loading age, default the
+		mix's ``tp``) are scalars or 1-D arrays over the points.
+		"""
+		tp = self.mix.get('tp', 28) if tp is None else tp
+		fields = dict(t=t, tp=tp, D=D, k_s=k_s, h=h)
+		fields = dict((name, np.asarray(value, dtype=float)) for name, value in fields.items())
+		n = max(value.size for value in fields.values())
+		if any(value.ndim > 1 or value.size not in (1, n) for value in fields.values()):
+			raise ValueError('mesh fields must be scalars or 1-D arrays of one length')
+		fields = dict((name, float(value) if value.size == 1 else value) for name, value in fields.items())
+		h = np.asarray(fields['h'])
+		if np.any((h < 0) | (h > 1)):
+			raise ValueError('error h (relative humidity must be within 0 and 1)')
+		if self.check:
+			params._check('D/2', np.asarray(fields['D']) / 2, 12e-3, 120e-3, 'volume/surface ratio')
+		chunks = [(start, min(start + self.chunk, n)) for start in range(0, n, self.chunk)]
+		if self.workers <= 1 or len(chunks) <= 1:
+			out = dict((name, np.empty(n)) for name in OUTPUTS)
+			for start, stop in chunks:
+				_chunk(self.cls, self.mix, fields, out, start, stop)
+			return out
+		# fields arrive as float64 arrays, views of shared arrays included
+		specs = dict((name, self._spec(name, value) if np.ndim(value) else value) for name, value in fields.items())
+		out, blocks = {}, []
+		for name in OUTPUTS:
+			shm, out[name] = self._block((n,), float)
+			blocks.append(shm)
+			specs[name] = shm.name, (n,), out[name].dtype.str
+		if self._pool is None:
+			self._pool = ProcessPoolExecutor(self.workers)
+		try:
+			list(self._pool.map(_work, [(self.model, self.mix, specs, start, stop) for start, stop in chunks]))
+		finally:
+			# the results are views of the output blocks, which no later call reuses
+			for shm in blocks:
+				shm.unlink()
+		return out
+
+	def close(self):
+		"""Stop the workers and unlink the shared blocks (mapped until their arrays are gone)."""
+		if self._pool is not None:
+			self._pool.shutdown()
+			self._pool = None
+		shms = [shm for shm, _ in self._blocks.values()] + [shm for shm, _ in self._staging.values()]
+		self._blocks, self._staging = {}, {}
+		for shm in shms:
+			shm.unlink()
+
+
+def evaluate_mesh(t, D, h, k_s=1.0, tp=None, model='B4', mix=None, workers=None, chunk=CHUNK):
+	"""Per-point ``eps_sh``, ``eps_au`` and ``J``; see ``MeshEvaluator``."""
+	with MeshEvaluator(model, mix, workers, chunk) as mesh:
+		return mesh.evaluate(t, D, h, k_s, tp)
@@ -0,0 +1,241 @@
+"""Pore humidity diffusion across a section, an alternative to the half-time tau_sh.
+
+The models collapse drying into ``tau_sh`` (Eq. 21) and the curve
+tanh(sqrt(tt/tau_sh)) of Eq. 15.  Here the pore relative humidity h(x, t)
+is solved from the nonlinear diffusion equation
+
+	dh/dt = div(C(h) grad h),  C(h) = C1 (alpha0 + (1 - alpha0) / (1 + ((1 - h)/(1 - hc))**n))
+
+(Bazant and Najjar 1972) over a slab (faces drying or sealed) or an
+infinite cylinder, starting from h = 1 when drying begins at ``t0``.  The
+scheme is implicit (backward Euler with Picard updates of C), one
+tridiagonal solve per step, with steps adapted to the largest humidity
+change.  The equation is solved in the scaled time C1 tt / L**2, in which
+sections differ only by their ambient humidity, so all sections step
+together however different their sizes and mixes.
+
+Unless given, C1 is calibrated per section so that a slab drying from both
+faces reaches the mean drying fraction tanh(1) at tau_sh, as Eq. 15 does;
+other geometries and sealed faces then follow from the diffusion solution.
+Local h feeds Eq. 14 (the drying fraction (1 - h)/(1 - h_env) in place of
+the time curve) and Eq. 36 - 38 (h in place of the mean humidity H).
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from . import equations as eq
+
+Drying = namedtuple('Drying', ['t', 'tp', 'x', 'h', 'h_load', 'weights'])
+
+ALPHA0 = 0.05
+HC = 0.75
+N_EXP = 15
+NODES = 21
+DH_MAX = 0.02 		# largest humidity change per step
+FACES = ('drying', 'sealed')
+
+
+def diffusivity(h, C1=1.0, alpha0=ALPHA0, hc=HC, n=N_EXP):
+	"""Moisture diffusivity C(h) (units of ``C1``)."""
+	return C1 * (alpha0 + (1 - alpha0) / (1 + ((1 - h) / (1 - hc)) ** n))
+
+
+def tridiagonal(a, b, c, d):
+	"""Solve tridiagonal systems along the first axis (Thomas algorithm, all systems at once).
+
+	``a`` is the sub-, ``b`` the main and ``c`` the super-diagonal
+	(``a[0]`` and ``c[-1]`` are ignored); further axes index the systems.
+	"""
+	n = b.shape[0]
+	cp = np.empty_like(b)
+	dp = np.empty_like(b)
+	cp[0] = c[0] / b[0]
+	dp[0] = d[0] / b[0]
+	for i in range(1, n):
+		m = b[i] - a[i] * cp[i - 1]
+		cp[i] = c[i] / m
+		dp[i] = (d[i] - a[i] * dp[i - 1]) / m
+	x = dp
+	for i in range(n - 2, -1, -1):
+		x[i] -= cp[i] * x[i + 1]
+	return x
+
+
+def _mesh(geometry, nodes):
+	"""Unit mesh: node positions, face areas (between nodes) and control volumes."""
+	x = np.linspace(0, 1, nodes)
+	dx = 1.0 / (nodes - 1)
+	if geometry == 'slab':
+		area = np.ones(nodes - 1)
+		volume = np.full(nodes, dx)
+		volume[[0, -1]] = dx / 2
+	elif geometry == 'cylinder':
+		# per radian; node 0 on the axis, the last node on the surface
+		area = x[:-1] + dx / 2
+		volume = x * dx
+		volume[0] = dx * dx / 8
+		volume[-1] = (1 - dx / 4) * dx / 2
+	else:
+		raise ValueError("geometry must be 'slab' or 'cylinder'")
+	return x, area, volume
+
+
+def _integrate(h_env, theta_out, geometry, faces, nodes, shape_args, dh_max):
+	"""h at the scaled times ``theta_out`` (sections x outputs) on the unit mesh."""
+	x, area, volume = _mesh(geometry, nodes)
+	dx = x[1] - x[0]
+	drying = [faces[0] == 'drying', faces[1] == 'drying']
+	if geometry == 'cylinder':
+		drying[0] = False 		# the axis
+	n = h_env.shape[0]
+	# nodes on the first axis, sections contiguous
+	h = np.ones((nodes, n))
+	fixed = [k for k, end in ((0, drying[0]), (nodes - 1, drying[1])) if end]
+	h[fixed] = h_env
+	vol = volume[:, None]
+	g = (area / dx)[:, None]
+	a = np.zeros((nodes, n))
+	c = np.zeros((nodes, n))
+	out = np.ones(theta_out.shape + (nodes,))
+	theta_end = theta_out.max() if theta_out.size else 0.0
+	theta = 0.0
+	step = 1e-4 * dx * dx
+	while theta < theta_end:
+		step = min(step, theta_end - theta)
+		h_new = h
+		for _ in range(2):
+			# volume dh/dtheta = sum of the face fluxes, implicit; C from the latest iterate
+			C = diffusivity(0.5 * (h_new[1:] + h_new[:-1]), 1.0, *shape_args)
+			C *= -step * g
+			a[1:] = C
+			c[:-1] = C
+			b = vol - a - c
+			d = vol * h
+			for k in fixed:
+				a[k] = c[k] = 0.0
+				b[k] = 1.0
+				d[k] = h_env
+			h_new = tridiagonal(a, b, c, d)
+		change = np.abs(h_new - h).max()
+		if change > dh_max and step > 1e-12:
+			step /= 2
+			continue
+		# outputs within this step, linear in time
+		hit = (theta_out > theta) & (theta_out <= theta + step)
+		if hit.any():
+			rows, cols = np.nonzero(hit)
+			w = (theta_out[rows, cols] - theta) / step
+			out[rows, cols] = ((1 - w) * h[:, rows] + w * h_new[:, rows]).T
+		theta += step
+		h = h_new
+		if change < dh_max / 4:
+			step *= 2
+	return out, x, volume / volume.sum()
+
+
+def _calibrate(h_env, shape_args, nodes, dh_max):
+	"""Scaled time at which a slab drying from both faces reaches the mean fraction tanh(1)."""
+	# depends on h_env only: solve once per distinct humidity
+	h_env, index = np.unique(h_env, return_inverse=True)
+	theta = np.logspace(-5, 2, 141)
+	out, _, weights = _integrate(h_env, np.broadcast_to(theta, h_env.shape + theta.shape), 'slab',
+		('drying', 'drying'), nodes, shape_args, dh_max)
+	with np.errstate(divide='ignore', invalid='ignore'):
+		fraction = (1 - out.dot(weights)) / (1 - h_env[:, None])
+	target = np.tanh(1.0)
+	k = np.clip(np.argmax(fraction >= target, axis=1), 1, len(theta) - 1)
+	rows = np.arange(len(h_env))
+	f0, f1 = fraction[rows, k - 1], fraction[rows, k]
+	with np.errstate(divide='ignore', invalid='ignore'):
+		w = np.clip((target - f0) / (f1 - f0), 0, 1)
+	return np.where(h_env < 1, 10 ** (np.log10(theta[k - 1]) * (1 - w) + np.log10(theta[k]) * w), 1.0)[index]
+
+
+def solve(params, t, tp=None, geometry='slab', faces=('drying', 'drying'), thickness=None, C1=None,
+		nodes=NODES, alpha0=ALPHA0, hc=HC, n=N_EXP, dh_max=DH_MAX):
+	"""Humidity profiles h(x, t) of the sections of ``params`` at the ages ``t`` (1-D, days).
+
+	``geometry`` is 'slab' (``faces``: 'drying' or 'sealed' at x = 0 and
+	x = ``thickness``) or 'cylinder' (drying surface, ``thickness`` is the
+	radius); the default thickness is the one with the volume/surface
+	ratio of the parameters (the effective thickness D of Eq. 21, half of
+	it for a slab drying from one face).  ``C1`` (m2/day) defaults to the
+	calibration described in the module.  Returns a ``Drying`` with the
+	node positions ``x`` (m), ``h`` (sections, ages, nodes), the profile
+	``h_load`` at loading (``tp``, default the parameters') and the
+	``weights`` of the nodes in section means.
+	"""
+	faces = tuple(faces)
+	if len(faces) != 2 or any(face not in FACES for face in faces):
+		raise ValueError("faces must be two of 'drying' or 'sealed' (x = 0, x = thickness)")
+	t = np.asarray(t, dtype=float)
+	if t.ndim != 1:
+		raise ValueError('t must be a 1-D array of ages')
+	tp = params.tp if tp is None else np.asarray(tp, dtype=float)
+	shape_args = (alpha0, hc, n)
+	h_env, t0, beta_ts, D, k_s, tau_sh, tp = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (
+		params.h, params.t0, params.beta_ts, params.D, params.k_s, params.tau_sh, tp)))
+	shape = h_env.shape
+	if thickness is None:
+		thickness = D if geometry == 'cylinder' or faces == ('drying', 'drying') else D / 2
+	flat = lambda v: np.broadcast_to(np.asarray(v, dtype=float), shape).ravel()
+	h_env, t0, beta_ts, D, k_s, tau_sh, tp, thickness = (flat(v) for v in (h_env, t0, beta_ts, D, k_s, tau_sh, tp, thickness))
+	if C1 is None:
+		# tau_sh belongs to a slab k_s D thick (Eq. 21), so C1 is a property of the mix
+		C1 = _calibrate(h_env, shape_args, nodes, dh_max) * (k_s * D) ** 2 / tau_sh
+	C1 = flat(C1).reshape(-1) if np.size(C1) != h_env.size else np.asarray(C1, dtype=float).ravel()
+	# equivalent drying time (Eq. 8) at the outputs and at loading (Eq. 36 - 38: max(tpd, t0t) - t0t)
+	tt = np.concatenate([(t[None, :] - t0[:, None]), np.maximum(tp - t0, 0)[:, None]], axis=1) * beta_ts[:, None]
+	theta = np.maximum(tt, 0) * (C1 / thickness ** 2)[:, None]
+	out, x, weights = _integrate(h_env, theta, geometry, faces, nodes, shape_args, dh_max)
+	return Drying(t, tp.reshape(shape), (thickness[:, None] * x).reshape(shape + (nodes,)),
+		out[:, :-1].reshape(shape + (len(t), nodes)), out[:, -1].reshape(shape + (nodes,)), weights)
+
+
+def mean(drying, values):
+	"""Section mean of nodal ``values`` (nodes on the last axis)."""
+	return np.asarray(values).dot(drying.weights)
+
+
+def _column(drying):
+	# per-section value against the ages axis: S + (1,)
+	shape = drying.h.shape[:-2]
+	return lambda v: np.broadcast_to(np.asarray(v, dtype=float), shape)[..., None]
+
+
+def fraction(params, drying):
+	"""Local drying fraction (1 - h)/(1 - h_env), the counterpart of the time curve of Eq. 15."""
+	h_env = _column(drying)(params.h)[..., None]
+	with np.errstate(divide='ignore', invalid='ignore'):
+		return np.where(h_env < 1, (1 - drying.h) / (1 - h_env), 0.0)
+
+
+def eps_sh(params, drying):
+	"""Local drying shrinkage at the nodes (sections, ages, nodes), Eq. 14 with the local drying fraction."""
+	return _column(drying)(params.eps_sh_inf * params.kh)[..., None] * fraction(params, drying)
+
+
+def _ages(params, drying):
+	col = _column(drying)
+	tp = col(drying.tp)
+	tpd = col(params.t0t) + (tp - col(params.t0)) * col(params.beta_ts) # Eq. 9
+	td = tpd + (drying.t - tp) * col(params.beta_tc) # Eq. 10
+	return col, tpd, td
+
+
+def Cd(params, drying):
+	"""Local drying creep compliance (1/MPa) at the nodes, Eq. 36 - 38 with H = h(x, t), for loading at ``drying.tp``."""
+	col, tpd, td = _ages(params, drying)
+	t0pd = np.maximum(tpd, col(params.t0t))
+	p5H = col(params.p5H)[..., None]
+	val = col(params.q5)[..., None] * np.maximum(np.exp(-p5H * drying.h) - np.exp(-p5H * drying.h_load[..., None, :]), 0) ** 0.5 * 10**6
+	return np.where((td >= t0pd)[..., None], val, 0.0)
+
+
+def J(params, drying):
+	"""Local compliance (1/MPa) at the nodes: Eq. 27 with the local drying creep."""
+	col, tpd, td = _ages(params, drying)
+	C0 = eq.C0(col(params.q2), col(params.q3), col(params.q4), tpd, td, params.kernel)
+	return np.where((td >= tpd)[..., None], (col(params.q1) + col(params.Rt) * C0)[..., None] + Cd(params, drying), 0.0)
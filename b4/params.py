@@ -0,0 +1,222 @@
+"""Precomputed parameters of models B4 and B4s.
+
+``B4Params``/``B4sParams`` evaluate every mix-, geometry- and
+environment-only quantity (table lookups, ``q1..q5``, ``tau_sh``,
+``eps_sh_inf``, ``tau_au``, ``eps_au_inf``, ``beta_t*``) once; the methods
+then only evaluate the time-dependent part of the chain.  All inputs may be
+arrays (categorical ones as labels or integer codes) and broadcast together.
+"""
+
+import warnings
+from collections import namedtuple
+
+import numpy as np
+
+from . import equations as eq
+from . import tables
+from .units import MPa, GPa
+
+History = namedtuple('History', ['eps_sh', 'eps_au', 'J', 'T_infl', 'eps_tot'])
+
+
+class ApplicabilityWarning(UserWarning):
+	"""Input outside the range the model was calibrated for."""
+
+
+def _check(name, value, low, high, what):
+	value = np.asarray(value)
+	if np.any((value < low) | (value > high)):
+		warnings.warn('OUT OF APPLICABILITY RANGE: model not calibrated for such %s (%s)' % (what, name),
+			ApplicabilityWarning, stacklevel=4)
+
+
+def b4_mix(cem, agg, fcm, c, wc, ac, ro):
+	"""Mix-level quantities of model B4 (depend on the composition only).
+
+	``q5_mix`` is ``q5`` without the factor |kh eps_sh_inf|**p5e of Eq. 43.
+	"""
+	sh = tables.gather(tables.B4_SHRINKAGE_COLUMNS, cem)
+	au = tables.gather(tables.B4_AUTOGENOUS_COLUMNS, cem)
+	cr = tables.gather(tables.B4_CREEP_COLUMNS, cem)
+	ex = tables.B4_CREEP_EXPONENTS
+	ag = tables.gather(tables.AGGREGATE_COLUMNS, agg)
+	wc, ac, c, ro = (np.asarray(x, dtype=float) for x in (wc, ac, c, ro))
+	m = {}
+	m['tau_0'] = eq.tau_0(sh['tau_cem'], sh['pta'], sh['ptw'], sh['ptc'], ac, wc, c, ro)
+	m['k_ta'] = ag['k_ta']
+	m['eps_0'] = eq.eps_0(sh['eps_cem'], sh['pea'], sh['pew'], sh['pec'], ac, wc, c, ro)
+	m['k_ea'] = ag['k_ea']
+
+	m['alfa'] = eq.alfa(au['r_alfa'], wc)
+	m['r_t'] = au['r_t']
+	m['tau_au'] = eq.tau_au(au['tau_au_cem'], au['r_tw'], wc)
+	m['eps_au_inf'] = eq.eps_au_inf(au['eps_au_cem'], au['r_ea'], au['r_ew'], ac, wc)
+
+	m['p5H'] = cr['p5H']
+	m['q1'] = eq.q1(cr['p1'], eq.E_28(fcm))
+	m['q2'] = eq.q2(cr['p2'], ex['p2w'], wc)
+	m['q3'] = eq.q3(cr['p3'], m['q2'], ex['p3a'], ex['p3w'], ac, wc)
+	m['q4'] = eq.q4(cr['p4'], ex['p4a'], ex['p4w'], ac, wc)
+	m['q5_mix'] = eq.q5_mix(cr['p5'], ex['p5a'], ex['p5w'], ac, wc)
+	m['p5e'] = ex['p5e']
+	return m
+
+
+def b4s_mix(cem, fcm):
+	"""Mix-level quantities of model B4s (depend on the strength and cement only); see ``b4_mix``."""
+	sh = tables.gather(tables.B4S_SHRINKAGE_COLUMNS, cem)
+	cr = tables.gather(tables.B4S_CREEP_COLUMNS, cem)
+	au = tables.B4S_AUTOGENOUS
+	f = eq.strength_ratio(fcm)
+	m = {}
+	# Table 6 scaling is not used by B4s (k_ta = k_ea = 1)
+	m['tau_0'] = eq.by_strength(sh['tau_s_cem'], sh['s_tf'], f) # Eq. 45
+	m['k_ta'] = 1.0
+	m['eps_0'] = eq.by_strength(sh['eps_scem'], sh['s_ef'], f) # Eq. 44
+	m['k_ea'] = 1.0
+
+	m['alfa'] = au['alfa_s']
+	m['r_t'] = au['r_t']
+	m['tau_au'] = eq.by_strength(au['tau_au_cem'], au['r_tf'], f) # Eq. 48
+	m['eps_au_inf'] = eq.by_strength(-au['eps_au_cem'], au['r_ef'], f) # Eq. 47
+
+	m['p5H'] = cr['p5H']
+	m['q1'] = eq.q1(cr['p1'], eq.E_28(fcm))
+	m['q2'] = eq.by_strength(cr['s2'] / GPa, cr['s2f'], f) # Eq. 40
+	m['q3'] = eq.by_strength(cr['s3'] * m['q2'], cr['s3f'], f) # Eq. 41
+	m['q4'] = eq.by_strength(cr['s4'] / GPa, cr['s4f'], f) # Eq. 42
+	m['q5_mix'] = eq.by_strength(cr['s5'] / GPa, cr['s5f'], f) # Eq. 43
+	m['p5e'] = tables.p5c
+	return m
+
+
+class _Params(object):
+
+	kernel = None 		# Q(tpd, td) evaluator, None for the exact Eq. 31 - 35 (see qtable.enable)
+	cache = None 		# store of mix-level quantities, None to compute them (see memo.enable)
+
+	def __init__(self, fcm, cem_type, V, S, h, t0=28, tp=28, sigma=0.0, specimen='infinite slab',
+			UR=4000, T_cur=20, T_avg=20, T=20, alfa_t=1e-5, check=True, scale=None):
+		self.scale = scale
+		self.cem = tables.codes(cem_type, tables.CEM_TYPES, 'cement type')
+		self.fcm = np.asarray(fcm, dtype=float)
+		self.h = np.asarray(h, dtype=float)
+		if np.any((self.h < 0) | (self.h > 1)):
+			raise ValueError('error h (relative humidity must be within 0 and 1)')
+		self.t0 = np.asarray(t0, dtype=float)
+		self.tp = np.asarray(tp, dtype=float)
+		self.sigma = np.asarray(sigma, dtype=float)
+		self.T_avg = np.asarray(T_avg, dtype=float)
+		self.alfa_t = alfa_t
+		self.T_infl = alfa_t * (np.asarray(T, dtype=float) - T_avg)
+		if check:
+			_check('fcm', fcm, 15 * MPa, 70 * MPa, 'concrete compressive strength')
+			_check('T_avg', T_avg, -25, 75, 'average temperature')
+			_check('T_cur', T_cur, 20, 30, 'curing temperature')
+			_check('V/S', np.asarray(V) / S, 12e-3, 120e-3, 'volume/surface ratio')
+
+		self.E_28 = eq.E_28(self.fcm)
+		self.kh = eq.kh(self.h)
+		self.beta_th = eq.beta(T_cur, UR)
+		self.beta_ts = eq.beta(T_avg, UR)
+		self.beta_tc = eq.beta(T_avg, UR)
+		self.Rt = eq.beta(T_avg, UR) # Eq. 39
+		self.t0t = self.t0 * self.beta_th
+		self.k_s = tables.K_S_COLUMN[tables.codes(specimen, tables.SPECIMEN_TYPES, 'specimen')]
+		self.D = 2 * np.asarray(V, dtype=float) / S # effective thickness (Eq. 21)
+
+	def _mix_level(self, model, inputs, compute):
+		if self.cache is None:
+			return compute(**inputs)
+		return self.cache.get(model, inputs, compute)
+
+	def _mix(self, m):
+		if self.scale:
+			# multiplicative factors on mix-level quantities (e.g. sampled table coefficients)
+			m = dict(m)
+			for name, factor in self.scale.items():
+				m[name] = m[name] * factor
+		self.tau_0 = m['tau_0']
+		self.tau_sh = eq.tau_sh(m['tau_0'], m['k_ta'], self.k_s, self.D)
+		self.eps_0 = m['eps_0']
+		self.eps_sh_inf = eq.eps_sh_inf(m['eps_0'], m['k_ea'], self.E_28, self.beta_th, self.beta_ts, self.t0t, self.tau_sh)
+		for name in ('alfa', 'r_t', 'tau_au', 'eps_au_inf', 'p5H', 'q1', 'q2', 'q3', 'q4'):
+			setattr(self, name, m[name])
+		self.q5 = eq.q5(m['q5_mix'], m['p5e'], self.kh, self.eps_sh_inf)
+
+	def E(self, t):
+		return eq.E(t, self.E_28) # Eq. 19
+
+	def tpd(self, tp=None):
+		tp = self.tp if tp is None else tp
+		return self.t0t + (tp - self.t0) * self.beta_ts # Eq. 9
+
+	def eps_sh(self, t):
+		"""Drying shrinkage at age ``t``, Eq. 14."""
+		tt = (np.asarray(t, dtype=float) - self.t0) * self.beta_ts
+		return eq.eps_sh(self.eps_sh_inf, self.kh, tt, self.tau_sh)
+
+	def eps_au(self, t):
+		"""Autogenous shrinkage at age ``t``."""
+		t = np.asarray(t, dtype=float)
+		return eq.eps_au(self.eps_au_inf, self.tau_au, self.alfa, self.r_t, self._te(t, (t - self.t0) * self.beta_ts, self.t0t))
+
+	def J(self, t, tp=None):
+		"""Compliance function J(t, tp) in 1/MPa, Eq. 27 (``tp`` defaults to the loading age)."""
+		tp = self.tp if tp is None else np.asarray(tp, dtype=float)
+		tpd = self.tpd(tp)
+		td = tpd + (np.asarray(t, dtype=float) - tp) * self.beta_tc
+		C0 = eq.C0(self.q2, self.q3, self.q4, tpd, td, self.kernel)
+		Cd = eq.Cd(self.q5, self.p5H, self.h, tpd, td, self.t0t, self.tau_sh)
+		return eq.J(self.q1, self.Rt, C0, Cd, tpd, td)
+
+	def eps_tot(self, t, tp=None, sigma=None):
+		"""Total strain, Eq. 12 (``sigma`` in Pa, defaults to the applied stress)."""
+		return self.history(t, tp, sigma).eps_tot
+
+	def history(self, t, tp=None, sigma=None):
+		t = np.asarray(t, dtype=float)
+		sigma = self.sigma if sigma is None else sigma
+		eps_sh = self.eps_sh(t)
+		eps_au = self.eps_au(t)
+		J = self.J(t, tp)
+		T_infl = self.T_infl * np.ones_like(t)
+		return History(eps_sh, eps_au, J, T_infl, (J * sigma / MPa) + eps_sh + eps_au + T_infl)
+
+
+class B4Params(_Params):
+	"""Model B4 (general): mix composition ``c``, ``wc``, ``ac``, ``ro`` and ``agg_type`` known.
+
+	Units follow the DATA section of ``RILEM_TC242_Model_B4.py``.  Inputs
+	outside the calibrated range raise an ``ApplicabilityWarning`` (disable
+	with ``check=False``); unknown categories raise ``ValueError``.
+	``scale`` maps names of ``b4_mix`` quantities to factors applied to them.
+	"""
+
+	def __init__(self, fcm, cem_type, c, wc, ac, ro, V, S, h, agg_type='', **kwargs):
+		_Params.__init__(self, fcm, cem_type, V, S, h, **kwargs)
+		if kwargs.get('check', True):
+			_check('wc', wc, 0.22, 0.87, 'w/c ratio')
+			_check('ac', ac, 1.0, 13.2, 'a/c ratio')
+			_check('c', c, 0.200, 1.5, 'cement content')
+		agg = tables.codes(agg_type, tables.AGG_KEYS, 'agg_type')
+		self._mix(self._mix_level('B4', dict(cem=self.cem, agg=agg, fcm=self.fcm, c=c, wc=wc, ac=ac, ro=ro), b4_mix))
+
+	def _te(self, t, tt, t0t):
+		# the script measures autogenous age as tt - t0t
+		return tt - t0t
+
+
+class B4sParams(_Params):
+	"""Model B4s (strength-based): only ``fcm`` and the cement type known.
+
+	Units follow the DATA section of ``RILEM_TC242_Model_B4s.py``.
+	"""
+
+	def __init__(self, fcm, cem_type, V, S, h, **kwargs):
+		_Params.__init__(self, fcm, cem_type, V, S, h, **kwargs)
+		self._mix(self._mix_level('B4s', dict(cem=self.cem, fcm=self.fcm), b4s_mix))
+
+	def _te(self, t, tt, t0t):
+		# Eq. 46 as in the script: t + t0
+		return t + self.t0
@@ -0,0 +1,196 @@
+"""Tabulated aging creep kernel Q(t, t') (Eq. 31 - 35).
+
+Q depends only on the temperature-corrected ages ``tpd`` and ``td``, not on
+the mix, so one table serves every mix in the process.  ln Q is tabulated on
+a uniform grid of x = ln(tpd), y = ln(td - tpd) and interpolated by
+piecewise bicubic (4 x 4 point Lagrange) polynomials whose monomial
+coefficients are stored per cell, so a lookup is one gather of 16
+coefficients and a Horner evaluation.
+
+Error bound: the interpolation error is O(h**4); for the default grid (16
+points per decade) the relative error of Q is below 1e-6.  The bound is
+measured when a table is built, on a grid four times finer than the table,
+and kept as ``QTable.error_bound``.  Outside the tabulated range the exact
+equation is evaluated.
+
+Tables are kept in an in-process LRU (``MAX_TABLES``) and persisted as
+``.npy`` files in ``cache_dir()`` (``$B4_CACHE_DIR`` or ``~/.cache/b4``),
+loaded memory-mapped so processes share the pages.
+
+The table is opt-in (``enable``/``disable``): with NumPy's SIMD power
+functions the exact vectorized Q is already about as fast as the gathers
+of the lookup, the table pays off where Q is evaluated per element from
+compiled or scalar code.
+"""
+
+import json
+import math
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+from . import equations as eq
+
+VERSION = 1
+MAX_TABLES = 4
+
+# cubic Lagrange weights on nodes -1, 0, 1, 2 as polynomials in f: W[a, k] is the coefficient of f**k
+_W = np.array([
+	[0, -1/3, 1/2, -1/6],
+	[1, -1/2, -1, 1/2],
+	[0, 1, 1/2, -1/2],
+	[0, -1/6, 0, 1/6],
+])
+
+
+def _key(tpd_range, dt_range, per_decade):
+	return 'Q-v%d-%g-%g-%g-%g-%d' % ((VERSION,) + tuple(map(float, tpd_range)) + tuple(map(float, dt_range)) + (int(per_decade),))
+
+
+def _axis(low, high, per_decade):
+	n = int(round(math.log10(high / low) * per_decade)) + 1
+	return math.log(low), (math.log(high) - math.log(low)) / (n - 1), n
+
+
+class QTable(object):
+	"""Bicubic table of ln Q over ``tpd_range`` x ``dt_range`` (dt = td - tpd, days)."""
+
+	def __init__(self, tpd_range=(1e-2, 1e5), dt_range=(1e-6, 1e6), per_decade=16, coefficients=None, error_bound=None):
+		self.tpd_range = tuple(float(v) for v in tpd_range)
+		self.dt_range = tuple(float(v) for v in dt_range)
+		self.per_decade = int(per_decade)
+		self.x0, self.hx, self.nx = _axis(self.tpd_range[0], self.tpd_range[1], self.per_decade)
+		self.y0, self.hy, self.ny = _axis(self.dt_range[0], self.dt_range[1], self.per_decade)
+		if coefficients is None:
+			coefficients = self._build()
+		self.coefficients = coefficients
+		self.error_bound = self._measure() if error_bound is None else error_bound
+
+	@property
+	def key(self):
+		return _key(self.tpd_range, self.dt_range, self.per_decade)
+
+	def _build(self):
+		x = self.x0 + self.hx * np.arange(self.nx)
+		y = self.y0 + self.hy * np.arange(self.ny)
+		tpd = np.exp(x)[:, None]
+		T = np.log(eq.Q(tpd, tpd + np.exp(y)[None, :]))
+		# cells with a full 4 x 4 stencil: i = 1 .. nx - 3, j = 1 .. ny - 3
+		P = np.lib.stride_tricks.sliding_window_view(T, (4, 4))
+		C = np.einsum('ak,ijab,bl->klij', _W, P, _W)
+		return np.ascontiguousarray(C.reshape(16, -1))
+
+	def _measure(self):
+		x = self.x0 + self.hx * (1 + np.arange(4 * (self.nx - 3)) / 4 + 1/8)
+		y = self.y0 + self.hy * (1 + np.arange(4 * (self.ny - 3)) / 4 + 1/8)
+		tpd = np.exp(x)[:, None]
+		td = tpd + np.exp(y)[None, :]
+		return float(np.max(np.abs(self(tpd, td) / eq.Q(tpd, td) - 1)))
+
+	def __call__(self, tpd, td):
+		"""Q(tpd, td); exact evaluation outside the tabulated range."""
+		tpd, td = np.broadcast_arrays(np.asarray(tpd, dtype=float), np.asarray(td, dtype=float))
+		with np.errstate(divide='ignore', invalid='ignore'):
+			u = (np.log(tpd) - self.x0) / self.hx
+			v = (np.log(td - tpd) - self.y0) / self.hy
+		inside = (u >= 1) & (u < self.nx - 2) & (v >= 1) & (v < self.ny - 2)
+		if not inside.all():
+			out = eq.Q(tpd, td)
+			if inside.any():
+				out[inside] = self._interpolate(u[inside], v[inside])
+			return out
+		return self._interpolate(u, v)
+
+	def _interpolate(self, u, v):
+		i = u.astype(np.intp)
+		j = v.astype(np.intp)
+		fx = u - i
+		fy = v - j
+		cell = (i - 1) * (self.ny - 3) + (j - 1)
+		C = self.coefficients
+		value = 0.0
+		for k in (3, 2, 1, 0):
+			row = C[4*k + 3].take(cell)
+			for l in (2, 1, 0):
+				row = row * fy + C[4*k + l].take(cell)
+			value = value * fx + row
+		return np.exp(value)
+
+	def save(self, directory):
+		"""Write the table to ``directory`` (atomically); return the .npy path."""
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+		path = os.path.join(directory, self.key + '.npy')
+		meta = dict(version=VERSION, tpd_range=self.tpd_range, dt_range=self.dt_range,
+			per_decade=self.per_decade, error_bound=self.error_bound)
+		# metadata first: ``get`` only loads a table whose .npy exists
+		_write(path[:-4] + '.json', lambda f: f.write(json.dumps(meta).encode()))
+		_write(path, lambda f: np.save(f, self.coefficients))
+		return path
+
+	@classmethod
+	def load(cls, path):
+		with open(path[:-4] + '.json') as f:
+			meta = json.load(f)
+		if meta['version'] != VERSION:
+			raise ValueError('table %s has version %s, expected %s' % (path, meta['version'], VERSION))
+		return cls(meta['tpd_range'], meta['dt_range'], meta['per_decade'],
+			np.load(path, mmap_mode='r'), meta['error_bound'])
+
+
+def _write(path, write):
+	# through a temporary file, so readers never see a partial file
+	fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+	try:
+		with os.fdopen(fd, 'wb') as f:
+			write(f)
+		os.replace(tmp, path)
+	finally:
+		if os.path.exists(tmp):
+			os.remove(tmp)
+
+
+_tables = OrderedDict()
+
+
+def cache_dir():
+	return os.environ.get('B4_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'b4')
+
+
+def get(tpd_range=(1e-2, 1e5), dt_range=(1e-6, 1e6), per_decade=16, persist=True):
+	"""Shared table for the given axes: in-process LRU, then disk cache, then build."""
+	key = _key(tpd_range, dt_range, per_decade)
+	if key in _tables:
+		_tables.move_to_end(key)
+		return _tables[key]
+	path = os.path.join(cache_dir(), key + '.npy')
+	table = None
+	if persist and os.path.exists(path):
+		try:
+			table = QTable.load(path)
+		except (OSError, ValueError, KeyError):
+			table = None
+	if table is None:
+		table = QTable(tpd_range, dt_range, per_decade)
+		if persist:
+			try:
+				table.save(cache_dir())
+			except OSError:
+				pass
+	_tables[key] = table
+	while len(_tables) > MAX_TABLES:
+		_tables.popitem(last=False)
+	return table
+
+
+def enable(table=None):
+	"""Use ``table`` (default: the shared default table) for Q in every parameter object."""
+	from .params import _Params
+	_Params.kernel = get() if table is None else table
+
+
+def disable():
+	from .params import _Params
+	_Params.kernel = None
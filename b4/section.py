@@ -0,0 +1,174 @@
+"""Long-term analysis of reinforced and prestressed cross-sections (age-adjusted effective modulus).
+
+A section loaded at ``tp`` by a sustained axial force ``N`` and moment
+``M`` redistributes stress from the creeping, shrinking concrete to the
+steel.  The age-adjusted effective modulus method (AAEM, Bazant 1972)
+writes the concrete strain at age ``t`` as
+
+	eps = sigma_0 (1 + phi) / E_0 + d_sigma (1 + chi phi) / E_0 + eps_sh
+
+with the instantaneous modulus E_0 = 1 / J(tp, tp) = 1 / q1, the creep
+coefficient phi(t, tp) = E_0 J(t, tp) - 1 (Eq. 27), the free shrinkage
+since loading (Eq. 14, 24) and the aging coefficient chi(t, tp) =
+E_0 / (E_0 - R) - 1/phi, where R(t, tp) is the relaxation function obtained
+from J by the step-by-step (trapezoidal) solution of the superposition
+integral.  E_0 is taken from J rather than from the conventional E(tp) of
+Eq. 19 so that the elastic and the creep strains of the initial stress add
+up to J(t, tp) sigma_0, as in the model.  With the default grid (10 steps
+per decade from 0.01 day) R is accurate to about 1 %.
+
+The strain is plane, eps(y) = eps_0 + kappa y, with ``y`` measured from a
+reference axis, and the section equations are solved in closed form for
+every section and output age at once.
+
+Parameter objects built from arrays of shape ``S`` describe ``S``
+sections (one mix, humidity, size... each); geometry and steel arrays
+broadcast against ``S``, steel layers along a trailing axis.  Units are SI
+(m, N, Pa), compression negative; outputs have the ages on the last axis
+(before the layer axis for steel stresses).
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .units import MPa, GPa
+
+SectionHistory = namedtuple('SectionHistory', ['t', 'phi', 'chi', 'E_e', 'eps_0', 'kappa', 'sigma_s', 'sigma_c', 'sigma_c_slope'])
+
+DT_MIN = 0.01 		# first step after loading (days)
+STEPS_PER_DECADE = 10
+
+
+def _shape(params):
+	names = ('t0', 'tp', 't0t', 'beta_ts', 'beta_tc', 'tau_sh', 'h', 'q1', 'q2', 'q3', 'q4', 'q5', 'p5H', 'Rt', 'E_28')
+	return np.broadcast(*[getattr(params, name) for name in names]).shape
+
+
+def _lead(a, ndim):
+	# time axis first: (T,) -> (T, 1, ...) against parameters of ``ndim`` dimensions
+	return np.reshape(a, np.shape(a) + (1,) * ndim)
+
+
+def relaxation(params, t_max, tp=None, dt_min=DT_MIN, steps_per_decade=STEPS_PER_DECADE):
+	"""Relaxation function R(t, tp) in MPa on the grid tp + [0, dt_min 10**(k/steps_per_decade)...].
+
+	Returns ``(dt, R, J)``: the grid of ages since loading (up to ``t_max -
+	tp``), and R and J(t, tp) with the grid on the first axis.  The strain
+	history of unit strain from ``tp`` is solved step by step with the
+	trapezoidal rule, one compliance row per step evaluated for all
+	sections at once.
+	"""
+	tp = params.tp if tp is None else np.asarray(tp, dtype=float)
+	shape = _shape(params)
+	span = max(float(np.max(np.asarray(t_max, dtype=float) - tp)), dt_min)
+	steps = int(np.ceil(np.log10(span / dt_min) * steps_per_decade)) + 1
+	dt = np.concatenate([[0.0], dt_min * 10 ** (np.arange(steps) / float(steps_per_decade))])
+	n = len(dt)
+	t = np.asarray(tp, dtype=float) + _lead(dt, len(shape))
+	t = np.broadcast_to(t, (n,) + shape)
+	d_sigma = np.empty((n,) + shape)
+	R = np.empty((n,) + shape)
+	J = np.empty((n,) + shape)
+	J[0] = params.J(t[0], t[0])
+	d_sigma[0] = R[0] = 1 / J[0]
+	for k in range(1, n):
+		row = params.J(t[k], t[:k + 1]) 	# J(t_k, t_j), j = 0..k
+		J[k] = row[0]
+		A = 0.5 * (row[1:] + row[:-1])
+		rest = 1 - row[0] * d_sigma[0] - np.sum(A[:-1] * d_sigma[1:k], axis=0)
+		d_sigma[k] = rest / A[-1]
+		R[k] = R[k - 1] + d_sigma[k]
+	return dt, R, J
+
+
+def aging_coefficient(params, t, tp=None, dt_min=DT_MIN, steps_per_decade=STEPS_PER_DECADE):
+	"""Creep and aging coefficients ``(phi, chi)`` at ages ``t`` (1-D) for loading at ``tp``.
+
+	Both have the sections' shape plus the ages as last axis (``nan``
+	before loading); chi tends to 1 at loading.
+	"""
+	tp = params.tp if tp is None else np.asarray(tp, dtype=float)
+	t = np.asarray(t, dtype=float)
+	if t.ndim != 1:
+		raise ValueError('t must be a 1-D array of ages')
+	ndim = len(_shape(params))
+	dt, R, J = relaxation(params, t.max(), tp, dt_min, steps_per_decade)
+	E = 1 / J[0]
+	with np.errstate(divide='ignore', invalid='ignore'):
+		chi_grid = E / (E - R) - 1 / (E * J - 1)
+	chi_grid[0] = 1.0
+	# interpolation in log(t - tp) on the geometric grid
+	age = _lead(t, ndim) - tp
+	# grid index: 0 at loading, 1 + log10(age / dt_min) * steps_per_decade after dt_min
+	x = np.where(age < dt_min, age / dt_min, np.log10(np.maximum(age, dt_min) / dt_min) * steps_per_decade + 1)
+	i = np.clip(np.floor(x).astype(np.intp), 0, len(dt) - 2)
+	w = np.clip(x - i, 0, 1)
+	chi_grid = np.broadcast_to(chi_grid, chi_grid.shape[:1] + np.broadcast(age, chi_grid[0]).shape[1:])
+	i, w = np.broadcast_arrays(i, w, chi_grid[:1])[:2]
+	chi = (1 - w) * np.take_along_axis(chi_grid, i, axis=0) + w * np.take_along_axis(chi_grid, i + 1, axis=0)
+	phi = np.where(age >= 0, E * params.J(_lead(t, ndim), tp) - 1, np.nan)
+	return np.moveaxis(phi, 0, -1), np.moveaxis(chi, 0, -1)
+
+
+def _solve(RA, RB, RI, FN, FM):
+	det = RA * RI - RB * RB
+	return (RI * FN - RB * FM) / det, (RA * FM - RB * FN) / det
+
+
+def analyze(params, t, N, M, A_c, I_c, B_c=0.0, A_s=0.0, y_s=0.0, E_s=200 * GPa, eps_p=0.0, tp=None,
+		shrinkage=True, dt_min=DT_MIN, steps_per_decade=STEPS_PER_DECADE):
+	"""Strain and stress histories of sections under ``N`` (N) and ``M`` (N m) sustained from ``tp``.
+
+	``A_c``, ``B_c`` and ``I_c`` are the area (m2) and the first and second
+	moments (m3, m4) of the concrete about the reference axis; steel layers
+	(reinforcement and bonded tendons) have areas ``A_s`` at ``y_s`` (m)
+	with modulus ``E_s`` (Pa) and an initial strain ``eps_p`` over the
+	concrete (prestress: force at transfer / (E_s A_s)).  ``M`` is the
+	moment of the stresses about the reference axis, positive for tension
+	at positive ``y``.  With ``shrinkage`` the free drying and autogenous
+	shrinkage after ``tp`` act on the concrete.
+
+	Returns a ``SectionHistory``: ``phi``, ``chi``, the age-adjusted
+	modulus ``E_e`` = E_0 / (1 + chi phi) (Pa), the strain ``eps_0`` at the reference axis, the
+	curvature ``kappa`` (1/m), the steel stresses ``sigma_s`` (Pa, layers
+	last) and the concrete stress ``sigma_c`` at the reference axis with
+	its gradient ``sigma_c_slope`` (Pa/m), each at every age of ``t``
+	(``nan`` before loading).
+	"""
+	tp = params.tp if tp is None else np.asarray(tp, dtype=float)
+	t = np.asarray(t, dtype=float)
+	phi, chi = aging_coefficient(params, t, tp, dt_min, steps_per_decade)
+	# time axis first below, steel layers last
+	phi, chi = np.moveaxis(phi, -1, 0), np.moveaxis(chi, -1, 0)
+	ndim = len(_shape(params))
+	E0 = MPa / params.J(tp, tp)
+	E_e = E0 / (1 + chi * phi)
+	if shrinkage:
+		lead = _lead(t, ndim)
+		free = (params.eps_sh(lead) + params.eps_au(lead)) - (params.eps_sh(tp) + params.eps_au(tp))
+		free = np.where(lead >= tp, free, 0.0)
+	else:
+		free = 0.0
+	A_c, B_c, I_c, N, M = (np.asarray(v, dtype=float) for v in (A_c, B_c, I_c, N, M))
+	EA, y, eps_p = np.broadcast_arrays(np.asarray(E_s, dtype=float) * np.asarray(A_s, dtype=float),
+		np.asarray(y_s, dtype=float), np.asarray(eps_p, dtype=float))
+	EA = np.atleast_1d(EA)
+	y = np.atleast_1d(y)
+	eps_p = np.atleast_1d(eps_p)
+	SA, SB, SI = EA.sum(-1), (EA * y).sum(-1), (EA * y * y).sum(-1)
+	FN = N - (EA * eps_p).sum(-1)
+	FM = M - (EA * eps_p * y).sum(-1)
+	# at loading
+	eps_i, kappa_i = _solve(E0 * A_c + SA, E0 * B_c + SB, E0 * I_c + SI, FN, FM)
+	# at t: creep of the initial stress, shrinkage and the stress change on E_e
+	lock = E0 - E_e * (1 + phi)
+	eps_0, kappa = _solve(E_e * A_c + SA, E_e * B_c + SB, E_e * I_c + SI,
+		FN - lock * (A_c * eps_i + B_c * kappa_i) + E_e * A_c * free,
+		FM - lock * (B_c * eps_i + I_c * kappa_i) + E_e * B_c * free)
+	sigma_s = np.asarray(E_s, dtype=float) * (eps_0[..., None] + kappa[..., None] * y + eps_p)
+	sigma_c = E0 * eps_i + E_e * (eps_0 - (1 + phi) * eps_i - free)
+	sigma_c_slope = E0 * kappa_i + E_e * (kappa - (1 + phi) * kappa_i)
+	last = lambda a: np.moveaxis(np.broadcast_to(a, eps_0.shape), 0, -1)
+	return SectionHistory(t, last(phi), last(chi), last(E_e), last(eps_0), last(kappa),
+		np.moveaxis(sigma_s, 0, -2), last(sigma_c), last(sigma_c_slope))
@@ -0,0 +1,404 @@
+"""Asyncio evaluation service with request micro-batching.
+
+Requests (one mix at one age or over a series of ages) arriving within a
+latency ``window`` are coalesced into one vectorized ``batch`` evaluation
+per model, so many small concurrent callers cost about as much as one
+large call.  Batches of ``offload`` points or more are evaluated in a pool
+of worker processes, smaller ones directly in the event loop.
+
+	service = Service(window=0.002)
+	async with service:
+		r = await service.evaluate('B4', mix, t=[7, 28, 365])
+
+``serve`` exposes the same over HTTP/1.1 with JSON bodies
+(``POST /evaluate``, ``GET /stats``); ``LocalClient`` speaks that protocol
+to a service in the same process, ``HTTPClient`` to a server.  ``stats``
+reports request latency percentiles and throughput.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import batch, tables
+
+MODELS = {
+	'B4': (batch.evaluate_b4, batch.B4_REQUIRED, batch.B4_DEFAULTS),
+	'B4s': (batch.evaluate_b4s, batch.B4S_REQUIRED, batch.B4S_DEFAULTS),
+}
+OUTPUTS = batch.MIX_OUTPUTS + batch.STRAIN_OUTPUTS
+WINDOW = 2e-3 		# s
+MAX_BATCH = 2**16 	# points
+OFFLOAD = 2**14 	# points
+LATENCIES = 10**5 	# latencies kept for the percentiles
+
+
+def _evaluate(model, cols, check):
+	return MODELS[model][0](cols, check=check)
+
+
+def _inputs(mix, required, defaults):
+	# ``batch.columns`` for one mix of scalars, without its array overhead
+	missing = [name for name in required if name not in mix]
+	if missing:
+		raise ValueError('missing input column(s): %s' % ', '.join(missing))
+	cols = {}
+	for name in tuple(required) + tuple(defaults):
+		value = mix.get(name, defaults.get(name))
+		if np.ndim(value):
+			raise ValueError('mix inputs must be scalars (one request per mix): %s' % name)
+		if name in batch.CATEGORIES:
+			keys, what = batch.CATEGORIES[name]
+			keys = getattr(tables, keys)
+			if isinstance(value, str) and value in keys:
+				value = keys.index(value)
+			else:
+				value = int(tables.codes(value, keys, what))
+		else:
+			value = float(value)
+		cols[name] = value
+	return cols
+
+
+class _Request(object):
+
+	def __init__(self, model, cols, t, outputs, future):
+		self.model = model
+		self.cols = cols
+		self.t = t
+		self.outputs = outputs
+		self.future = future
+		self.start = time.perf_counter()
+
+
+class Service(object):
+	"""Micro-batching evaluator of models B4 and B4s.
+
+	Requests wait at most ``window`` seconds (less once ``max_batch``
+	points are queued) to be evaluated together.  ``workers`` processes
+	(0: none) take the batches of at least ``offload`` points.  Use as an
+	async context manager or call ``start``/``stop``.
+	"""
+
+	def __init__(self, window=WINDOW, max_batch=MAX_BATCH, workers=0, offload=OFFLOAD, check=True):
+		self.window = window
+		self.max_batch = max_batch
+		self.workers = workers
+		self.offload = offload
+		self.check = check
+		self._pending = []
+		self._rows = 0
+		self._task = None
+		self._pool = None
+		self._running = set()
+		self.reset_stats()
+
+	async def __aenter__(self):
+		await self.start()
+		return self
+
+	async def __aexit__(self, *exc):
+		await self.stop()
+
+	async def start(self):
+		if self._task is not None:
+			return
+		self._arrived = asyncio.Event()
+		self._full = asyncio.Event()
+		if self.workers:
+			self._pool = ProcessPoolExecutor(self.workers)
+		self._task = asyncio.ensure_future(self._batcher())
+
+	async def stop(self):
+		"""Finish the queued requests, then stop the batcher and the workers."""
+		if self._task is None:
+			return
+		while self._pending or self._running:
+			self._full.set()
+			await asyncio.sleep(0)
+			if self._running:
+				await asyncio.wait(list(self._running))
+		self._task.cancel()
+		try:
+			await self._task
+		except asyncio.CancelledError:
+			pass
+		self._task = None
+		if self._pool is not None:
+			self._pool.shutdown()
+			self._pool = None
+
+	###########################################
+	# Requests
+	###########################################
+
+	async def evaluate(self, model='B4', mix=None, t=None, outputs=batch.STRAIN_OUTPUTS):
+		"""Outputs of ``model`` for the scalar inputs ``mix`` at the age(s) ``t``.
+
+		``t`` (days) defaults to the mix's ``t``; a scalar gives float
+		outputs, a 1-D series arrays.  Invalid requests raise ValueError
+		without affecting the requests batched with them.
+		"""
+		if self._task is None:
+			raise RuntimeError('service is not started')
+		if model not in MODELS:
+			raise ValueError("model must be 'B4' or 'B4s'")
+		unknown = [name for name in outputs if name not in OUTPUTS]
+		if unknown:
+			raise ValueError('unknown output(s): %s' % ', '.join(unknown))
+		mix = dict(mix or {})
+		t = mix.pop('t', None) if t is None else t
+		if t is None:
+			raise ValueError('missing age t')
+		t = np.asarray(t, dtype=float)
+		if t.ndim > 1 or not t.size:
+			raise ValueError('t must be a scalar or a non-empty series of ages')
+		if not np.all(np.isfinite(t)):
+			raise ValueError('ages t must be finite')
+		_, required, defaults = MODELS[model]
+		cols = _inputs(mix, required, defaults)
+		future = asyncio.get_event_loop().create_future()
+		self._pending.append(_Request(model, cols, t, tuple(outputs), future))
+		self._rows += t.size
+		self._arrived.set()
+		if self._rows >= self.max_batch:
+			self._full.set()
+		return await future
+
+	async def _batcher(self):
+		while True:
+			await self._arrived.wait()
+			if self._rows < self.max_batch:
+				try:
+					await asyncio.wait_for(self._full.wait(), self.window)
+				except asyncio.TimeoutError:
+					pass
+			requests, self._pending, self._rows = self._pending, [], 0
+			self._arrived.clear()
+			self._full.clear()
+			for model in MODELS:
+				group = [r for r in requests if r.model == model]
+				for start in range(0, len(group), self.max_batch):
+					self._dispatch(model, group[start:start + self.max_batch])
+
+	def _dispatch(self, model, requests):
+		if not requests:
+			return
+		rows = sum(r.t.size for r in requests)
+		if self._pool is not None and rows >= self.offload:
+			task = asyncio.ensure_future(self._run(model, requests, rows))
+			self._running.add(task)
+			task.add_done_callback(self._running.discard)
+		else:
+			self._complete(model, requests, rows, self._call(model, requests))
+
+	def _columns(self, requests):
+		sizes = [r.t.size for r in requests]
+		cols = dict((name, np.repeat([r.cols[name] for r in requests], sizes)) for name in requests[0].cols)
+		cols['t'] = np.concatenate([r.t.ravel() for r in requests])
+		return cols
+
+	def _call(self, model, requests):
+		try:
+			return _evaluate(model, self._columns(requests), self.check)
+		except Exception as e:
+			return e
+
+	async def _run(self, model, requests, rows):
+		loop = asyncio.get_event_loop()
+		try:
+			result = await loop.run_in_executor(self._pool, _evaluate, model, self._columns(requests), self.check)
+		except Exception as e:
+			result = e
+		self._offloaded += 1
+		self._complete(model, requests, rows, result)
+
+	def _complete(self, model, requests, rows, result):
+		if isinstance(result, Exception):
+			if len(requests) > 1:
+				# one bad request must not fail the others: evaluate them one by one
+				for r in requests:
+					self._complete(model, [r], r.t.size, self._call(model, [r]))
+				return
+			self._finish(requests[0], exception=result)
+			return
+		self._batches += 1
+		self._points += rows
+		start = 0
+		for r in requests:
+			stop = start + r.t.size
+			out = dict((name, result[name][start:stop]) for name in r.outputs)
+			if r.t.ndim == 0:
+				out = dict((name, float(value[0])) for name, value in out.items())
+			self._finish(r, out)
+			start = stop
+
+	def _finish(self, request, result=None, exception=None):
+		self._latencies.append(time.perf_counter() - request.start)
+		if request.future.done():
+			return 		# cancelled by the caller
+		if exception is not None:
+			self._errors += 1
+			request.future.set_exception(exception)
+		else:
+			self._requests += 1
+			request.future.set_result(result)
+
+	###########################################
+	# Statistics
+	###########################################
+
+	def reset_stats(self):
+		self._started = time.perf_counter()
+		self._latencies = deque(maxlen=LATENCIES)
+		self._requests = self._errors = self._points = self._batches = self._offloaded = 0
+
+	def stats(self):
+		"""Counts, latency percentiles (s) and throughput since the last ``reset_stats``."""
+		elapsed = time.perf_counter() - self._started
+		latencies = np.array(self._latencies)
+		p50, p99 = np.percentile(latencies, (50, 99)) if latencies.size else (np.nan, np.nan)
+		return dict(
+			requests=self._requests, errors=self._errors, points=self._points, batches=self._batches,
+			offloaded=self._offloaded, mean_batch=self._points / self._batches if self._batches else 0.0,
+			latency_p50=float(p50), latency_p99=float(p99),
+			requests_per_second=self._requests / elapsed, points_per_second=self._points / elapsed)
+
+	###########################################
+	# Protocol
+	###########################################
+
+	async def handle(self, method, path, body):
+		"""Answer one protocol request: ``(status, payload)``."""
+		if method == 'GET' and path == '/stats':
+			return 200, self.stats()
+		if path != '/evaluate':
+			return 404, dict(error='no such resource: %s' % path)
+		if method != 'POST':
+			return 405, dict(error='use POST')
+		try:
+			request = json.loads(body.decode() if isinstance(body, bytes) else body)
+			if not isinstance(request, dict):
+				raise ValueError('request must be a JSON object')
+			result = await self.evaluate(request.get('model', 'B4'), request.get('mix'), request.get('t'),
+				request.get('outputs', batch.STRAIN_OUTPUTS))
+		except (ValueError, TypeError) as e:
+			return 400, dict(error=str(e))
+		return 200, dict((name, value.tolist() if isinstance(value, np.ndarray) else value)
+			for name, value in result.items())
+
+	async def _connection(self, reader, writer):
+		try:
+			while True:
+				line = await reader.readline()
+				if not line.strip():
+					break
+				method, path = line.decode('latin-1').split()[:2]
+				headers = {}
+				while True:
+					line = await reader.readline()
+					if not line.strip():
+						break
+					key, _, value = line.decode('latin-1').partition(':')
+					headers[key.strip().lower()] = value.strip()
+				body = await reader.readexactly(int(headers.get('content-length', 0)))
+				status, payload = await self.handle(method, path, body)
+				data = json.dumps(payload).encode()
+				close = headers.get('connection', '').lower() == 'close'
+				writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n%s\r\n' % (
+					status, _REASONS.get(status, ''), len(data), 'Connection: close\r\n' if close else '')).encode() + data)
+				await writer.drain()
+				if close:
+					break
+		except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+			pass
+		finally:
+			writer.close()
+
+	async def serve(self, host='127.0.0.1', port=8642):
+		"""Start the service and an HTTP server on ``host:port``; returns the ``asyncio`` server."""
+		await self.start()
+		return await asyncio.start_server(self._connection, host, port)
+
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class _Client(object):
+
+	async def evaluate(self, model='B4', mix=None, t=None, outputs=batch.STRAIN_OUTPUTS):
+		"""Outputs as floats or lists; a rejected request raises ValueError."""
+		request = dict(model=model, mix=mix, outputs=list(outputs))
+		if t is not None:
+			request['t'] = np.asarray(t, dtype=float).tolist()
+		status, payload = await self.request('POST', '/evaluate', json.dumps(request).encode())
+		if status != 200:
+			raise ValueError(payload.get('error', 'status %d' % status))
+		return payload
+
+	async def stats(self):
+		return (await self.request('GET', '/stats', b''))[1]
+
+
+class LocalClient(_Client):
+	"""Client of a ``Service`` in the same process (no sockets, same protocol)."""
+
+	def __init__(self, service):
+		self.service = service
+
+	async def request(self, method, path, body):
+		status, payload = await self.service.handle(method, path, body)
+		# through JSON as over the wire
+		return status, json.loads(json.dumps(payload))
+
+
+class HTTPClient(_Client):
+	"""Client of a server started with ``Service.serve`` (one keep-alive connection)."""
+
+	def __init__(self, host='127.0.0.1', port=8642):
+		self.host = host
+		self.port = port
+		self._streams = None
+
+	async def request(self, method, path, body):
+		if self._streams is None:
+			self._streams = await asyncio.open_connection(self.host, self.port)
+		reader, writer = self._streams
+		writer.write(('%s %s HTTP/1.1\r\nHost: %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n' % (
+			method, path, self.host, len(body))).encode() + body)
+		await writer.drain()
+		status = int((await reader.readline()).split()[1])
+		length = 0
+		while True:
+			line = await reader.readline()
+			if not line.strip():
+				break
+			key, _, value = line.decode('latin-1').partition(':')
+			if key.strip().lower() == 'content-length':
+				length = int(value)
+		return status, json.loads((await reader.readexactly(length)).decode())
+
+	async def close(self):
+		if self._streams is not None:
+			self._streams[1].close()
+			self._streams = None
+
+
+def run(host='127.0.0.1', port=8642, **kwargs):
+	"""Serve until interrupted (``python -m b4 serve``)."""
+	async def main():
+		service = Service(**kwargs)
+		server = await service.serve(host, port)
+		try:
+			await server.serve_forever()
+		finally:
+			server.close()
+			await service.stop()
+	try:
+		asyncio.run(main())
+	except KeyboardInterrupt:
+		pass
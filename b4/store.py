@@ -0,0 +1,368 @@
+"""Chunked, compressed on-disk storage of strain histories (points x times).
+
+A ``Store`` is a directory with a manifest ``store.json`` and, per dataset,
+one file per chunk (``<name>/<i>.<j>``), as in the directory layout of
+Zarr; neither h5py nor zarr is needed.  Chunks are encoded by optional
+filters and zlib: ``'delta'`` replaces the values by the differences of
+their bit patterns along the time axis (the second; lossless, and smooth
+histories then differ in their low bytes only) and ``'shuffle'`` groups the
+bytes of equal significance; with both, zlib stores model histories in
+float64 at about 1.7 times less than raw.  ``dtype='f4'`` (7 significant
+digits, ample for strains) compresses them about 3 times, 6 times less
+than raw float64.
+
+Writes ``ds[rows, cols] = block`` come in any order and size as batches
+finish: a chunk is encoded and written (atomically) once all its elements
+are given, partial chunks are kept in memory until ``flush``/``close``.
+Reads such as ``ds[i]`` (one point's history) or ``ds[:, k]`` (one age)
+decode only the chunks the selection touches, keeping the latest few;
+chunks stored without filters and compression are memory-mapped.  Chunks
+never written read as ``fill``.
+
+	with store.Store('histories') as s:
+		store.record(s, B4Params(**mesh_inputs), t)
+	s = store.Store('histories', mode='r')
+	node = s['eps_tot'][1234]
+	last = s['eps_tot'][:, -1]
+"""
+
+import copy
+import itertools
+import json
+import os
+import tempfile
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from .units import MPa
+
+FILE_FORMAT = 'b4-store'
+FILE_VERSION = 1
+FILTERS = ('delta', 'shuffle')
+CHUNK_VALUES = 2**18 		# default chunk size in values (2 MB in float64)
+CACHE = 16 			# decoded chunks kept per dataset
+OUTPUTS = ('eps_sh', 'eps_au', 'J_sigma', 'eps_tot')
+MANIFEST = 'store.json'
+
+
+def _default_chunks(shape):
+	if len(shape) == 1:
+		return (max(min(shape[0], CHUNK_VALUES), 1),)
+	times = max(min(shape[1], 256), 1)
+	rest = max(int(np.prod(shape[2:])), 1)
+	return (max(min(shape[0], CHUNK_VALUES // (times * rest)), 1), times) + tuple(max(n, 1) for n in shape[2:])
+
+
+def _encode(a, filters, level):
+	a = np.ascontiguousarray(a)
+	if 'delta' in filters:
+		# integer differences of the bit patterns: exact, wrapping around
+		axis = 1 if a.ndim > 1 else 0
+		i = np.moveaxis(a.view('i%d' % a.itemsize), axis, 0)
+		d = i.copy()
+		d[1:] -= i[:-1]
+		a = np.ascontiguousarray(np.moveaxis(d, 0, axis))
+	b = a.view(np.uint8).reshape(-1, a.itemsize)
+	if 'shuffle' in filters:
+		b = b.T
+	data = np.ascontiguousarray(b).tobytes()
+	return zlib.compress(data, level) if level else data
+
+
+def _decode(data, shape, dtype, filters, level):
+	if level:
+		data = zlib.decompress(data)
+	b = np.frombuffer(data, np.uint8)
+	if 'shuffle' in filters:
+		b = np.ascontiguousarray(b.reshape(dtype.itemsize, -1).T)
+	a = b.view(dtype).reshape(shape)
+	if 'delta' in filters:
+		i = a.view('i%d' % dtype.itemsize)
+		a = np.cumsum(i, axis=1 if a.ndim > 1 else 0, dtype=i.dtype).view(dtype)
+	return a
+
+
+def _atomic(path, data):
+	fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+	try:
+		with os.fdopen(fd, 'wb') as f:
+			f.write(data)
+		os.replace(tmp, path)
+	finally:
+		if os.path.exists(tmp):
+			os.remove(tmp)
+
+
+class Dataset(object):
+	"""Chunked array of a ``Store``; index it like a NumPy array (unit steps only)."""
+
+	def __init__(self, store, name, shape, chunks, dtype, filters, level, fill):
+		self.name = name
+		self.path = os.path.join(store.path, name)
+		self.writable = store.mode != 'r'
+		self.shape = tuple(shape)
+		self.chunks = tuple(chunks)
+		self.dtype = np.dtype(dtype)
+		self.filters = tuple(filters)
+		self.level = level
+		self.fill = fill
+		self.grid = tuple((n + c - 1) // c for n, c in zip(self.shape, self.chunks))
+		self._pending = {} 		# chunk index -> (values, mask of the elements given)
+		self._cache = OrderedDict()
+
+	@property
+	def ndim(self):
+		return len(self.shape)
+
+	def nbytes(self):
+		"""Bytes on disk (chunks written so far) and of the full array in memory."""
+		stored = sum(os.path.getsize(os.path.join(self.path, f)) for f in os.listdir(self.path) if not f.endswith('.tmp'))
+		return stored, int(np.prod(self.shape)) * self.dtype.itemsize
+
+	def _file(self, index):
+		return os.path.join(self.path, '.'.join(str(i) for i in index))
+
+	def _chunk_shape(self, index):
+		return tuple(min(c, n - i * c) for i, c, n in zip(index, self.chunks, self.shape))
+
+	def _region(self, key):
+		# (start, stop) per axis and the axes indexed by integers
+		if not isinstance(key, tuple):
+			key = (key,)
+		if len(key) > self.ndim:
+			raise IndexError('too many indices for a %d-D dataset' % self.ndim)
+		key = key + (slice(None),) * (self.ndim - len(key))
+		region, drop = [], []
+		for axis, (k, n) in enumerate(zip(key, self.shape)):
+			if isinstance(k, slice):
+				start, stop, step = k.indices(n)
+				if step != 1:
+					raise IndexError('datasets support unit steps only')
+				region.append((start, max(stop, start)))
+			else:
+				k = int(k)
+				if not -n <= k < n:
+					raise IndexError('index %d is out of bounds for axis %d with size %d' % (k, axis, n))
+				k %= n
+				region.append((k, k + 1))
+				drop.append(axis)
+		return region, drop
+
+	def _overlaps(self, region):
+		# chunks meeting ``region`` with the slices of the chunk and of the region
+		ranges = [range(start // c, (stop + c - 1) // c) for (start, stop), c in zip(region, self.chunks)]
+		for index in itertools.product(*ranges):
+			inner, outer = [], []
+			for i, c, (start, stop) in zip(index, self.chunks, region):
+				lo, hi = max(start, i * c), min(stop, (i + 1) * c)
+				inner.append(slice(lo - i * c, hi - i * c))
+				outer.append(slice(lo - start, hi - start))
+			yield index, tuple(inner), tuple(outer)
+
+	def _read(self, index):
+		if index in self._pending:
+			return self._pending[index][0]
+		if index in self._cache:
+			self._cache.move_to_end(index)
+			return self._cache[index]
+		path, shape = self._file(index), self._chunk_shape(index)
+		if not os.path.exists(path):
+			a = np.full(shape, self.fill, self.dtype)
+		elif not self.level and not self.filters:
+			a = np.memmap(path, self.dtype, 'r', shape=shape)
+		else:
+			with open(path, 'rb') as f:
+				a = _decode(f.read(), shape, self.dtype, self.filters, self.level)
+		self._cache[index] = a
+		if len(self._cache) > CACHE:
+			self._cache.popitem(last=False)
+		return a
+
+	def _write(self, index, a):
+		self._cache.pop(index, None)
+		_atomic(self._file(index), _encode(np.asarray(a, dtype=self.dtype), self.filters, self.level))
+
+	def __getitem__(self, key):
+		region, drop = self._region(key)
+		out = np.empty([stop - start for start, stop in region], self.dtype)
+		for index, inner, outer in self._overlaps(region):
+			out[outer] = self._read(index)[inner]
+		return out.reshape([n for axis, n in enumerate(out.shape) if axis not in drop])
+
+	def __setitem__(self, key, values):
+		if not self.writable:
+			raise ValueError('dataset %s is open read-only' % self.name)
+		region, drop = self._region(key)
+		shape = [stop - start for start, stop in region]
+		values = np.broadcast_to(np.asarray(values, dtype=self.dtype), [n for axis, n in enumerate(shape) if axis not in drop])
+		values = values.reshape(shape)
+		for index, inner, outer in self._overlaps(region):
+			cshape = self._chunk_shape(index)
+			if index not in self._pending:
+				if all(s.stop - s.start == n for s, n in zip(inner, cshape)):
+					self._write(index, values[outer])
+					continue
+				# chunks already on disk are complete: merge and rewrite
+				self._pending[index] = (np.array(self._read(index)), np.full(cshape, os.path.exists(self._file(index))))
+				self._cache.pop(index, None)
+			a, mask = self._pending[index]
+			a[inner] = values[outer]
+			mask[inner] = True
+			if mask.all():
+				self._write(index, a)
+				del self._pending[index]
+
+	def flush(self):
+		"""Write the chunks given in part (missing elements hold ``fill``)."""
+		for index, (a, _) in self._pending.items():
+			self._write(index, a)
+		self._pending = {}
+
+
+class Store(object):
+	"""Directory of ``Dataset`` arrays and JSON attributes; ``mode`` 'r' (read-only) or 'a' (create if missing)."""
+
+	def __init__(self, path, mode='a'):
+		if mode not in ('r', 'a'):
+			raise ValueError("mode must be 'r' or 'a'")
+		self.path = path
+		self.mode = mode
+		manifest = os.path.join(path, MANIFEST)
+		if os.path.exists(manifest):
+			with open(manifest) as f:
+				content = json.load(f)
+			if not isinstance(content, dict) or content.get('format') != FILE_FORMAT:
+				raise ValueError('%s is not a B4 store' % path)
+			if content.get('version') != FILE_VERSION:
+				raise ValueError('store %s has version %s, expected %s' % (path, content.get('version'), FILE_VERSION))
+		elif mode == 'r':
+			raise ValueError('%s is not a B4 store' % path)
+		else:
+			if not os.path.isdir(path):
+				os.makedirs(path)
+			content = dict(format=FILE_FORMAT, version=FILE_VERSION, datasets={}, attrs={})
+			self._content = content
+			self._save()
+		self._content = content
+		self._datasets = {}
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def _save(self):
+		_atomic(os.path.join(self.path, MANIFEST), json.dumps(self._content, indent=1).encode())
+
+	@property
+	def names(self):
+		return tuple(sorted(self._content['datasets']))
+
+	@property
+	def attrs(self):
+		return dict(self._content['attrs'])
+
+	def set_attrs(self, **attrs):
+		"""Store JSON-serializable attributes (e.g. units, the mix) with the datasets."""
+		if self.mode == 'r':
+			raise ValueError('store %s is open read-only' % self.path)
+		self._content['attrs'].update(attrs)
+		self._save()
+
+	def __contains__(self, name):
+		return name in self._content['datasets']
+
+	def create(self, name, shape, chunks=None, dtype='f8', filters=FILTERS, level=1, fill=np.nan):
+		"""New dataset ``name`` of ``shape`` (points, times, ...).
+
+		``chunks`` defaults to about ``CHUNK_VALUES`` values with up to 256
+		ages each; ``filters`` is a subset of ``FILTERS`` and ``level`` the
+		zlib level (higher ones gain little on these data; 0 for none, and
+		without filters the chunks are then raw and read memory-mapped).
+		"""
+		if self.mode == 'r':
+			raise ValueError('store %s is open read-only' % self.path)
+		if name in self:
+			raise ValueError('dataset %s exists in %s' % (name, self.path))
+		if not name or name == MANIFEST or os.sep in name or name.startswith('.'):
+			raise ValueError('invalid dataset name %r' % name)
+		shape = tuple(int(n) for n in np.atleast_1d(shape))
+		chunks = _default_chunks(shape) if chunks is None else tuple(int(c) for c in chunks)
+		if len(chunks) != len(shape) or min(chunks) < 1:
+			raise ValueError('chunks must give a positive size for each of the %d axes' % len(shape))
+		if np.dtype(dtype).kind not in 'fiu':
+			raise ValueError('datasets hold integers or floats')
+		unknown = [f for f in filters if f not in FILTERS]
+		if unknown:
+			raise ValueError('unknown filter(s) %s; choose from %s' % (', '.join(unknown), ', '.join(FILTERS)))
+		os.makedirs(os.path.join(self.path, name), exist_ok=True)
+		self._content['datasets'][name] = dict(shape=shape, chunks=chunks, dtype=np.dtype(dtype).str, filters=list(filters),
+			level=int(level), fill=float(fill))
+		self._save()
+		return self[name]
+
+	def __getitem__(self, name):
+		if name not in self._datasets:
+			if name not in self:
+				raise KeyError('no dataset %s in %s' % (name, self.path))
+			spec = self._content['datasets'][name]
+			self._datasets[name] = Dataset(self, name, spec['shape'], spec['chunks'], spec['dtype'], spec['filters'],
+				spec['level'], spec['fill'])
+		return self._datasets[name]
+
+	def flush(self):
+		for ds in self._datasets.values():
+			if ds.writable:
+				ds.flush()
+
+	def close(self):
+		self.flush()
+		self._datasets = {}
+
+
+def _rows(params, points, start, stop):
+	# the points start:stop of 1-D parameter arrays, as a column against the ages
+	P = copy.copy(params)
+	for name, value in vars(params).items():
+		if isinstance(value, np.ndarray) and value.ndim == 1 and len(value) == points:
+			setattr(P, name, value[start:stop, None])
+	return P
+
+
+def record(store, params, t, tp=None, sigma=None, outputs=OUTPUTS, batch=4096, **create):
+	"""Write the strain histories of the points of ``params`` at ages ``t`` into ``store``.
+
+	``params`` holds scalars or 1-D arrays over the points; each name of
+	``outputs`` (``eps_sh``, ``eps_au``, ``J_sigma`` = J sigma / MPa under
+	``sigma`` in Pa, default the applied stress, and ``eps_tot``) becomes a
+	dataset (points, times), and ``t`` a 1-D dataset.  Points are evaluated
+	and written ``batch`` at a time; ``create`` goes to ``Store.create``
+	(``chunks``, ``dtype``, ``filters``, ``level``).  Returns the datasets.
+	"""
+	t = np.asarray(t, dtype=float)
+	if t.ndim != 1:
+		raise ValueError('t must be a 1-D array of ages')
+	unknown = [name for name in outputs if name not in OUTPUTS]
+	if unknown:
+		raise ValueError('%s is not an output; choose from %s' % (', '.join(unknown), ', '.join(OUTPUTS)))
+	shape = np.broadcast(*[v for v in vars(params).values() if isinstance(v, np.ndarray)]).shape
+	if len(shape) > 1:
+		raise ValueError('record needs parameters over a 1-D set of points')
+	points = shape[0] if shape else 1
+	store.create('t', t.shape, dtype='f8', filters=(), level=0)[:] = t
+	datasets = dict((name, store.create(name, (points, len(t)), **create)) for name in outputs)
+	for start in range(0, points, batch):
+		stop = min(start + batch, points)
+		column = lambda v: v if np.ndim(v) == 0 else np.broadcast_to(v, (points,))[start:stop, None]
+		P = _rows(params, points, start, stop)
+		h = P.history(t, None if tp is None else column(np.asarray(tp, dtype=float)),
+			None if sigma is None else column(np.asarray(sigma, dtype=float)))
+		values = dict(eps_sh=h.eps_sh, eps_au=h.eps_au, eps_tot=h.eps_tot,
+			J_sigma=h.J * (P.sigma if sigma is None else column(np.asarray(sigma, dtype=float))) / MPa)
+		for name in outputs:
+			datasets[name][start:stop] = values[name]
+	store.flush()
+	return datasets
@@ -0,0 +1,95 @@
+"""Streaming superposition of creep for variable stress histories.
+
+eps(t) = sum over increments of J(t, t_i) * d_sigma_i  (principle of superposition)
+
+Increments (t_i, d_sigma_i) arrive as a time-ordered stream.  Each one adds
+its compliance row J(t_out, t_i) to the strain accumulators of the output
+times not yet emitted; an output is final, and is yielded, as soon as an
+increment later than it arrives.  Memory is bounded by the number of output
+times (plus the row cache), the N x N compliance matrix is never formed.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from .units import MPa
+
+
+class Superposition(object):
+	"""Superposition solver for one parameter object and fixed output ages.
+
+	Compliance rows are cached per load age (LRU, ``cache_size`` rows), so
+	repeated load ages, within one history or across many histories run on
+	the same solver, reuse the J(t, t') evaluation.
+	"""
+
+	def __init__(self, params, t_out, cache_size=256):
+		self.params = params
+		self.t_out = np.asarray(t_out, dtype=float)
+		if self.t_out.ndim != 1 or np.any(np.diff(self.t_out) < 0):
+			raise ValueError('output ages must be a sorted 1-D array')
+		self.cache_size = cache_size
+		self._rows = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def row(self, tp):
+		"""J(t_out[k:], tp) in 1/MPa for the outputs at or after ``tp``."""
+		row = self._rows.get(tp)
+		if row is not None:
+			self._rows.move_to_end(tp)
+			self.hits += 1
+			return row
+		self.misses += 1
+		k = int(np.searchsorted(self.t_out, tp))
+		row = self.params.J(self.t_out[k:], tp)
+		if self.cache_size:
+			self._rows[tp] = row
+			if len(self._rows) > self.cache_size:
+				self._rows.popitem(last=False)
+		return row
+
+	def run(self, increments, total=False):
+		"""Yield ``(t, eps)`` for every output age from a stream of ``(t_i, d_sigma_i)``.
+
+		``d_sigma_i`` in Pa may be a scalar or an array (several points loaded
+		at the same ages); ``eps`` is the stress-dependent strain, or the total
+		strain (Eq. 12) when ``total`` is set.
+		"""
+		t_out = self.t_out
+		eps = np.zeros(len(t_out))
+		done = 0
+		last = -np.inf
+		for t_i, d_sigma in increments:
+			t_i = float(t_i)
+			if t_i < last:
+				raise ValueError('load increments must be ordered in time (%g < %g)' % (t_i, last))
+			last = t_i
+			# outputs before this load are final
+			while done < len(t_out) and t_out[done] < t_i:
+				yield t_out[done], self._value(t_out[done], eps[done], total)
+				done += 1
+			# drop the emitted part of the accumulator on long output series
+			if done > 1024 and done > len(t_out) // 2:
+				t_out, eps, done = t_out[done:], eps[done:], 0
+			row = self.row(t_i)
+			d_sigma = np.asarray(d_sigma, dtype=float) / MPa
+			if d_sigma.ndim > eps.ndim - 1:
+				eps = eps.reshape(eps.shape + (1,) * (d_sigma.ndim - eps.ndim + 1)) + np.zeros(d_sigma.shape)
+			k = len(t_out) - len(row)
+			eps[k:] += row.reshape(row.shape + (1,) * (eps.ndim - 1)) * d_sigma
+		while done < len(t_out):
+			yield t_out[done], self._value(t_out[done], eps[done], total)
+			done += 1
+
+	def _value(self, t, eps, total):
+		if not total:
+			return eps
+		p = self.params
+		return eps + p.eps_sh(t) + p.eps_au(t) + p.T_infl
+
+
+def superpose(params, increments, t_out, total=False, cache_size=256):
+	"""Generator of ``(t, eps)`` at ages ``t_out`` for the stress increments stream."""
+	return Superposition(params, t_out, cache_size).run(increments, total)
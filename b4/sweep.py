@@ -0,0 +1,238 @@
+"""Multi-process parameter sweeps of models B4 and B4s with sharded results.
+
+A ``Sweep`` describes a design over some input factors (continuous ranges
+and categorical labels) around a base mix.  The design is split into shards
+of ``shard_size`` rows; each shard generates its own rows from the seed and
+its index, so workers receive only the (small) sweep description and no
+input arrays are pickled.  Every shard is written atomically as one record
+array ``shard-NNNNN.npy`` (or ``.parquet``) holding inputs and outputs, and
+a rerun skips shards already on disk, so a crashed sweep resumes where it
+stopped.
+
+Design methods: ``'random'``, ``'lhs'`` (Latin hypercube per shard),
+``'sobol'`` (scrambled Sobol sequence, needs SciPy) and ``'morris'``
+(one-at-a-time trajectories of k + 1 rows on a 4-level grid).
+"""
+
+import json
+import os
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import batch
+from .examples import B4_EXAMPLE, B4S_EXAMPLE
+
+MODELS = {
+	'B4': (batch.evaluate_b4, B4_EXAMPLE),
+	'B4s': (batch.evaluate_b4s, B4S_EXAMPLE),
+}
+INPUTS = {
+	'B4': batch.B4_REQUIRED + tuple(batch.B4_DEFAULTS),
+	'B4s': batch.B4S_REQUIRED + tuple(batch.B4S_DEFAULTS),
+}
+METHODS = ('random', 'lhs', 'sobol', 'morris')
+MORRIS_LEVELS = 4
+
+
+class Sweep(object):
+	"""Sweep of ``model`` ('B4' or 'B4s') over ``ranges`` and ``categories``.
+
+	``ranges`` maps input names to ``(low, high)``, ``categories`` maps
+	categorical inputs to the labels to draw from; all other inputs are taken
+	from ``base`` (default: the model's example).  ``t`` gives the ages, a
+	scalar or a 1-D array (outputs then hold one value per age).
+	"""
+
+	def __init__(self, directory, model='B4', ranges=None, categories=None, base=None, t=10000.0,
+			n=10**6, shard_size=10**5, method='lhs', seed=0, outputs=batch.MIX_OUTPUTS + batch.STRAIN_OUTPUTS,
+			format='npy'):
+		if model not in MODELS:
+			raise ValueError('model must be one of %s' % ', '.join(MODELS))
+		if method not in METHODS:
+			raise ValueError('method must be one of %s' % ', '.join(METHODS))
+		self.directory = directory
+		self.model = model
+		self.ranges = dict((k, [float(v[0]), float(v[1])]) for k, v in (ranges or {}).items())
+		self.categories = dict((k, list(v)) for k, v in (categories or {}).items())
+		unknown = sorted(name for name in list(self.ranges) + list(self.categories) if name not in INPUTS[model])
+		if unknown:
+			raise ValueError('unknown input(s) of model %s: %s' % (model, ', '.join(unknown)))
+		self.base = dict(MODELS[model][1] if base is None else base)
+		self.base.pop('t', None)
+		self.t = np.asarray(t, dtype=float).tolist()
+		self.n = int(n)
+		self.method = method
+		self.seed = int(seed)
+		self.outputs = list(outputs)
+		self.format = format
+		# Morris trajectories must not straddle shards
+		k1 = len(self.ranges) + len(self.categories) + 1
+		self.shard_size = int(shard_size) if method != 'morris' else max(int(shard_size) // k1, 1) * k1
+
+	def spec(self):
+		return dict(model=self.model, ranges=self.ranges, categories=self.categories,
+			base=dict((k, v) for k, v in self.base.items()), t=self.t, n=self.n, shard_size=self.shard_size,
+			method=self.method, seed=self.seed, outputs=self.outputs, format=self.format)
+
+	@property
+	def shards(self):
+		return (self.n + self.shard_size - 1) // self.shard_size
+
+	def path(self, index):
+		return os.path.join(self.directory, 'shard-%05d.%s' % (index, self.format))
+
+	def design(self, index):
+		"""Input columns of shard ``index``."""
+		start = index * self.shard_size
+		size = min(self.shard_size, self.n - start)
+		names = list(self.ranges) + list(self.categories)
+		U = _unit_design(self.method, size, len(names), self.seed, index, start)
+		cols = {}
+		for k, name in enumerate(names):
+			if name in self.ranges:
+				low, high = self.ranges[name]
+				cols[name] = low + (high - low) * U[:, k]
+			else:
+				labels = np.array(self.categories[name])
+				cols[name] = labels[np.minimum((U[:, k] * len(labels)).astype(np.intp), len(labels) - 1)]
+		return cols
+
+	def run_shard(self, index):
+		"""Evaluate and write shard ``index`` unless it exists; return its path."""
+		path = self.path(index)
+		if os.path.exists(path):
+			return path
+		cols = self.design(index)
+		size = len(next(iter(cols.values()))) if cols else min(self.shard_size, self.n - index * self.shard_size)
+		mixes = dict(self.base)
+		mixes.update(cols)
+		mixes = dict((k, v if k in cols else np.broadcast_to(v, (size,))) for k, v in mixes.items())
+		evaluate = MODELS[self.model][0]
+		t = np.asarray(self.t)
+		if t.ndim == 0:
+			mixes['t'] = np.full(size, float(t))
+			r = evaluate(mixes, check=False)
+		else:
+			r = evaluate(mixes, t=t, check=False)
+		data = dict((name, cols[name]) for name in cols)
+		data.update((name, r[name]) for name in self.outputs)
+		_write(path, data, self.format)
+		return path
+
+	def run(self, workers=None):
+		"""Run all missing shards on ``workers`` processes; return the shard paths."""
+		if not os.path.isdir(self.directory):
+			os.makedirs(self.directory)
+		manifest = os.path.join(self.directory, 'sweep.json')
+		spec = self.spec()
+		if os.path.exists(manifest):
+			with open(manifest) as f:
+				if json.load(f) != json.loads(json.dumps(spec)):
+					raise ValueError('%s holds a different sweep; use another directory' % self.directory)
+		else:
+			with open(manifest, 'w') as f:
+				json.dump(spec, f, indent=1)
+		todo = [i for i in range(self.shards) if not os.path.exists(self.path(i))]
+		if workers == 1 or len(todo) <= 1:
+			for i in todo:
+				self.run_shard(i)
+		else:
+			with ProcessPoolExecutor(workers) as pool:
+				list(pool.map(_run_shard, [(self.directory, i) for i in todo]))
+		return [self.path(i) for i in range(self.shards)]
+
+	@classmethod
+	def open(cls, directory):
+		"""Sweep described by the manifest in ``directory`` (to resume or read it)."""
+		with open(os.path.join(directory, 'sweep.json')) as f:
+			spec = json.load(f)
+		return cls(directory, **spec)
+
+	def load(self, index=None):
+		"""Shard ``index`` (memory-mapped), or all shards concatenated."""
+		if index is not None:
+			return _read(self.path(index), self.format)
+		parts = [_read(self.path(i), self.format) for i in range(self.shards)]
+		return np.concatenate(parts) if self.format == 'npy' else _concat_tables(parts)
+
+
+def _run_shard(job):
+	directory, index = job
+	return Sweep.open(directory).run_shard(index)
+
+
+def _unit_design(method, size, k, seed, index, start):
+	rng = np.random.default_rng([seed, index])
+	if method == 'random':
+		return rng.random((size, k))
+	if method == 'lhs':
+		U = (rng.random((size, k)) + np.arange(size)[:, None]) / size
+		for j in range(k):
+			U[:, j] = U[rng.permutation(size), j]
+		return U
+	if method == 'sobol':
+		from scipy.stats import qmc
+		sampler = qmc.Sobol(k, scramble=True, seed=seed)
+		if start:
+			sampler.fast_forward(start)
+		with warnings.catch_warnings():
+			# balance needs power-of-2 sizes; use such shard sizes when it matters
+			warnings.simplefilter('ignore', UserWarning)
+			return sampler.random(size)
+	# morris: trajectories of k + 1 points, each factor moved once by delta
+	levels = MORRIS_LEVELS
+	delta = levels / (2.0 * (levels - 1))
+	U = np.empty((-(-size // (k + 1)) * (k + 1), k))
+	for s in range(0, len(U), k + 1):
+		x = rng.integers(0, levels // 2, k) / (levels - 1.0)
+		U[s] = x
+		for step, j in enumerate(rng.permutation(k), 1):
+			x = x.copy()
+			x[j] += delta
+			U[s + step] = x
+	return U[:size]
+
+
+def _write(path, data, format):
+	directory = os.path.dirname(path)
+	fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+	os.close(fd)
+	try:
+		if format == 'parquet':
+			import pyarrow as pa
+			import pyarrow.parquet as pq
+			columns = {}
+			for name, value in data.items():
+				value = np.asarray(value)
+				if value.ndim > 1:
+					columns[name] = pa.FixedSizeListArray.from_arrays(pa.array(value.ravel()), value.shape[1])
+				else:
+					columns[name] = pa.array(value)
+			pq.write_table(pa.table(columns), tmp)
+		else:
+			rows = len(next(iter(data.values())))
+			dtype = [(name, np.asarray(v).dtype, np.shape(v)[1:]) for name, v in data.items()]
+			rec = np.empty(rows, dtype=dtype)
+			for name, value in data.items():
+				rec[name] = value
+			with open(tmp, 'wb') as f:
+				np.save(f, rec)
+		os.replace(tmp, path)
+	finally:
+		if os.path.exists(tmp):
+			os.remove(tmp)
+
+
+def _read(path, format):
+	if format == 'parquet':
+		import pyarrow.parquet as pq
+		return pq.read_table(path)
+	return np.load(path, mmap_mode='r')
+
+
+def _concat_tables(parts):
+	import pyarrow as pa
+	return pa.concat_tables(parts)
@@ -0,0 +1,280 @@
+"""Tabulated parameters of models B4 and B4s (RILEM TC-242-MDC).
+
+Each table is kept as a read-only mapping of read-only rows (for scalar
+lookups) and as a dict of columns indexed by an integer code
+(``*_COLUMNS``), so batch evaluation gathers the parameters of many rows
+with one fancy-index.  The columns are read-only float64 arrays; the code
+of a class is its position in ``CEM_TYPES`` or ``AGG_KEYS``.
+
+Calibrated cement and aggregate classes are added with ``register_cement``
+and ``register_aggregate`` (new classes get the next code, so the codes of
+the others never change) or loaded from a versioned JSON file written by
+``save``.  Registrations live in the process; worker processes started
+with 'spawn' have to ``load`` the file themselves.
+"""
+
+import json
+from types import MappingProxyType
+
+import numpy as np
+
+CEM_TYPES = ("R", "RS", "SL")
+SPECIMEN_TYPES = ('infinite slab', 'infinite cylinder', 'infinite square prism', 'sphere', 'cube')
+AGG_TYPES = ('Diabase', 'Quartzite', 'Limestone', 'Sandstone', 'Granite', 'Quartz Diorite')
+
+# shrinkage parameters for model B4 (Table 1)
+B4_SHRINKAGE = {
+	"R": dict(tau_cem=0.016, pta=-0.33, ptw=-0.06, ptc=-0.10, eps_cem=360e-6, pea=-0.80, pew=1.10, pec=0.11),
+	"RS": dict(tau_cem=0.080, pta=-0.33, ptw=-2.40, ptc=-2.70, eps_cem=860e-6, pea=-0.80, pew=-0.27, pec=0.11),
+	"SL": dict(tau_cem=0.010, pta=-0.33, ptw=3.55, ptc=3.80, eps_cem=410e-6, pea=-0.80, pew=1.00, pec=0.11),
+}
+
+# autogenous shrinkage parameters for model B4 (Table 2)
+B4_AUTOGENOUS = {
+	"R": dict(tau_au_cem=1.00, r_tw=3.00, r_t=-4.50, r_alfa=1.00, eps_au_cem=210e-6, r_ea=-0.75, r_ew=-3.50),
+	"RS": dict(tau_au_cem=41.00, r_tw=3.00, r_t=-4.50, r_alfa=1.40, eps_au_cem=-84e-6, r_ea=-0.75, r_ew=-3.50),
+	"SL": dict(tau_au_cem=1.00, r_tw=3.00, r_t=-4.50, r_alfa=1.00, eps_au_cem=0e-6, r_ea=-0.75, r_ew=-3.50),
+}
+
+# creep parameters for model B4 (Table 3 Part 1)
+B4_CREEP = {
+	"R": dict(p1=0.70, p2=58.6e-3, p3=39.3e-3, p4=3.4e-3, p5=777e-6, p5H=8.0),
+	"RS": dict(p1=0.60, p2=17.4e-3, p3=39.3e-3, p4=3.4e-3, p5=94.6e-6, p5H=1.0),
+	"SL": dict(p1=0.80, p2=40.5e-3, p3=39.3e-3, p4=3.4e-3, p5=496e-6, p5H=8.0), # p5H: "lacing data, assumed"
+}
+
+# creep parameters for model B4 (Table 3 part 2)
+B4_CREEP_EXPONENTS = dict(p2w=3.00, p3a=-1.10, p3w=0.40, p4a=-0.90, p4w=2.45, p5e=-0.85, p5a=-1.00, p5w=0.78)
+
+# Aggregate dependent parameter scaling factors for shrinkage (Table 6)
+AGGREGATE = {
+	'Diabase': dict(k_ta=0.06, k_ea=0.76),
+	'Quartzite': dict(k_ta=0.59, k_ea=0.71),
+	'Limestone': dict(k_ta=1.80, k_ea=0.95),
+	'Sandstone': dict(k_ta=2.30, k_ea=1.60),
+	'Granite': dict(k_ta=4.00, k_ea=1.05),
+	'Quartz Diorite': dict(k_ta=15.0, k_ea=2.20),
+	'': dict(k_ta=1.0, k_ea=1.0),
+}
+
+# shrinkage parameters for model B4s (Table 8)
+B4S_SHRINKAGE = {
+	"R": dict(tau_s_cem=0.027, s_tf=0.21, eps_scem=590e-6, s_ef=-0.51),
+	"RS": dict(tau_s_cem=0.027, s_tf=1.55, eps_scem=830e-6, s_ef=-0.84),
+	"SL": dict(tau_s_cem=0.032, s_tf=-1.84, eps_scem=640e-6, s_ef=-0.69),
+}
+
+# autogenous shrinkage parameters for model B4s (Table 7)
+B4S_AUTOGENOUS = dict(tau_au_cem=2.26, r_tf=0.27, eps_au_cem=78.2e-6, r_ef=1.03, alfa_s=1.73, r_t=-1.73)
+
+# Creep parameters for model B4s (Table 9)
+B4S_CREEP = {
+	"R": dict(s2=14.2e-3, s3=0.976, s4=4e-3, s5=1.54e-3, s2f=-1.58, s3f=-1.61, s4f=-1.16, s5f=-0.45, p5H=8.0, p1=0.70),
+	"RS": dict(s2=29.9e-3, s3=0.976, s4=4e-3, s5=41.8e-6, s2f=-1.58, s3f=-1.61, s4f=-1.16, s5f=-0.45, p5H=1.0, p1=0.60),
+	"SL": dict(s2=11.2e-3, s3=0.976, s4=4e-3, s5=150e-6, s2f=-1.58, s3f=-1.61, s4f=-1.16, s5f=-0.45, p5H=8.0, p1=0.80),
+}
+
+p5c = -0.85 # (Table 3)
+
+# The specimen geometry shape parameter ks (Eq. 23)
+K_S = {'infinite slab': 1.0, 'infinite cylinder': 1.15, 'infinite square prism': 1.25, 'sphere': 1.30, 'cube': 1.55}
+
+AGG_KEYS = AGG_TYPES + ('',)
+
+# tables and rows are read-only: changes go through register_cement/register_aggregate, so the
+# columns follow and the caches of derived quantities see a new revision; _rows holds the tables
+_rows = {}
+for _table in ('B4_SHRINKAGE', 'B4_AUTOGENOUS', 'B4_CREEP', 'AGGREGATE', 'B4S_SHRINKAGE', 'B4S_CREEP'):
+	_rows[_table] = dict((key, MappingProxyType(row)) for key, row in globals()[_table].items())
+	globals()[_table] = MappingProxyType(_rows[_table])
+del _table
+B4_CREEP_EXPONENTS = MappingProxyType(B4_CREEP_EXPONENTS)
+B4S_AUTOGENOUS = MappingProxyType(B4S_AUTOGENOUS)
+K_S = MappingProxyType(K_S)
+
+BUILTIN_CEM_TYPES = CEM_TYPES
+BUILTIN_AGG_KEYS = AGG_KEYS
+
+# per-cement tables, by their name in the coefficient file
+CEMENT_TABLES = (('shrinkage', 'B4_SHRINKAGE'), ('autogenous', 'B4_AUTOGENOUS'), ('creep', 'B4_CREEP'),
+	('b4s_shrinkage', 'B4S_SHRINKAGE'), ('b4s_creep', 'B4S_CREEP'))
+
+FILE_FORMAT = 'b4-coefficients'
+FILE_VERSION = 1
+
+revision = 0 	# counts registrations (caches of derived quantities compare it, see memo)
+
+
+def _columns(table, keys):
+	columns = {}
+	for name in table[keys[0]]:
+		column = np.array([table[key][name] for key in keys], dtype=float)
+		column.flags.writeable = False
+		columns[name] = column
+	return MappingProxyType(columns)
+
+
+def _build():
+	global B4_SHRINKAGE_COLUMNS, B4_AUTOGENOUS_COLUMNS, B4_CREEP_COLUMNS, B4S_SHRINKAGE_COLUMNS
+	global B4S_CREEP_COLUMNS, AGGREGATE_COLUMNS
+	B4_SHRINKAGE_COLUMNS = _columns(B4_SHRINKAGE, CEM_TYPES)
+	B4_AUTOGENOUS_COLUMNS = _columns(B4_AUTOGENOUS, CEM_TYPES)
+	B4_CREEP_COLUMNS = _columns(B4_CREEP, CEM_TYPES)
+	B4S_SHRINKAGE_COLUMNS = _columns(B4S_SHRINKAGE, CEM_TYPES)
+	B4S_CREEP_COLUMNS = _columns(B4S_CREEP, CEM_TYPES)
+	AGGREGATE_COLUMNS = _columns(AGGREGATE, AGG_KEYS)
+
+
+_build()
+K_S_COLUMN = np.array([K_S[key] for key in SPECIMEN_TYPES])
+K_S_COLUMN.flags.writeable = False
+
+
+def cement(table, cem_type):
+	"""Row of a cement-type table; replaces the scripts' sys.exit on bad input."""
+	if cem_type not in CEM_TYPES:
+		raise ValueError('Check out cement type definition! (%r)' % (cem_type,))
+	return table[cem_type]
+
+
+def codes(values, keys, what):
+	"""Integer codes of ``values`` (labels or codes, scalar or array) in ``keys``."""
+	values = np.asarray(values)
+	if values.dtype.kind in 'iu':
+		if values.size and (values.min() < 0 or values.max() >= len(keys)):
+			raise ValueError('Check out %s definition! (code out of range)' % what)
+		return values.astype(np.intp)
+	labels, inverse = np.unique(values, return_inverse=True)
+	index = {key: i for i, key in enumerate(keys)}
+	unknown = [label for label in labels.tolist() if label not in index]
+	if unknown:
+		raise ValueError('Check out %s definition! (%s)' % (what, ', '.join(map(repr, unknown))))
+	lookup = np.array([index[label] for label in labels.tolist()], dtype=np.intp)
+	return lookup[inverse].reshape(values.shape)
+
+
+def gather(columns, code):
+	"""Row(s) ``code`` of a column table, as a dict of arrays."""
+	return {name: column[code] for name, column in columns.items()}
+
+
+###########################################
+# Custom classes
+###########################################
+
+def _row(table, base, values, what):
+	row = dict(table[base]) if base is not None else {}
+	expected = set(next(iter(table.values())))
+	unknown = sorted(set(values) - expected)
+	if unknown:
+		raise ValueError('unknown %s coefficient(s): %s' % (what, ', '.join(unknown)))
+	row.update((name, float(value)) for name, value in values.items())
+	missing = sorted(expected - set(row))
+	if missing:
+		raise ValueError('missing %s coefficient(s): %s' % (what, ', '.join(missing)))
+	if not all(np.isfinite(list(row.values()))):
+		raise ValueError('%s coefficients must be finite' % what)
+	return MappingProxyType(row)
+
+
+def _check_name(name, builtin, what):
+	if not isinstance(name, str) or not name:
+		raise ValueError('%s name must be a non-empty string' % what)
+	if name in builtin:
+		raise ValueError('%s %r is built in and cannot be redefined' % (what, name))
+
+
+def register_cement(name, base='R', **rows):
+	"""Add (or redefine) the custom cement class ``name``.
+
+	Every table row starts as a copy of the class ``base`` (None: the rows
+	must be complete) and the keyword arguments ``shrinkage``,
+	``autogenous``, ``creep`` (Tables 1-3), ``b4s_shrinkage`` and
+	``b4s_creep`` (Tables 8-9) override coefficients by name, e.g.
+	``register_cement('CEM III/B', base='SL', creep=dict(p5=300e-6))``.
+	Returns the code of the class.
+	"""
+	global CEM_TYPES, revision
+	_check_name(name, BUILTIN_CEM_TYPES, 'cement type')
+	unknown = sorted(set(rows) - set(key for key, _ in CEMENT_TABLES))
+	if unknown:
+		raise ValueError('unknown table(s): %s' % ', '.join(unknown))
+	if base is not None:
+		cement(B4_SHRINKAGE, base)
+	# all rows are checked before any table changes
+	new = [(_rows[table], _row(globals()[table], base, rows.get(key, {}), key)) for key, table in CEMENT_TABLES]
+	for table, row in new:
+		table[name] = row
+	if name not in CEM_TYPES:
+		CEM_TYPES = CEM_TYPES + (name,)
+	_build()
+	revision += 1
+	return CEM_TYPES.index(name)
+
+
+def register_aggregate(name, k_ta, k_ea):
+	"""Add (or redefine) the custom aggregate class ``name`` with Table 6 factors; returns its code."""
+	global AGG_TYPES, AGG_KEYS, revision
+	_check_name(name, BUILTIN_AGG_KEYS, 'agg_type')
+	_rows['AGGREGATE'][name] = _row(AGGREGATE, None, dict(k_ta=k_ta, k_ea=k_ea), 'aggregate')
+	if name not in AGG_KEYS:
+		# appended after '' so that existing codes stay valid
+		AGG_TYPES = AGG_TYPES + (name,)
+		AGG_KEYS = AGG_KEYS + (name,)
+	_build()
+	revision += 1
+	return AGG_KEYS.index(name)
+
+
+def reset():
+	"""Forget all custom classes."""
+	global CEM_TYPES, AGG_TYPES, AGG_KEYS, revision
+	for _, table in CEMENT_TABLES:
+		for name in CEM_TYPES[len(BUILTIN_CEM_TYPES):]:
+			del _rows[table][name]
+	for name in AGG_KEYS[len(BUILTIN_AGG_KEYS):]:
+		del _rows['AGGREGATE'][name]
+	CEM_TYPES = BUILTIN_CEM_TYPES
+	AGG_KEYS = BUILTIN_AGG_KEYS
+	AGG_TYPES = BUILTIN_AGG_KEYS[:-1]
+	_build()
+	revision += 1
+
+
+def save(path, builtin=False):
+	"""Write the custom classes (and the built-in ones if ``builtin``) to a JSON coefficient file."""
+	cements = CEM_TYPES if builtin else CEM_TYPES[len(BUILTIN_CEM_TYPES):]
+	aggregates = AGG_KEYS if builtin else AGG_KEYS[len(BUILTIN_AGG_KEYS):]
+	content = dict(
+		format=FILE_FORMAT, version=FILE_VERSION,
+		cement=dict((name, dict((key, dict(globals()[table][name])) for key, table in CEMENT_TABLES)) for name in cements),
+		aggregate=dict((name, dict(AGGREGATE[name])) for name in aggregates))
+	with open(path, 'w') as f:
+		json.dump(content, f, indent=1, sort_keys=True)
+
+
+def load(path):
+	"""Register the classes of a coefficient file written by ``save``.
+
+	Built-in classes in the file must match the tables; custom classes
+	must give every coefficient.
+	"""
+	with open(path) as f:
+		content = json.load(f)
+	if not isinstance(content, dict) or content.get('format') != FILE_FORMAT:
+		raise ValueError('%s is not a B4 coefficient file' % path)
+	if content.get('version') != FILE_VERSION:
+		raise ValueError('coefficient file %s has version %s, expected %s' % (path, content.get('version'), FILE_VERSION))
+	for name, rows in sorted(content.get('cement', {}).items()):
+		if name in BUILTIN_CEM_TYPES:
+			if any(_row(globals()[table], None, rows.get(key, {}), key) != globals()[table][name]
+					for key, table in CEMENT_TABLES):
+				raise ValueError('%s redefines the built-in cement type %r' % (path, name))
+		else:
+			register_cement(name, base=None, **rows)
+	for name, row in sorted(content.get('aggregate', {}).items()):
+		if name in BUILTIN_AGG_KEYS:
+			if _row(AGGREGATE, None, row, 'aggregate') != AGGREGATE[name]:
+				raise ValueError('%s redefines the built-in agg_type %r' % (path, name))
+		else:
+			register_aggregate(name, **row)
@@ -0,0 +1,139 @@
+"""Probabilistic prediction: uncertainty propagation by sampling.
+
+Inputs of the mix (``fcm``, ``wc``, ``h``, ``T_avg``, ...) and factors on
+the table coefficients (``p1..p5``, ``s2..s5``, ``eps_cem``, ``tau_cem``, ...,
+see ``FACTORS``) are drawn from the given distributions; a multiplicative
+model error (lognormal, one factor per sample and strain component) can be
+added.  All samples are evaluated as one vectorized batch per block of ages,
+the block sized so that a block holds at most ``chunk`` values, and reduced to
+percentile bands over the samples before the next block: memory is bounded
+by ``chunk`` whatever the number of ages.
+
+Distributions are ``(kind, a, b)`` with kind ``'normal'`` (mean, standard
+deviation), ``'lognormal'`` (median, coefficient of variation) or
+``'uniform'`` (low, high).  Latin hypercube and Sobol sampling of normal
+kinds need SciPy.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .examples import B4_EXAMPLE, B4S_EXAMPLE
+from .params import B4Params, B4sParams
+from .sweep import _unit_design
+from .units import MPa
+
+Bands = namedtuple('Bands', ['t', 'percentiles', 'eps_sh', 'eps_au', 'creep', 'eps_tot'])
+
+MODELS = {'B4': (B4Params, B4_EXAMPLE), 'B4s': (B4sParams, B4S_EXAMPLE)}
+
+# table coefficient -> mix-level quantities it scales (see params.b4_mix, b4s_mix)
+FACTORS = {
+	'B4': {'p1': ('q1',), 'p2': ('q2', 'q3'), 'p3': ('q3',), 'p4': ('q4',), 'p5': ('q5_mix',),
+		'eps_cem': ('eps_0',), 'tau_cem': ('tau_0',), 'eps_au_cem': ('eps_au_inf',), 'tau_au_cem': ('tau_au',)},
+	'B4s': {'p1': ('q1',), 's2': ('q2', 'q3'), 's3': ('q3',), 's4': ('q4',), 's5': ('q5_mix',),
+		'eps_scem': ('eps_0',), 'tau_s_cem': ('tau_0',), 'eps_au_cem': ('eps_au_inf',), 'tau_au_cem': ('tau_au',)},
+}
+ERRORS = ('eps_sh', 'eps_au', 'J')
+KINDS = ('normal', 'lognormal', 'uniform')
+
+
+def _transform(u, spec, z=None):
+	kind, a, b = spec
+	if kind == 'uniform':
+		return a + (b - a) * u
+	if z is None:
+		from scipy.special import ndtri
+		z = ndtri(np.clip(u, 1e-12, 1 - 1e-12))
+	if kind == 'normal':
+		return a + b * z
+	if kind == 'lognormal':
+		return a * np.exp(np.sqrt(np.log1p(b**2)) * z)
+	raise ValueError('unknown distribution %r; use one of %s' % (kind, ', '.join(KINDS)))
+
+
+def sample(distributions, n, method='lhs', seed=0):
+	"""Dict of ``n`` samples per distribution (``method`` 'random', 'lhs' or 'sobol')."""
+	names = sorted(distributions)
+	if method == 'random':
+		rng = np.random.default_rng(seed)
+		return dict((name, _transform(rng.random(n), distributions[name], rng.standard_normal(n))) for name in names)
+	U = _unit_design(method, n, len(names), seed, 0, 0)
+	return dict((name, _transform(U[:, k], distributions[name])) for k, name in enumerate(names))
+
+
+def propagate(t, model='B4', mix=None, distributions=None, model_error=None, n=10**4, percentiles=(5, 50, 95),
+		tp=None, method='lhs', seed=0, chunk=2**23, workers=None):
+	"""Percentile bands of ``eps_sh``, ``eps_au``, creep (J sigma) and ``eps_tot`` at ages ``t``.
+
+	``mix`` holds the base inputs (default: the model's example);
+	``distributions`` maps input or ``FACTORS`` names to distributions and
+	``model_error`` maps ``eps_sh``, ``eps_au``, ``J`` to the coefficient of
+	variation of a lognormal model error factor.  Blocks of ages run on
+	``workers`` processes (default: in this process).  Returns ``Bands`` with
+	arrays of shape ``(len(percentiles), len(t))``.
+
+	The mix-level quantities are evaluated once per sample; the time
+	functions and the percentiles still cost one pass per sample and age:
+	10^5 samples at 10^3 ages take about 26 s on one core (3/5 evaluation,
+	2/5 percentiles), divided by the number of ``workers``.
+	"""
+	if model not in MODELS:
+		raise ValueError("model must be 'B4' or 'B4s'")
+	cls, example = MODELS[model]
+	mix = dict(example if mix is None else mix)
+	mix.pop('t', None)
+	distributions = dict(distributions or {})
+	model_error = dict(model_error or {})
+	unknown = [name for name in model_error if name not in ERRORS]
+	if unknown:
+		raise ValueError('model error only for %s, not %s' % (', '.join(ERRORS), ', '.join(unknown)))
+	for name, cov in model_error.items():
+		distributions['error_' + name] = ('lognormal', 1.0, cov)
+	cls(**mix) # warn once for the base mix
+	s = sample(distributions, n, method, seed)
+	inputs = dict(mix)
+	scale = {}
+	for name, value in s.items():
+		if name in FACTORS[model]:
+			for target in FACTORS[model][name]:
+				scale[target] = scale.get(target, 1.0) * value
+		elif name.startswith('error_'):
+			continue
+		elif name in mix:
+			inputs[name] = value
+		else:
+			raise ValueError('cannot sample %s: not an input of %s nor one of %s' % (name, model, ', '.join(sorted(FACTORS[model]))))
+	if 'h' in inputs:
+		inputs['h'] = np.clip(inputs['h'], 0, 1)
+	P = cls(check=False, scale=scale, **inputs)
+	e_sh, e_au, e_J = (s.get('error_' + name, 1.0) for name in ERRORS)
+
+	t = np.atleast_1d(np.asarray(t, dtype=float))
+	q = np.asarray(percentiles, dtype=float)
+	block = max(1, int(chunk) // n)
+	jobs = [(P, (e_sh, e_au, e_J), t[start:start + block], tp, q) for start in range(0, len(t), block)]
+	if workers is None or workers <= 1 or len(jobs) <= 1:
+		parts = map(_bands, jobs)
+	else:
+		pool = ProcessPoolExecutor(workers)
+		parts = pool.map(_bands, jobs)
+	try:
+		parts = list(parts)
+	finally:
+		if workers is not None and workers > 1 and len(jobs) > 1:
+			pool.shutdown()
+	return Bands(t, q, **dict((name, np.concatenate([part[name] for part in parts], axis=1)) for name in Bands._fields[2:]))
+
+
+def _bands(job):
+	P, (e_sh, e_au, e_J), t, tp, q = job
+	# ages along the first axis, samples along the contiguous last one (fast percentiles)
+	t = t[:, None]
+	r = P.history(t, tp)
+	values = dict(eps_sh=r.eps_sh * e_sh, eps_au=r.eps_au * e_au, creep=r.J * e_J * (P.sigma / MPa))
+	values['eps_tot'] = values['eps_sh'] + values['eps_au'] + values['creep'] + r.T_infl
+	shape = np.broadcast_shapes(*(np.shape(v) for v in values.values()))
+	return dict((name, np.percentile(np.broadcast_to(value, shape), q, axis=1)) for name, value in values.items())
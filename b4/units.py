@@ -0,0 +1,17 @@
+# UNITS (same base as the scripts: lengths in m, stresses in Pa)
+
+m = 1
+cm = m/100
+mm = m/1000
+m2 = m*m
+cm2 = cm*cm
+mm2 = mm*mm
+
+kg = 1000
+N = 1
+kN = N*1e3
+kNm = N*m * 1e3		# also kN/m
+Pa = N/m/m
+kPa = Pa*1e3
+MPa = Pa*1e6
+GPa = Pa*1e9
@@ -0,0 +1,150 @@
+"""Sequential Bayesian updating of long-term predictions from monitoring readings.
+
+The uncertain quantities are multiplicative factors on parameters of one mix
+(``FACTORS``: ``q1..q5``, ``eps_sh_inf``, ``tau_sh``) with priors given as
+in ``uncertainty`` (default: lognormal with median 1).  The posterior is
+carried by weighted particles: a reading evaluates the model at its age for
+all particles at once and multiplies the weights by the Gaussian
+likelihood, so an update costs the same whatever the number of earlier
+readings.  When the effective sample size falls below ``threshold`` times
+the number of particles, they are resampled (systematic) and moved by the
+kernel shrinkage of Liu and West (2001) in the log factors, which keeps the
+static factors from collapsing onto a few values.  Forecasts are weighted
+percentiles over the particles, at any ages and without refitting.
+
+	f = updating.Filter(B4Params(**mix), prior={'q4': 0.3, 'eps_sh_inf': 0.3})
+	for t, eps in readings:
+		f.update(t, eps, std=20e-6)
+	bands = f.forecast(np.logspace(2, np.log10(36500), 50))
+"""
+
+import copy
+from collections import namedtuple
+
+import numpy as np
+
+from .uncertainty import sample
+
+Forecast = namedtuple('Forecast', ['t', 'percentiles', 'mean', 'bands'])
+
+FACTORS = ('q1', 'q2', 'q3', 'q4', 'q5', 'eps_sh_inf', 'tau_sh')
+KINDS = ('eps_tot', 'J', 'eps_sh')
+# coefficients of variation of the default lognormal priors
+PRIOR = {'q1': 0.2, 'q2': 0.3, 'q3': 0.3, 'q4': 0.3, 'q5': 0.5, 'eps_sh_inf': 0.3, 'tau_sh': 0.5}
+
+
+class Filter(object):
+	"""Particle filter over scale factors of ``params`` (a single mix).
+
+	``prior`` maps names of ``FACTORS`` to a coefficient of variation
+	(lognormal, median 1) or a distribution ``(kind, a, b)`` of positive
+	values; factors not given stay 1.  ``shrink`` is the Liu-West
+	shrinkage (the jitter variance is 1 - shrink**2 of the posterior's).
+	"""
+
+	def __init__(self, params, prior=None, n=2000, threshold=0.5, shrink=0.98, seed=0):
+		prior = dict(PRIOR if prior is None else prior)
+		unknown = [name for name in prior if name not in FACTORS]
+		if unknown:
+			raise ValueError('cannot update %s; choose from %s' % (', '.join(unknown), ', '.join(FACTORS)))
+		if np.ndim(params.q1) or np.ndim(params.tau_sh):
+			raise ValueError('updating needs the parameters of a single mix')
+		self.params = params
+		self.names = tuple(name for name in FACTORS if name in prior)
+		specs = dict((name, ('lognormal', 1.0, v) if np.isscalar(v) else tuple(v)) for name, v in prior.items())
+		s = sample(specs, n, 'random', seed)
+		if any(np.any(s[name] <= 0) for name in self.names):
+			raise ValueError('scale factors must be positive')
+		self.x = np.stack([np.log(s[name]) for name in self.names], axis=-1) # log factors, (n, factors)
+		self.logw = np.zeros(n)
+		self.threshold = threshold
+		self.shrink = shrink
+		self.rng = np.random.default_rng(seed + 1)
+		self.readings = 0
+		self.resamplings = 0
+		self._scaled = None
+
+	@property
+	def weights(self):
+		w = np.exp(self.logw - self.logw.max())
+		return w / w.sum()
+
+	def ess(self):
+		"""Effective sample size of the weights."""
+		w = self.weights
+		return 1 / np.dot(w, w)
+
+	def model(self):
+		"""The parameters with the particles' factors applied (arrays over the particles)."""
+		if self._scaled is None:
+			P = copy.copy(self.params)
+			for k, name in enumerate(self.names):
+				setattr(P, name, getattr(self.params, name) * np.exp(self.x[:, k]))
+			self._scaled = P
+		return self._scaled
+
+	def predict(self, t, kind='eps_tot', tp=None, sigma=None):
+		"""``kind`` at ages ``t`` for every particle (particles on the last axis).
+
+		'eps_tot' is the total strain of Eq. 12 under ``sigma`` (Pa, default
+		the applied stress), 'J' the compliance (1/MPa), 'eps_sh' the drying
+		shrinkage.
+		"""
+		if kind not in KINDS:
+			raise ValueError('kind must be one of %s' % ', '.join(KINDS))
+		P = self.model()
+		t = np.asarray(t, dtype=float)[..., None]
+		if kind == 'J':
+			return P.J(t, tp)
+		if kind == 'eps_sh':
+			return P.eps_sh(t)
+		return P.history(t, tp, sigma).eps_tot
+
+	def update(self, t, value, std, kind='eps_tot', tp=None, sigma=None):
+		"""Condition on one reading ``value`` of ``kind`` at age ``t`` with noise ``std``."""
+		r = (self.predict(float(t), kind, tp, sigma) - value) / std
+		logw = self.logw - 0.5 * r * r
+		logw[~np.isfinite(logw)] = -np.inf
+		if not np.isfinite(logw.max()):
+			raise ValueError('reading at t=%g has zero likelihood for every particle' % t)
+		self.logw = logw - logw.max()
+		self.readings += 1
+		if self.ess() < self.threshold * len(self.logw):
+			self._resample()
+		return self
+
+	def _resample(self):
+		w = self.weights
+		n = len(w)
+		# systematic resampling
+		index = np.minimum(np.searchsorted(np.cumsum(w), (self.rng.random() + np.arange(n)) / n), n - 1)
+		m = w.dot(self.x)
+		V = np.atleast_2d(np.cov(self.x.T, aweights=w))
+		a = self.shrink
+		jitter = self.rng.multivariate_normal(np.zeros(len(m)), (1 - a * a) * V, size=n)
+		self.x = a * self.x[index] + (1 - a) * m + jitter
+		self.logw = np.zeros(n)
+		self.resamplings += 1
+		self._scaled = None
+
+	def estimate(self):
+		"""Posterior mean and standard deviation of the factors: two dicts."""
+		w = self.weights
+		f = np.exp(self.x)
+		mean = w.dot(f)
+		std = np.sqrt(np.maximum(w.dot(f * f) - mean * mean, 0))
+		return dict(zip(self.names, mean.tolist())), dict(zip(self.names, std.tolist()))
+
+	def forecast(self, t, kind='eps_tot', percentiles=(5, 50, 95), tp=None, sigma=None):
+		"""Posterior mean and percentile bands (shape ``(len(percentiles), len(t))``) of ``kind`` at ages ``t``."""
+		t = np.atleast_1d(np.asarray(t, dtype=float))
+		q = np.asarray(percentiles, dtype=float)
+		w = self.weights
+		values = np.broadcast_to(self.predict(t, kind, tp, sigma), t.shape + w.shape)
+		mean = values.dot(w)
+		order = np.argsort(values, axis=-1)
+		values = np.take_along_axis(values, order, axis=-1)
+		cdf = np.cumsum(w[order], axis=-1)
+		k = np.stack([np.sum(cdf < p / 100.0, axis=-1) for p in q])
+		bands = np.take_along_axis(values, np.minimum(k, len(w) - 1).T, axis=-1).T
+		return Forecast(t, q, mean, bands)
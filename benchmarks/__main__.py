@@ -0,0 +1,52 @@
+"""Run the benchmarks and the golden-value check without asv.
+
+	python -m benchmarks                 # golden check + all benchmarks
+	python -m benchmarks --golden        # golden check only
+	python -m benchmarks --update-golden # re-pin golden.json
+	python -m benchmarks TimeSeries      # benchmarks whose class name matches
+"""
+
+import itertools
+import sys
+import timeit
+
+from . import benchmarks, golden
+
+
+def _cases(cls):
+	params = cls.params if isinstance(cls.params, tuple) else (cls.params,)
+	return itertools.product(*params)
+
+
+def run(pattern=''):
+	for name in sorted(dir(benchmarks)):
+		cls = getattr(benchmarks, name)
+		if not (isinstance(cls, type) and name.startswith('Time') and pattern in name):
+			continue
+		for args in _cases(cls):
+			bench = cls()
+			bench.setup(*args)
+			for method in sorted(m for m in dir(cls) if m.startswith('time_')):
+				fn = getattr(bench, method)
+				timer = timeit.Timer(lambda: fn(*args))
+				number, _ = timer.autorange()
+				best = min(timer.repeat(3, number)) / number
+				print('%-12s %-14s %-20s %12.3f us' % (name, method, ', '.join(map(str, args)), best * 1e6))
+
+
+def main(argv):
+	if '--update-golden' in argv:
+		golden.update()
+		print('golden values written to %s' % golden.PATH)
+		return 0
+	problems = golden.check()
+	for problem in problems:
+		print('DRIFT ' + problem)
+	print('golden check: %s' % ('FAILED' if problems else 'ok'))
+	if '--golden' not in argv:
+		run(([a for a in argv if not a.startswith('-')] or [''])[0])
+	return 1 if problems else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1:]))
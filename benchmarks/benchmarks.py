@@ -0,0 +1,109 @@
+"""asv-style benchmarks of models B4 and B4s.
+
+Classes follow the airspeed velocity conventions (``params``, ``setup``,
+``time_*``), so ``asv run`` picks them up; ``python -m benchmarks`` runs
+them without asv.
+"""
+
+import numpy as np
+
+import b4
+import b4.graph
+
+SIZES = [1, 10**3, 10**5, 10**6]
+MODELS = {'B4': (b4.B4Params, b4.B4_EXAMPLE, b4.evaluate_b4), 'B4s': (b4.B4sParams, b4.B4S_EXAMPLE, b4.evaluate_b4s)}
+
+
+class TimeScalar(object):
+	"""One age of the paper's worked example (t = 112 days), including set-up."""
+
+	params = ['B4', 'B4s']
+	param_names = ['model']
+
+	def setup(self, model):
+		self.cls, self.inputs, _ = MODELS[model]
+		self.model = self.cls(**self.inputs)
+
+	def time_params(self, model):
+		self.cls(**self.inputs)
+
+	def time_eps_sh(self, model):
+		self.model.eps_sh(112)
+
+	def time_eps_au(self, model):
+		self.model.eps_au(112)
+
+	def time_J(self, model):
+		self.model.J(112)
+
+	def time_eps_tot(self, model):
+		self.model.eps_tot(112)
+
+
+class TimeSeries(object):
+	"""Strain histories of the worked example over ``size`` ages up to 100 years."""
+
+	params = (['B4', 'B4s'], SIZES)
+	param_names = ['model', 'size']
+
+	def setup(self, model, size):
+		cls, inputs, _ = MODELS[model]
+		self.model = cls(**inputs)
+		self.t = np.geomspace(28.01, 28 + 36500, size)
+
+	def time_eps_sh(self, model, size):
+		self.model.eps_sh(self.t)
+
+	def time_eps_au(self, model, size):
+		self.model.eps_au(self.t)
+
+	def time_J(self, model, size):
+		self.model.J(self.t)
+
+	def time_eps_tot(self, model, size):
+		self.model.eps_tot(self.t)
+
+
+class TimeBatch(object):
+	"""``size`` random mixes at one age each, through the batch API."""
+
+	params = (['B4', 'B4s'], SIZES[1:])
+	param_names = ['model', 'size']
+
+	def setup(self, model, size):
+		_, inputs, self.evaluate = MODELS[model]
+		rng = np.random.default_rng(0)
+		self.mixes = dict(inputs)
+		self.mixes.update(
+			fcm=rng.uniform(20e6, 60e6, size),
+			cem_type=rng.choice(['R', 'RS', 'SL'], size),
+			h=rng.uniform(0.4, 0.95, size),
+			t=rng.uniform(29, 36500, size),
+		)
+		if model == 'B4':
+			self.mixes.update(wc=rng.uniform(0.3, 0.8, size), ac=rng.uniform(2, 10, size))
+
+	def time_evaluate(self, model, size):
+		self.evaluate(self.mixes, check=False)
+
+
+class TimeGraph(object):
+	"""``size`` random B4 mixes at one age each, only ``output`` evaluated (``b4.graph``)."""
+
+	params = (['eps_au', 'eps_sh', 'J', 'eps_tot'], SIZES[1:3])
+	param_names = ['output', 'size']
+
+	def setup(self, output, size):
+		rng = np.random.default_rng(0)
+		self.mixes = dict(b4.B4_EXAMPLE)
+		self.mixes.update(
+			fcm=rng.uniform(20e6, 60e6, size),
+			cem_type=rng.choice(['R', 'RS', 'SL'], size),
+			h=rng.uniform(0.4, 0.95, size),
+			wc=rng.uniform(0.3, 0.8, size),
+			ac=rng.uniform(2, 10, size),
+			t=rng.uniform(29, 36500, size),
+		)
+
+	def time_graph(self, output, size):
+		b4.graph.evaluate('B4', [output], check=False, **self.mixes)
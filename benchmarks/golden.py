@@ -0,0 +1,247 @@
+"""Golden-value regression harness.
+
+``CASES`` map a case name to a function returning named output arrays;
+``golden.json`` pins their values with a relative tolerance.  ``check``
+reports every output that drifted, so each optimization can be verified
+against the numbers of the original scripts (case ``script_*`` holds the
+scripts' printed results for the paper's worked example, fcm = 27.6 MPa,
+wc = 0.60, ac = 7.0, t = 112 days).  ``CROSS`` compares the optional fast
+paths (``memo``, ``graph``, ``surrogate``, ``jit``, ``store``) with the
+reference ``params`` path on random mixes, so an error they introduce
+fails the check even though nothing pinned covers it.
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+import b4
+from b4 import graph, jit, memo, store, surrogate
+from b4.units import MPa
+
+PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden.json')
+RTOL = 1e-9
+AGES = [28.5, 29, 56, 57, 112, 365, 3650, 36500]
+
+
+def _strains(model, t, tp=None):
+	r = model.history(np.asarray(t, dtype=float), tp)
+	return dict(eps_sh=r.eps_sh, eps_au=r.eps_au, J=r.J, eps_tot=r.eps_tot)
+
+
+def _script(model, inputs):
+	r = model(**inputs).history(112)
+	return {
+		'Drying shrinkage (eps_sh)': r.eps_sh,
+		'Autogenous shrinkage (eps_au)': r.eps_au,
+		'Average creep (J*sigma)': r.J * inputs['sigma'] * 10**(-6),
+		'Temperature influence (T_infl)': r.T_infl,
+		'Total strain (eps_tot)': r.eps_tot,
+	}
+
+
+def _batch(evaluate, inputs, extra):
+	mixes = dict(inputs)
+	mixes.update(extra)
+	r = evaluate(mixes, t=np.array(AGES[2:]), check=False)
+	return dict((name, r[name]) for name in b4.batch.MIX_OUTPUTS + ('eps_tot',))
+
+
+_CEM = np.array(['R', 'RS', 'SL', 'R', 'RS', 'SL'])
+
+CASES = {
+	'b4_example': lambda: _strains(b4.B4Params(**b4.B4_EXAMPLE), AGES),
+	'b4s_example': lambda: _strains(b4.B4sParams(**b4.B4S_EXAMPLE), AGES),
+	'b4_load_ages': lambda: _strains(b4.B4Params(**b4.B4_EXAMPLE), 10000, np.array([3, 7, 28, 90, 365, 3000])),
+	'b4_mixes': lambda: _batch(b4.evaluate_b4, b4.B4_EXAMPLE, dict(
+		cem_type=_CEM, wc=np.array([0.3, 0.4, 0.5, 0.6, 0.7, 0.8]), ac=np.array([3, 4, 5, 6, 7, 8.0]),
+		agg_type=np.array(['', 'Diabase', 'Quartzite', 'Limestone', 'Granite', 'Quartz Diorite']),
+		specimen=np.array(['infinite slab', 'infinite cylinder', 'infinite square prism', 'sphere', 'cube', 'cube']),
+		h=np.array([0.4, 0.5, 0.7, 0.9, 0.985, 1.0]), T_avg=np.array([10, 20, 30, 20, 40, 20.0]))),
+	'b4s_mixes': lambda: _batch(b4.evaluate_b4s, b4.B4S_EXAMPLE, dict(
+		cem_type=_CEM, fcm=np.array([20, 30, 40, 50, 60, 70.0]) * 1e6, h=np.array([0.4, 0.5, 0.7, 0.9, 0.985, 1.0]))),
+}
+
+def _random_mixes(n, seed=0):
+	"""``n`` random B4 mixes over the applicability ranges, every continuous input distinct per row."""
+	rng = np.random.default_rng(seed)
+	mixes = dict(b4.B4_EXAMPLE)
+	mixes.update(
+		fcm=rng.uniform(15e6, 70e6, n), wc=rng.uniform(0.22, 0.87, n), ac=rng.uniform(1.0, 13.2, n),
+		c=rng.uniform(0.2, 1.5, n), h=rng.uniform(0.4, 0.98, n), V=rng.uniform(0.015, 0.1, n),
+		cem_type=rng.choice(b4.tables.BUILTIN_CEM_TYPES, n), agg_type=rng.choice(b4.tables.BUILTIN_AGG_KEYS, n),
+		t=rng.uniform(30, 36500, n))
+	return mixes
+
+
+def _memo():
+	# 5e4 distinct mixes: a combined integer code of the cached columns would overflow
+	mixes = _random_mixes(50000)
+	reference = b4.evaluate_b4(mixes, check=False)
+	memo.enable(memo.MixCache(maxsize=10**5))
+	try:
+		miss = b4.evaluate_b4(mixes, check=False)
+		hit = b4.evaluate_b4(mixes, check=False) 	# all from the LRU
+	finally:
+		memo.disable()
+	return reference, dict(miss=miss, hit=hit), 1e-12
+
+
+def _graph():
+	# every output of the graph against batch (the parameter objects), both models
+	mixes = _random_mixes(2000, seed=1)
+	b4s = dict((name, mixes[name]) for name in b4.batch.B4S_REQUIRED + ('t',))
+	reference, paths = {}, {}
+	for model, evaluate, chain, inputs in (('B4', b4.evaluate_b4, graph.B4, mixes), ('B4s', b4.evaluate_b4s, graph.B4S, b4s)):
+		r = evaluate(inputs, check=False)
+		g = chain.evaluate(graph.OUTPUTS, check=False, **inputs)
+		reference.update(('%s %s' % (model, name), r[name]) for name in graph.OUTPUTS)
+		paths[model] = dict(('%s %s' % (model, name), np.broadcast_to(g[name], np.shape(r[name]))) for name in graph.OUTPUTS)
+	return reference, paths, 1e-12
+
+
+def _params(mixes, cls=b4.B4Params):
+	return cls(check=False, **dict((name, value) for name, value in mixes.items() if name != 't'))
+
+
+def _surrogate():
+	# expansions (arrays of mixes, and the float path of one mix) against the exact model
+	reference, paths = {}, {'mixes': {}, 'one mix': {}}
+	for model in ('B4', 'B4s'):
+		s = surrogate.build(model, validation=0)
+		rng = np.random.default_rng(2)
+		X = 2 * rng.random((2000, len(s.names))) - 1
+		inputs = dict((name, surrogate._value(name, lo + (hi - lo) * (X[:, k] + 1) / 2))
+			for k, (name, lo, hi) in enumerate(zip(s.names, s._low, s._high)))
+		t = rng.uniform(30, 36500, len(X))
+		r, e = s(t, **inputs), s.exact(t, **inputs)
+		one = [s(t[i], **dict((name, v[i]) for name, v in inputs.items())) for i in range(50)]
+		for name in surrogate.OUTPUTS:
+			key = '%s %s' % (model, name)
+			reference[key] = e[name]
+			paths['mixes'][key] = r[name]
+			reference[key + ' (one mix)'] = e[name][:50]
+			paths['one mix'][key + ' (one mix)'] = np.array([o[name] for o in one])
+	# the surrogate matches the exact model to rounding (see its docstring)
+	return reference, paths, 1e-9
+
+
+def _jit():
+	# the packed kernels, per point and for a whole batch, against the parameter objects
+	mixes = _random_mixes(2000, seed=3)
+	b4s = dict((name, mixes[name]) for name in b4.batch.B4S_REQUIRED + ('t',))
+	reference, paths = {}, {'batch': {}, 'scalar': {}}
+	for model, cls, inputs in (('B4', b4.B4Params, mixes), ('B4s', b4.B4sParams, b4s)):
+		P = _params(inputs, cls)
+		t, tp = inputs['t'], 90.0
+		r = jit.evaluate(t, tp, jit.pack(P))
+		one = [jit.strains(t[i], tp, jit.pack(_params(dict((name, v[i] if np.ndim(v) else v)
+			for name, v in inputs.items()), cls))) for i in range(50)]
+		for k, (name, value) in enumerate((('eps_sh', P.eps_sh(t)), ('eps_au', P.eps_au(t)), ('J', P.J(t, tp)))):
+			key = '%s %s' % (model, name)
+			reference[key] = value
+			paths['batch'][key] = r[k]
+			reference[key + ' (scalar)'] = value[:50]
+			paths['scalar'][key + ' (scalar)'] = np.array([o[k] for o in one])
+	return reference, paths, 1e-12
+
+
+def _store():
+	# histories written in batches across chunk boundaries and read back, per encoding
+	mixes = _random_mixes(500, seed=4)
+	ages = np.geomspace(29, 36500, 23)
+	columns = dict((name, v[:, None] if np.ndim(v) else v) for name, v in mixes.items())
+	h = _params(columns).history(ages)
+	reference = dict(eps_sh=h.eps_sh, eps_au=h.eps_au, eps_tot=h.eps_tot, J_sigma=h.J * mixes['sigma'] / MPa)
+	reference.update([(name + ' (points)', reference[name][:20]) for name in store.OUTPUTS])
+	paths = {}
+	with tempfile.TemporaryDirectory() as directory:
+		for path, create in (('delta+shuffle', {}), ('raw', dict(filters=(), level=0))):
+			with store.Store(os.path.join(directory, path)) as s:
+				store.record(s, _params(mixes), ages, batch=100, chunks=(64, 5), **create)
+			s = store.Store(os.path.join(directory, path), mode='r')
+			paths[path] = dict((name, s[name][:]) for name in store.OUTPUTS)
+			paths[path].update((name + ' (points)', np.array([s[name][i] for i in range(20)])) for name in store.OUTPUTS)
+			s.close()
+	# float64 storage is lossless
+	return reference, paths, 1e-15
+
+
+# name: function returning (reference outputs, {path: outputs of the path under test}, rtol)
+CROSS = {
+	'memo': _memo,
+	'graph': _graph,
+	'surrogate': _surrogate,
+	'jit': _jit,
+	'store': _store,
+}
+
+# printed by the original scripts (8 decimals)
+SCRIPT = {
+	'script_b4': ({
+		'Drying shrinkage (eps_sh)': -0.00043497,
+		'Autogenous shrinkage (eps_au)': -0.00003535,
+		'Average creep (J*sigma)': -0.00187071,
+		'Temperature influence (T_infl)': 0.0,
+		'Total strain (eps_tot)': -0.00234103,
+	}, lambda: _script(b4.B4Params, b4.B4_EXAMPLE)),
+	'script_b4s': ({
+		'Drying shrinkage (eps_sh)': -0.00058507,
+		'Autogenous shrinkage (eps_au)': -0.00005330,
+		'Average creep (J*sigma)': -0.00207396,
+		'Temperature influence (T_infl)': 0.0,
+		'Total strain (eps_tot)': -0.00271233,
+	}, lambda: _script(b4.B4sParams, b4.B4S_EXAMPLE)),
+}
+
+
+def compute():
+	return dict((name, dict((k, np.asarray(v, dtype=float)) for k, v in case().items())) for name, case in CASES.items())
+
+
+def update(path=PATH):
+	"""Rewrite ``golden.json`` from the current code (after a reviewed change of results)."""
+	golden = dict((name, dict((k, dict(value=v.tolist(), rtol=RTOL)) for k, v in outputs.items()))
+		for name, outputs in compute().items())
+	with open(path, 'w') as f:
+		json.dump(golden, f, indent=1, sort_keys=True)
+
+
+def check(path=PATH):
+	"""List of drift messages (empty when everything matches)."""
+	with open(path) as f:
+		golden = json.load(f)
+	problems = []
+	current = compute()
+	for name, outputs in sorted(golden.items()):
+		for key, pinned in sorted(outputs.items()):
+			value = current.get(name, {}).get(key)
+			expected = np.array(pinned['value'], dtype=float)
+			if value is None or value.shape != expected.shape:
+				problems.append('%s/%s: missing or shape changed' % (name, key))
+				continue
+			err = np.abs(value - expected) / np.maximum(np.abs(expected), 1e-300)
+			bad = ~(np.isclose(value, expected, rtol=pinned['rtol'], atol=0) | ((value == 0) & (expected == 0)))
+			if bad.any():
+				problems.append('%s/%s: relative drift %.3g (rtol %g)' % (name, key, float(np.max(err[bad])), pinned['rtol']))
+	for name, case in sorted(CROSS.items()):
+		reference, paths, rtol = case()
+		for path, outputs in sorted(paths.items()):
+			for key, value in sorted(outputs.items()):
+				expected = np.asarray(reference[key], dtype=float)
+				value = np.asarray(value, dtype=float)
+				if value.shape != expected.shape:
+					problems.append('%s/%s/%s: shape %s, reference %s' % (name, path, key, value.shape, expected.shape))
+					continue
+				bad = ~np.isclose(value, expected, rtol=rtol, atol=0, equal_nan=True)
+				if bad.any():
+					err = np.abs(value - expected)[bad] / np.maximum(np.abs(expected[bad]), 1e-300)
+					problems.append('%s/%s/%s: %d values differ from the reference path, relative error up to %.3g'
+						% (name, path, key, int(bad.sum()), float(np.max(err))))
+	for name, (printed, case) in sorted(SCRIPT.items()):
+		for key, value in sorted(case().items()):
+			if abs(float(value) - printed[key]) > 5e-9:
+				problems.append('%s/%s: %.8f, script printed %.8f' % (name, key, float(value), printed[key]))
+	return problems